@@ -0,0 +1,237 @@
+"""
+Headless batch pricing for catalogue runs.
+
+    python batch.py images/ results.jsonl
+    python batch.py skus.csv results.jsonl --workers 8 --rpm 60 --parquet results.parquet
+
+The input is either a directory of product images (identified, then priced)
+or a CSV of queries (a "query" column, optionally "id"/"sku"; otherwise the
+first column is the query). Results are appended to a JSONL file one line per
+item as they finish, so a crashed run picks up where it left off: items that
+already have an "ok" line are skipped on restart. Calls run at batch priority,
+so any interactive calls in the same process go first; items shed under load
+are recorded as errors and retried on the next run.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import config
+from core import identify_product, lookup_prices, resolve_query
+from image_prep import open_image
+from price_sources import collect_prices
+from rate_limit import BATCH, RateLimiter, request_context
+from router import get_router
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def iter_image_items(directory):
+    """Yield (item_id, path) for every image under a directory, in a stable order"""
+    for root, _, files in sorted(os.walk(directory)):
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, directory), path
+
+
+def iter_query_items(csv_path):
+    """Yield (item_id, query) for every row of a CSV of product queries"""
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        has_header = csv.Sniffer().has_header(sample) if sample.strip() else False
+        if has_header:
+            for row in csv.DictReader(f):
+                row = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+                query = row.get("query") or next(iter(row.values()), "")
+                if query:
+                    yield row.get("id") or row.get("sku") or query, query
+        else:
+            for row in csv.reader(f):
+                if row and row[0].strip():
+                    yield row[0].strip(), row[0].strip()
+
+
+def load_completed(output_path):
+    """Ids of items already priced successfully in an earlier (possibly interrupted) run"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a half-written last line
+                continue
+            if record.get("status") == "ok":
+                completed.add(record.get("id"))
+    return completed
+
+
+def price_image(path, api_key):
+    """Identify and price one image file; returns (product_info, results)"""
+    with open_image(path) as image:
+        identification = identify_product(image, api_key, source_bytes=os.path.getsize(path), stream=False)
+    if not identification.ok:
+        raise ValueError(identification.error)
+    product_info = identification.product_info
+    query = product_info.get('search_query') or product_info.get('product_name')
+    if not query:
+        raise ValueError("Identification has no search query")
+    _, results = price_query(query, api_key)
+    return product_info, results
+
+
+def price_query(query, api_key):
+    """Price one text query with every configured price source; returns (None, results)"""
+    query, _ = resolve_query(query)
+    if config.PRICE_SOURCES != ["groq"]:
+        collection = collect_prices(query, api_key)
+        if not collection.ok:
+            raise ValueError("; ".join(collection.errors.values()) or "No prices found")
+        return None, collection.results
+    lookup = lookup_prices(query, api_key)
+    if not lookup.ok:
+        raise ValueError(lookup.error)
+    return None, lookup.results
+
+
+class JsonlWriter:
+    """Thread-safe append-only JSONL writer that flushes every record to disk"""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def run_batch(source, output_path, api_key, workers=None, rpm=None, progress=None):
+    """
+    Price every item in `source` (image directory or CSV) into `output_path`.
+    Returns a summary dict with counts of priced, failed and skipped items.
+    """
+    workers = workers or config.BATCH_WORKERS
+    rpm = rpm or config.BATCH_REQUESTS_PER_MINUTE
+    # One budget for the run, whichever key each call is routed to
+    limiter = RateLimiter(rpm)
+    for client in get_router(api_key).clients():
+        client.limiter = limiter
+
+    if os.path.isdir(source):
+        items, handler = iter_image_items(source), price_image
+    else:
+        items, handler = iter_query_items(source), price_query
+
+    completed = load_completed(output_path)
+    pending = [(item_id, value) for item_id, value in items if item_id not in completed]
+    summary = {"ok": 0, "error": 0, "skipped": len(completed), "total": len(pending) + len(completed)}
+
+    def work(item_id, value):
+        start = time.perf_counter()
+        record = {"id": item_id, "source": value}
+        try:
+            # Batch calls yield to interactive sessions and are shed first under load
+            with request_context("batch", priority=BATCH):
+                product_info, results = handler(value, api_key)
+            record.update(status="ok", product_info=product_info, results=results)
+        except Exception as e:
+            record.update(status="error", error=str(e))
+        record["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        record["completed_at"] = datetime.now().isoformat(timespec="seconds")
+        return record
+
+    writer = JsonlWriter(output_path)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(work, item_id, value) for item_id, value in pending]
+            for future in as_completed(futures):
+                record = future.result()
+                writer.write(record)
+                summary[record["status"]] += 1
+                if progress:
+                    progress(record, summary)
+    finally:
+        writer.close()
+    return summary
+
+
+def export_parquet(jsonl_path, parquet_path):
+    """Flatten successful JSONL records into one row per retailer and write Parquet"""
+    import pandas as pd
+
+    rows = []
+    with open(jsonl_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") != "ok":
+                continue
+            product = record.get("product_info") or {}
+            results = record["results"]
+            for retailer in results.get("retailers", []):
+                rows.append({
+                    "id": record["id"],
+                    "product_name": product.get("product_name") or results.get("product_name"),
+                    "brand": product.get("brand"),
+                    "category": product.get("category"),
+                    "search_date": results.get("search_date"),
+                    "retailer": retailer.get("retailer"),
+                    "price": retailer.get("price"),
+                    "condition": retailer.get("condition"),
+                    "url": retailer.get("url"),
+                })
+    pd.DataFrame(rows).to_parquet(parquet_path, index=False)
+    return len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Price a folder of product images or a CSV of queries")
+    parser.add_argument("source", help="directory of images or CSV file of queries")
+    parser.add_argument("output", help="JSONL file to append results to (resumes if it exists)")
+    parser.add_argument("--workers", type=int, default=None, help=f"parallel items (default {config.BATCH_WORKERS})")
+    parser.add_argument("--rpm", type=int, default=None,
+                        help=f"Groq requests per minute (default {config.BATCH_REQUESTS_PER_MINUTE})")
+    parser.add_argument("--parquet", help="also export priced rows to this Parquet file when done")
+    args = parser.parse_args(argv)
+
+    api_key = config.load_api_key()
+    if not api_key:
+        print("GROQ_API_KEY not found in the environment or .streamlit/secrets.toml", file=sys.stderr)
+        return 2
+
+    def progress(record, summary):
+        done = summary["ok"] + summary["error"]
+        print(f"[{done}/{summary['total'] - summary['skipped']}] {record['status']:5} {record['id']}", flush=True)
+
+    summary = run_batch(args.source, args.output, api_key, args.workers, args.rpm, progress)
+    print(f"Done: {summary['ok']} priced, {summary['error']} failed, {summary['skipped']} already done")
+    if args.parquet:
+        count = export_parquet(args.output, args.parquet)
+        print(f"Wrote {count} rows to {args.parquet}")
+    return 0 if summary["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Benchmarks and local stand-ins for external services. Run modules with `python -m benchmarks.<name>`."""
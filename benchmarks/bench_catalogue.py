@@ -0,0 +1,129 @@
+"""
+Autocomplete and query matching speed of the local catalogue, and how often typed variants reach the cache.
+
+    python -m benchmarks.bench_catalogue [--products 20000] [--queries 2000]
+
+Builds a synthetic catalogue (brand, line, model number, variant) through a
+CSV import, then types queries the way people do: prefixes for autocomplete,
+and for matching the product name with a dropped or swapped letter, shuffled
+word order, a missing word or different case. Reported: import time, p50/p95/p99
+of suggest() and search() in microseconds, how many variants were matched to
+the product they came from (and how many to a wrong one), and the share of
+variants whose price-cache key equals the product's with and without
+canonicalisation.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import tempfile
+import time
+
+from cache import normalize_query
+from catalogue import Catalogue
+
+BRANDS = ("Samsung", "Apple", "Sony", "OnePlus", "Xiaomi", "Boat", "Nike", "Adidas", "Puma", "Milton", "Prestige",
+          "Philips", "Lenovo", "HP", "Dell", "Asus", "Realme", "Noise", "JBL", "Bajaj")
+LINES = ("Galaxy", "Pro", "Air", "Max", "Ultra", "Lite", "Neo", "Plus", "Prime", "Note", "Edge", "Flex", "Zen",
+         "Rockerz", "Airdopes", "Pulse", "Runner", "Classic", "Thermo", "Smart")
+KINDS = ("Smartphone", "Headphones", "Earbuds", "Sneakers", "Laptop", "Smartwatch", "Bottle", "Mixer Grinder",
+         "Speaker", "Trimmer")
+VARIANTS = ("", "128GB", "256GB", "Black", "Blue", "White", "2024 Edition", "1 Litre", "Size 9", "16GB RAM")
+
+
+def synthetic_products(count, rng):
+    seen = set()
+    while len(seen) < count:
+        brand, line, kind = rng.choice(BRANDS), rng.choice(LINES), rng.choice(KINDS)
+        name = f"{brand} {line} {rng.randint(1, 999)} {kind} {rng.choice(VARIANTS)}".strip()
+        if normalize_query(name) not in seen:
+            seen.add(normalize_query(name))
+            yield {"name": name, "brand": brand, "category": kind.lower(), "search_query": name}
+
+
+def typo(word, rng):
+    if len(word) < 4 or any(c.isdigit() for c in word):
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    if rng.random() < 0.5:
+        return word[:i] + word[i + 1:]
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def variant(name, rng):
+    """What someone might type for a product: a typo, shuffled words, a dropped word or changed case"""
+    words = name.split()
+    kind = rng.choice(("typo", "shuffle", "drop", "case"))
+    if kind == "typo":
+        i = rng.randrange(len(words))
+        words[i] = typo(words[i], rng)
+    elif kind == "shuffle":
+        rng.shuffle(words)
+    elif kind == "drop" and len(words) > 3:
+        droppable = [i for i, w in enumerate(words) if not any(c.isdigit() for c in w)]
+        del words[rng.choice(droppable)]
+    return " ".join(words).lower() if kind == "case" else " ".join(words)
+
+
+def timed(fn, inputs):
+    """p50/p95/p99 in microseconds of fn over inputs"""
+    timings = []
+    for value in inputs:
+        start = time.perf_counter()
+        fn(value)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {f"p{q}_us": round(timings[min(len(timings) - 1, len(timings) * q // 100)] * 1e6, 1) for q in (50, 95, 99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    products = list(synthetic_products(args.products, rng))
+    data = io.StringIO()
+    writer = csv.DictWriter(data, fieldnames=["name", "brand", "category", "search_query"])
+    writer.writeheader()
+    writer.writerows(products)
+
+    catalogue = Catalogue(os.path.join(tempfile.mkdtemp(prefix="bench-catalogue-"), "catalogue.sqlite3"))
+    start = time.perf_counter()
+    catalogue.import_csv(io.StringIO(data.getvalue()))
+    import_s = time.perf_counter() - start
+
+    sample = [rng.choice(products)["name"] for _ in range(args.queries)]
+    prefixes = [name[:rng.randint(2, 12)] for name in sample]
+    variants = [variant(name, rng) for name in sample]
+
+    matched = wrong = same_key_before = same_key_after = 0
+    for name, typed in zip(sample, variants):
+        same_key_before += normalize_query(typed) == normalize_query(name)
+        found = catalogue.match(typed)
+        if found:
+            if found[0]["name"] == name:
+                matched += 1
+            else:
+                wrong += 1
+        same_key_after += normalize_query(found[0]["search_query"] if found else typed) == normalize_query(name)
+
+    report = {
+        "products": len(catalogue.products),
+        "import_s": round(import_s, 2),
+        "suggest": timed(catalogue.suggest, prefixes),
+        "match": timed(catalogue.search, variants),
+        "variants_matched": round(matched / len(variants), 3),
+        "variants_matched_wrong": round(wrong / len(variants), 3),
+        "cache_key_shared_without_catalogue": round(same_key_before / len(variants), 3),
+        "cache_key_shared_with_catalogue": round(same_key_after / len(variants), 3),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
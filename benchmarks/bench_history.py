@@ -0,0 +1,71 @@
+"""
+Price history write and range-query cost at catalogue scale.
+
+    python -m benchmarks.bench_history [--products 1000] [--days 180]
+
+Fills a fresh history database with one snapshot of six retailers per product
+per day, then times record() on the caller's thread (it only enqueues),
+the background batch insert rate, and series()/assess() for random products.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from history import DAY, PriceHistory
+
+RETAILERS = ("Amazon India", "Flipkart", "Myntra", "Ajio", "Meesho", "Snapdeal")
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return round(statistics.median(samples) * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    history = PriceHistory(os.path.join(tempfile.mkdtemp(prefix="bench-history-"), "history.sqlite3"))
+    now = time.time()
+    products = [f"product {i} model {i % 97}" for i in range(args.products)]
+
+    record_seconds = []
+    start = time.perf_counter()
+    for day in range(args.days):
+        for product in products:
+            base = 1000 + hash(product) % 50000
+            results = {"retailers": [{"retailer": r, "price": base * rng.uniform(0.85, 1.15)} for r in RETAILERS]}
+            t = time.perf_counter()
+            history.record(product, results, ts=now - (args.days - day) * DAY)
+            record_seconds.append(time.perf_counter() - t)
+    history.flush()
+    elapsed = time.perf_counter() - start
+    rows = history.stats()["rows"]
+
+    report = {
+        "rows": rows,
+        "record_us_p50": round(statistics.median(record_seconds) * 1e6, 1),
+        "record_us_max": round(max(record_seconds) * 1e6, 1),
+        "rows_per_second": round(rows / elapsed),
+        "series_90d_ms": timed(lambda: history.series(rng.choice(products), start=now - 90 * DAY), args.queries),
+        "series_one_retailer_ms": timed(
+            lambda: history.series(rng.choice(products), retailer="Flipkart"), args.queries),
+        "assess_ms": timed(lambda: history.assess(rng.choice(products), 20000), args.queries),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Compare the vision upload payload before and after image_prep.prepare_image.
+
+    python -m benchmarks.bench_image_prep [--uplink-mbps 5] [--format WEBP]
+
+For each synthetic photo size it reports encoded bytes, encode time, the
+measured round trip to a local Groq stub and the estimated upload time on
+the given uplink.
+"""
+import argparse
+import base64
+import json
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+from benchmarks.groq_stub import GroqStub
+from groq_client import GroqClient
+from image_prep import legacy_encode, prepare_image
+
+RESOLUTIONS = [(1280, 960), (3024, 4032), (4000, 3000)]
+
+
+def synthetic_photo(width, height, seed=0):
+    """A product-like photo: textured background, a shaded object and some sensor noise"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    background = (180 + 40 * np.sin(x / 97.0) * np.cos(y / 131.0)).astype(np.uint8)
+    image = Image.fromarray(np.dstack([background, background - 10, background - 25]).clip(0, 255).astype(np.uint8))
+    draw = ImageDraw.Draw(image)
+    box = (width // 4, height // 4, 3 * width // 4, 3 * height // 4)
+    draw.rounded_rectangle(box, radius=min(width, height) // 20, fill=(30, 30, 35), outline=(200, 200, 210), width=8)
+    draw.ellipse((width // 3, height // 3, width // 2, height // 2), fill=(180, 20, 40))
+    draw.text((width // 3, 2 * height // 3), "BRAND MODEL X", fill=(240, 240, 240))
+    image = image.filter(ImageFilter.GaussianBlur(1))
+    noise = rng.normal(0, 6, (height, width, 3))
+    return Image.fromarray((np.asarray(image, dtype=np.float32) + noise).clip(0, 255).astype(np.uint8))
+
+
+def vision_payload(data_url):
+    return {
+        "model": "meta-llama/llama-4-scout-17b-16e-instruct",
+        "messages": [{"role": "user", "content": [
+            {"type": "image_url", "image_url": {"url": data_url}},
+            {"type": "text", "text": "Identify this product."}
+        ]}],
+        "max_tokens": 256
+    }
+
+
+def timed(fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--uplink-mbps", type=float, default=5.0, help="uplink used to estimate upload time")
+    parser.add_argument("--format", default=None, help="JPEG or WEBP (defaults to config.IMAGE_FORMAT)")
+    args = parser.parse_args()
+
+    rows = []
+    with GroqStub() as stub:
+        client = GroqClient("bench", base_url=stub.base_url, requests_per_minute=0, tokens_per_minute=0)
+        for width, height in RESOLUTIONS:
+            photo = synthetic_photo(width, height)
+
+            legacy, legacy_encode_s = timed(lambda: base64.b64encode(legacy_encode(photo)).decode())
+            prepared, prepared_encode_s = timed(lambda: prepare_image(photo, image_format=args.format))
+
+            _, legacy_rtt = timed(lambda: client.chat_completion(
+                vision_payload(f"data:image/jpeg;base64,{legacy}"), endpoint="vision"))
+            _, prepared_rtt = timed(lambda: client.chat_completion(
+                vision_payload(prepared.data_url), endpoint="vision"))
+
+            bytes_per_s = args.uplink_mbps * 1e6 / 8
+            rows.append({
+                "resolution": f"{width}x{height}",
+                "legacy_payload_bytes": len(legacy),
+                "prepared_payload_bytes": len(prepared.base64),
+                "prepared_resolution": f"{prepared.width}x{prepared.height}",
+                "legacy_encode_ms": round(legacy_encode_s * 1000, 1),
+                "prepared_encode_ms": round(prepared_encode_s * 1000, 1),
+                "legacy_local_e2e_ms": round((legacy_encode_s + legacy_rtt) * 1000, 1),
+                "prepared_local_e2e_ms": round((prepared_encode_s + prepared_rtt) * 1000, 1),
+                "legacy_est_upload_ms": round(len(legacy) / bytes_per_s * 1000, 1),
+                "prepared_est_upload_ms": round(len(prepared.base64) / bytes_per_s * 1000, 1),
+            })
+
+    print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Parse success and speed of llm_json against the original fence/slice parsing.
+
+    python -m benchmarks.bench_llm_json [--repeat 2000]
+
+Runs every reply in benchmarks/data/llm_replies.jsonl (clean, fenced,
+prose-wrapped, single-quoted, truncated and refusal replies) through both
+parsers. "expect" is the number of usable records (1 for a product, N
+retailer rows, 0 when nothing should parse). Exits non-zero if llm_json
+gets any corpus entry wrong.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from llm_json import LLMJSONError, parse_product_info, parse_retailers
+
+CORPUS = os.path.join(os.path.dirname(__file__), "data", "llm_replies.jsonl")
+
+
+def legacy_parse(text, kind):
+    """The markdown-stripping plus find/rfind slicing previously used in main.py"""
+    text = text.strip()
+    if '```json' in text:
+        start = text.find('```json') + 7
+        end = text.find('```', start)
+        text = text[start:end if end != -1 else len(text)].strip()
+    elif '```' in text:
+        start = text.find('```') + 3
+        end = text.find('```', start)
+        text = text[start:end if end != -1 else len(text)].strip()
+    opener, closer = ('{', '}') if kind == "product" else ('[', ']')
+    json_start = text.find(opener)
+    json_end = text.rfind(closer) + 1
+    if json_start == -1 or json_end <= json_start:
+        return 0
+    value = json.loads(text[json_start:json_end])
+    if kind == "product":
+        return 1
+    return len([r for r in value if isinstance(r.get('price'), (int, float)) and r['price'] > 0])
+
+
+def new_parse(text, kind):
+    if kind == "product":
+        return 1 if parse_product_info(text) else 0
+    return len(parse_retailers(text))
+
+
+def outcome(parser, entry):
+    try:
+        return parser(entry["text"], entry["kind"])
+    except (ValueError, LLMJSONError, AttributeError, TypeError):
+        return 0
+
+
+def per_call_us(parser, entries, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for entry in entries:
+            outcome(parser, entry)
+    return (time.perf_counter() - start) / (repeat * len(entries)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(CORPUS, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+
+    failures = []
+    legacy_correct = new_correct = 0
+    for entry in entries:
+        legacy = outcome(legacy_parse, entry)
+        new = outcome(new_parse, entry)
+        legacy_correct += legacy == entry["expect"]
+        new_correct += new == entry["expect"]
+        if new != entry["expect"]:
+            failures.append(f"{entry['kind']}: {entry['note']} (expected {entry['expect']}, got {new})")
+
+    report = {
+        "corpus_size": len(entries),
+        "legacy_correct": legacy_correct,
+        "llm_json_correct": new_correct,
+        "legacy_us_per_reply": round(per_call_us(legacy_parse, entries, args.repeat), 2),
+        "llm_json_us_per_reply": round(per_call_us(new_parse, entries, args.repeat), 2),
+        "failures": failures,
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+"""
+Throughput and latency of the identify-then-price pipeline under load.
+
+    python -m benchmarks.bench_pipeline [--sessions 1 8] [--requests 10] [--latency 0.3]
+        [--chunk-delay 0.01] [--error-rate 0.05] [--malformed-rate 0.05] [--cache cold]
+        [--output FILE] [--compare OLD_REPORT.json]
+
+Each session is a thread that takes corpus images in turn (benchmarks/data/images)
+and does what the page does for an upload: decode it, identify it with the reply
+streamed, start the price search as soon as search_query arrives and wait for
+the prices. Sessions run against a local Groq stub with the given latency,
+generation speed, error rate and malformed-reply rate.
+
+With --cache cold (the default) every request misses the caches: each image
+gets a unique banner and the stub returns a different search_query each time.
+--cache warm runs the corpus once untimed and then measures cache hits.
+
+For each session count the report has throughput, p50/p95/p99 end-to-end and
+time-to-identification latency, failures by kind, mean time per stage from
+telemetry, and the faults the stub injected. It is written as JSON named after
+the current commit (benchmarks/results/pipeline-<commit>.json) so runs on
+different commits can be compared with --compare.
+"""
+import argparse
+import io
+import itertools
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+os.environ.setdefault("PRICE_FINDER_DATA_DIR", tempfile.mkdtemp(prefix="bench-pipeline-"))
+
+import numpy as np  # noqa: E402
+from PIL import Image, ImageDraw  # noqa: E402
+
+import config  # noqa: E402
+import groq_client  # noqa: E402
+import telemetry  # noqa: E402
+from benchmarks.corpus import corpus  # noqa: E402
+from benchmarks.groq_stub import PRODUCT_REPLY, GroqStub, default_reply  # noqa: E402
+from cache import get_identification_cache, get_price_cache  # noqa: E402
+from core import identify_product, lookup_prices  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+API_KEY = "bench"
+
+
+def git_commit():
+    """Short hash of HEAD, marked -dirty when the tree has uncommitted changes"""
+    root = os.path.dirname(RESULTS_DIR)
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                               capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit + ("-dirty" if dirty else "")
+
+
+def unique_replies():
+    """Stub reply function giving every vision request its own search_query, so price lookups miss too"""
+    counter = itertools.count()
+    lock = threading.Lock()
+
+    def reply(payload):
+        content = default_reply(payload)
+        if not content.lstrip().startswith("{") or "search_query" not in content:
+            return content
+        with lock:
+            n = next(counter)
+        return json.dumps(dict(PRODUCT_REPLY, search_query=f"{PRODUCT_REPLY['search_query']} {n}"), indent=2)
+    return reply
+
+
+def add_banner(image, seed):
+    """Paint a random block banner across the top so the image fingerprint is new"""
+    rng = np.random.default_rng(seed)
+    draw = ImageDraw.Draw(image)
+    width, height = image.size
+    cell = width // 8
+    for col in range(8):
+        for row in range(2):
+            colour = tuple(int(v) for v in rng.integers(0, 256, 3))
+            draw.rectangle((col * cell, row * height // 8, (col + 1) * cell, (row + 1) * height // 8), fill=colour)
+    return image
+
+
+def run_pipeline(data, seed, executor, cold):
+    """One upload: returns a dict of timings and the failure kind, if any"""
+    start = time.perf_counter()
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    decode_s = time.perf_counter() - start
+    if cold:
+        add_banner(image, seed)
+
+    start = time.perf_counter()
+    marks, pending = {}, {}
+
+    def on_field(key, value):
+        if key == "search_query" and value and value not in pending:
+            marks["search_query"] = time.perf_counter() - start
+            pending[value] = executor.submit(lookup_prices, value, API_KEY)
+
+    with telemetry.span("request.image"):
+        identification = identify_product(image, API_KEY, source_bytes=len(data), on_field=on_field)
+        identified_s = time.perf_counter() - start
+        if not identification.ok:
+            return {"ok": False, "failure": f"identify:{identification.error_kind}", "decode_s": decode_s}
+        query = identification.product_info.get("search_query") or identification.product_info.get("product_name")
+        lookup = pending[query].result() if query in pending else lookup_prices(query, API_KEY)
+    total_s = time.perf_counter() - start
+    if not lookup.ok:
+        return {"ok": False, "failure": f"prices:{lookup.error_kind}", "decode_s": decode_s}
+    return {"ok": True, "decode_s": decode_s, "identify_s": identified_s,
+            "search_query_s": marks.get("search_query", identified_s), "total_s": decode_s + total_s}
+
+
+def percentiles(values):
+    """p50/p95/p99 in ms by nearest rank"""
+    if not values:
+        return {}
+    values = sorted(values)
+    return {f"p{q}_ms": round(values[min(len(values) - 1, max(0, -(-len(values) * q // 100) - 1))] * 1000, 1)
+            for q in (50, 95, 99)}
+
+
+def run_level(sessions, requests, images, cold, stub):
+    telemetry.collector.clear()
+    before = stub.stats()
+    seeds = itertools.count()
+    seed_lock = threading.Lock()
+
+    def session(index):
+        outcomes = []
+        for i in range(requests):
+            name, data = images[(index + i) % len(images)]
+            with seed_lock:
+                seed = next(seeds)
+            outcomes.append(dict(run_pipeline(data, seed, search_executor, cold), image=name))
+        return outcomes
+
+    with ThreadPoolExecutor(max_workers=sessions * 2, thread_name_prefix="bench-search") as search_executor, \
+            ThreadPoolExecutor(max_workers=sessions, thread_name_prefix="bench-session") as pool:
+        start = time.perf_counter()
+        outcomes = [o for result in pool.map(session, range(sessions)) for o in result]
+        wall = time.perf_counter() - start
+
+    done = [o for o in outcomes if o["ok"]]
+    failures = {}
+    for o in outcomes:
+        if not o["ok"]:
+            failures[o["failure"]] = failures.get(o["failure"], 0) + 1
+    by_resolution = {}
+    for o in done:
+        by_resolution.setdefault(o["image"].rsplit("-", 1)[1], []).append(o["total_s"])
+    with telemetry.collector._lock:
+        stages = {name: round(h["sum"] / h["count"] * 1000, 2) for name, h in telemetry.collector.histograms.items()}
+    after = stub.stats()
+    return {
+        "sessions": sessions,
+        "requests": len(outcomes),
+        "succeeded": len(done),
+        "wall_s": round(wall, 2),
+        "throughput_rps": round(len(done) / wall, 2),
+        "end_to_end": percentiles([o["total_s"] for o in done]),
+        "identified": percentiles([o["identify_s"] for o in done]),
+        "search_query_ready": percentiles([o["search_query_s"] for o in done]),
+        "decode": percentiles([o["decode_s"] for o in outcomes]),
+        "end_to_end_by_resolution": {k: percentiles(v) for k, v in sorted(by_resolution.items())},
+        "failures": failures,
+        "stage_mean_ms": dict(sorted(stages.items())),
+        "stub": {k: after[k] - before[k] for k in after},
+    }
+
+
+def compare(report, previous):
+    """Print throughput and latency changes against an earlier report"""
+    print(f"\nvs {previous.get('commit')} ({previous.get('date')}):")
+    for level, result in report["results"].items():
+        old = previous.get("results", {}).get(level)
+        if not old:
+            continue
+        rows = [("throughput_rps", old["throughput_rps"], result["throughput_rps"])]
+        rows += [(f"end_to_end {q}", old["end_to_end"].get(q), result["end_to_end"].get(q))
+                 for q in ("p50_ms", "p95_ms", "p99_ms")]
+        print(f"  {level} session(s):")
+        for label, was, now in rows:
+            if was and now is not None:
+                print(f"    {label:22} {was:>10} -> {now:<10} ({(now - was) / was * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 8], help="concurrent sessions per run")
+    parser.add_argument("--requests", type=int, default=10, help="uploads per session")
+    parser.add_argument("--latency", type=float, default=0.3, help="stub time to first byte (s)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="random +/- seconds on the latency")
+    parser.add_argument("--chunk-delay", type=float, default=0.01, help="stub generation time per chunk (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered 429/500/503")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="share of replies with broken JSON")
+    parser.add_argument("--resolutions", nargs="+", default=None, help="corpus resolutions to use (default all)")
+    parser.add_argument("--cache", choices=("cold", "warm"), default="cold")
+    parser.add_argument("--rpm", type=int, default=0, help="client-side requests/min quota per model (0 = off)")
+    parser.add_argument("--tpm", type=int, default=0, help="client-side tokens/min quota per model (0 = off)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="report path (default benchmarks/results/pipeline-<commit>.json)")
+    parser.add_argument("--compare", default=None, help="earlier report to compare against")
+    args = parser.parse_args()
+
+    images = []
+    for name, path in corpus():
+        if args.resolutions is None or name.rsplit("-", 1)[1] in args.resolutions:
+            with open(path, "rb") as f:
+                images.append((name, f.read()))
+    cold = args.cache == "cold"
+    if cold:
+        # Near-duplicate images would otherwise be answered from the visual index
+        config.VISUAL_INDEX = False
+
+    stub = GroqStub(latency=args.latency, jitter=args.jitter, chunk_chars=4, chunk_delay=args.chunk_delay,
+                    error_rate=args.error_rate, malformed_rate=args.malformed_rate, seed=args.seed,
+                    reply=unique_replies() if cold else default_reply)
+    commit = git_commit()
+    report = {
+        "benchmark": "pipeline",
+        "commit": commit,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "settings": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "config": {"streaming": config.GROQ_STREAMING, "response_format": config.GROQ_RESPONSE_FORMAT,
+                   "image_max_pixels": config.IMAGE_MAX_PIXELS, "image_format": config.IMAGE_FORMAT},
+        "corpus": [name for name, _ in images],
+        "results": {},
+    }
+    with stub:
+        groq_client._clients[API_KEY] = groq_client.GroqClient(
+            API_KEY, base_url=stub.base_url, requests_per_minute=args.rpm, tokens_per_minute=args.tpm
+        )
+        if not cold:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                for seed, (_, data) in enumerate(images):
+                    run_pipeline(data, seed, executor, cold=False)
+        for sessions in args.sessions:
+            if cold:
+                get_identification_cache().clear()
+                get_price_cache().store.clear()
+            report["results"][str(sessions)] = run_level(sessions, args.requests, images, cold, stub)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"pipeline-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["results"], indent=2))
+    print(f"\nReport written to {output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Time to first and to complete price results with several price sources.
+
+    python -m benchmarks.bench_price_sources [--runs 3] [--latency 0.4]
+
+Runs the Groq estimator (against the Groq stub) and the five retailer parsers
+(against the saved fixture pages) one after another and then concurrently
+through collect_prices(). Per-retailer latencies are staggered around
+--latency and Meesho is made slower than PRICE_SOURCE_TIMEOUT, so the report
+also shows a timed-out source not holding up the others. The parsed rows of
+one run are printed so fixture or parser breakage is visible.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("PRICE_FINDER_DATA_DIR", tempfile.mkdtemp(prefix="bench-sources-"))
+
+import config  # noqa: E402
+import groq_client  # noqa: E402
+from benchmarks.groq_stub import GroqStub  # noqa: E402
+from benchmarks.retailer_stub import RetailerStub  # noqa: E402
+from cache import get_price_cache  # noqa: E402
+from price_sources import collect_prices, configured_sources  # noqa: E402
+
+QUERY = "Sony WH-1000XM5 headphones"
+RETAILERS = ("amazon", "flipkart", "myntra", "ajio", "meesho")
+
+
+def run_sequential(api_key):
+    get_price_cache().store.clear()
+    start = time.perf_counter()
+    first = None
+    for source in configured_sources():
+        try:
+            source.fetch(QUERY, api_key)
+        except Exception:
+            pass
+        first = first or time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def run_concurrent(api_key):
+    get_price_cache().store.clear()
+    start = time.perf_counter()
+    marks = []
+    collection = collect_prices(QUERY, api_key, on_update=lambda c: marks.append(time.perf_counter() - start))
+    return marks[0], marks[-1], collection
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.4, help="typical retailer page latency (s)")
+    parser.add_argument("--timeout", type=int, default=2, help="PRICE_SOURCE_TIMEOUT for the run (s)")
+    args = parser.parse_args()
+
+    latency = {name: args.latency * (0.5 + i * 0.25) for i, name in enumerate(RETAILERS)}
+    latency["meesho"] = args.timeout + 1
+    config.PRICE_SOURCES = ["groq", *RETAILERS]
+    config.PRICE_SOURCE_TIMEOUT = args.timeout
+    api_key = "bench"
+
+    with GroqStub(latency=args.latency) as groq_stub, RetailerStub(latency=latency) as retailer_stub:
+        groq_client._clients[api_key] = groq_client.GroqClient(
+            api_key, base_url=groq_stub.base_url, requests_per_minute=0, tokens_per_minute=0
+        )
+        config.RETAILER_BASE_URL = retailer_stub.base_url
+
+        sequential = [run_sequential(api_key) for _ in range(args.runs)]
+        concurrent = [run_concurrent(api_key) for _ in range(args.runs)]
+        collection = concurrent[-1][2]
+
+    report = {
+        "sources": config.PRICE_SOURCES,
+        "sequential": {"first_ms": round(statistics.median(r[0] for r in sequential) * 1000),
+                       "all_ms": round(statistics.median(r[1] for r in sequential) * 1000)},
+        "concurrent": {"first_ms": round(statistics.median(r[0] for r in concurrent) * 1000),
+                       "all_ms": round(statistics.median(r[1] for r in concurrent) * 1000)},
+        "errors": collection.errors,
+        "max_parallel_per_retailer": retailer_stub.max_active,
+        "rows": [{k: row.get(k) for k in ("retailer", "price", "discount", "source")}
+                 for row in collection.results["retailers"]],
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Price analytics on large result sets: Python loops over dicts versus the columnar price_table.
+
+    python -m benchmarks.bench_price_table [--rows 10000] [--retailers 400] [--repeat 5]
+
+Generates a results list the way history and live sources grow it: many
+listings per retailer, log-normal prices around a product price, a few
+rows with no usable price and about 1% unrealistic prices (a stray extra or
+missing zero). Both implementations do the same work: drop unusable rows,
+keep one row per retailer (live before estimate, then cheapest), flag
+outliers by median absolute deviation, sort, and compute min/max/average
+over the rest. Reported: best-of-repeat time for each, split for the table
+into building the frame from the row dicts and the analysis itself (what
+re-ranking an existing frame costs), speed-ups, and what
+the page would send: the number of widgets the old per-row layout created
+versus the Arrow bytes of the single table that replaces them.
+"""
+import argparse
+import json
+import math
+import statistics
+import time
+
+import numpy as np
+import pyarrow as pa
+
+import config
+from price_table import analyse, to_frame
+
+
+def synthetic_rows(count, retailers, seed):
+    rng = np.random.default_rng(seed)
+    prices = np.exp(rng.normal(np.log(25000), 0.15, count)).round()
+    wild = rng.random(count) < 0.01
+    prices[wild] *= rng.choice([0.01, 10.0], wild.sum())
+    rows = []
+    for i in range(count):
+        price = prices[i] if rng.random() > 0.01 else rng.choice([None, 0, "call for price"])
+        rows.append({"retailer": f"Retailer {i % retailers}", "price": price, "condition": "new",
+                     "url": f"https://shop{i % retailers}.example", "availability": "in stock", "discount": "",
+                     "source": "groq" if rng.random() < 0.7 else "amazon"})
+    return rows
+
+
+def python_analyse(retailers, z=None, ratio=None):
+    """The same steps as price_table.analyse written as loops over dicts, like render_price_results used to"""
+    z = config.PRICE_OUTLIER_Z if z is None else z
+    ratio = config.PRICE_OUTLIER_RATIO if ratio is None else ratio
+    valid = [r for r in retailers if isinstance(r.get('price'), (int, float)) and r['price'] > 0 and r.get('retailer')]
+    by_retailer = {}
+    for row in sorted(valid, key=lambda r: (r.get('source', 'groq') == 'groq', r['price'])):
+        by_retailer.setdefault(row['retailer'].lower(), row)
+    rows = list(by_retailer.values())
+    logs = [math.log(r['price']) for r in rows]
+    median = statistics.median(logs) if logs else 0.0
+    mad = statistics.median([abs(v - median) for v in logs]) * 1.4826 if logs else 0.0
+    kept = []
+    for row, value in zip(rows, logs):
+        distance = abs(value - median)
+        if len(rows) >= 4 and (distance > math.log(ratio) or (mad > 0 and distance / mad > z)):
+            continue
+        kept.append(row)
+    kept.sort(key=lambda r: r['price'])
+    prices = [r['price'] for r in kept]
+    return kept, {"min": min(prices), "max": max(prices), "mean": sum(prices) / len(prices)}
+
+
+def best_of(repeat, fn, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--retailers", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.rows, args.retailers, args.seed)
+    loop_s, (kept, loop_summary) = best_of(args.repeat, python_analyse, rows)
+    table_s, table = best_of(args.repeat, analyse, rows)
+    # No dedupe: everything the page would have drawn
+    frame_s, frame = best_of(args.repeat, to_frame, rows)
+    analyse_s, _ = best_of(args.repeat, analyse, frame)
+    summary = table.summary()
+
+    report = {
+        "rows": args.rows,
+        "python_ms": round(loop_s * 1000, 2),
+        "price_table_ms": round(table_s * 1000, 2),
+        "to_frame_ms": round(frame_s * 1000, 2),
+        "analyse_frame_ms": round(analyse_s * 1000, 2),
+        "speedup": round(loop_s / table_s, 1),
+        "speedup_from_frame": round(loop_s / analyse_s, 1),
+        "same_result": (len(kept) == len(table.valid) and math.isclose(loop_summary["mean"], summary["mean"])),
+        "kept": len(table.valid),
+        "outliers": table.outliers,
+        "duplicates": table.duplicates,
+        "invalid": table.invalid,
+        "page": {
+            # Three columns, markdown, caption, price, link button and divider per row
+            "per_row_widgets": args.rows * 8,
+            "table_arrow_bytes": pa.Table.from_pandas(frame).nbytes,
+            "dict_rows_bytes": len(json.dumps(rows, default=float).encode()),
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
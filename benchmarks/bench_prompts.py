@@ -0,0 +1,144 @@
+"""
+A/B comparison of the prompt template versions in prompts.py.
+
+    python -m benchmarks.bench_prompts [--runs 10] [--malformed 0.1] [--token-ms 4]
+    python -m benchmarks.bench_prompts --live     # real Groq, uses GROQ_API_KEY
+
+Each version runs the same single-product, multi-product and price requests
+without caches. Reported per version and request: prompt and completion
+tokens from the API's usage field next to the estimate made before the call
+(prompt tokens, and the max_tokens budget), median latency, requests sent,
+parse failures, and (against the stub) replies whose parsed fields differ
+from the v1 reply.
+Against the stub, replies take --token-ms per completion token to generate,
+so shorter replies finish sooner, and --malformed makes that share of them
+unparseable.
+
+The stub shows what each version costs, not how well the model follows it:
+its replies are right whatever the prompt. v1 stays the default
+(PROMPT_VERSION) until a --live run shows v2 or v3 extracting the same
+products and prices; record that run's report with the change of default.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("PRICE_FINDER_DATA_DIR", tempfile.mkdtemp(prefix="bench-prompts-"))
+# Every identification is a new photo to the caches
+os.environ["VISUAL_INDEX"] = "0"
+
+QUERIES = ("Sony WH-1000XM5 headphones", "Apple iPhone 15 128GB", "Nike Air Max 270", "Prestige pressure cooker 5L")
+
+
+def malformed_reply(rate, seed=0):
+    from benchmarks.groq_stub import default_reply
+
+    rng = random.Random(seed)
+
+    def reply(payload):
+        if rng.random() < rate:
+            return "Sure! Here are the details you asked for, formatted nicely."
+        return default_reply(payload)
+    return reply
+
+
+def summarise(samples, reference=None):
+    usage = [s["usage"] for s in samples]
+    summary = {name: round(statistics.mean(u.get(name, 0) for u in usage), 1)
+               for name in ("prompt_tokens", "estimated_prompt_tokens", "completion_tokens",
+                            "completion_budget")}
+    summary["latency_ms"] = round(statistics.median(s["seconds"] for s in samples) * 1000, 1)
+    summary["failures"] = sum(s["value"] is None for s in samples)
+    if reference is not None:
+        summary["differs_from_v1"] = sum(s["value"] is not None and s["value"] != reference for s in samples)
+    return summary
+
+
+def timed(fn):
+    start = time.perf_counter()
+    value, usage = fn()
+    return {"value": value, "usage": usage, "seconds": time.perf_counter() - start}
+
+
+def run_version(version, api_key, image, runs, references, stub=None):
+    import config
+    from cache import get_identification_cache
+    from core import identify_product, identify_products, request_price_estimates
+    from llm_json import LLMJSONError
+
+    def identify():
+        result = identify_product(image, api_key, stream=False, check_quality=False)
+        return result.product_info, result.usage
+
+    def identify_all():
+        result = identify_products(image, api_key, detector="model", check_quality=False)
+        return ([(item.product_info, item.box) for item in result.items] if result.ok else None), result.usage
+
+    def prices(query):
+        usage = {}
+        try:
+            results, _ = request_price_estimates(query, api_key, usage)
+        except LLMJSONError:
+            results = None
+        return (results["retailers"] if results else None), usage
+
+    config.PROMPT_VERSION = version
+    requests_before = stub.requests if stub else 0
+    samples = {"identify": [], "identify_all": [], "pricing": []}
+    for run in range(runs):
+        get_identification_cache().clear()
+        samples["identify"].append(timed(identify))
+        samples["identify_all"].append(timed(identify_all))
+        samples["pricing"].append(timed(lambda: prices(QUERIES[run % len(QUERIES)])))
+    if version == "v1":
+        # The v1 replies are what the other versions must reproduce
+        for kind, runs_of_kind in samples.items():
+            references[kind] = next((s["value"] for s in runs_of_kind if s["value"] is not None), None)
+    # A live model words each reply differently, so only stub replies are compared
+    report = {kind: summarise(values, references.get(kind) if stub else None) for kind, values in samples.items()}
+    if stub:
+        report["requests"] = stub.requests - requests_before
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--malformed", type=float, default=0.1, help="share of unparseable stub replies")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub time to first token (s)")
+    parser.add_argument("--token-ms", type=float, default=4.0, help="stub generation time per completion token")
+    parser.add_argument("--live", action="store_true", help="call the real Groq API instead of the stub")
+    args = parser.parse_args()
+
+    stub = None
+    if not args.live:
+        from benchmarks.groq_stub import GroqStub
+
+        stub = GroqStub(latency=args.latency, reply=malformed_reply(args.malformed), chunk_chars=4,
+                        chunk_delay=args.token_ms / 1000).start()
+        os.environ["GROQ_BASE_URL"] = stub.base_url
+        os.environ["GROQ_REQUESTS_PER_MINUTE"] = os.environ["GROQ_TOKENS_PER_MINUTE"] = "0"
+    # Imported after the environment points at the stub
+    import config
+    from benchmarks.bench_image_prep import synthetic_photo
+    from prompts import PROMPTS
+
+    api_key = "bench" if stub else config.load_api_key()
+    if not api_key:
+        parser.error("GROQ_API_KEY not found in the environment or .streamlit/secrets.toml")
+    image = synthetic_photo(1280, 960)
+    references, report = {}, {}
+    # v1 first: it supplies the reference replies
+    for version in PROMPTS:
+        report[version] = run_version(version, api_key, image, args.runs, references, stub)
+    print(json.dumps(report, indent=2))
+    if stub:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
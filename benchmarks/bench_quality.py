@@ -0,0 +1,127 @@
+"""
+The local photo quality gate: what it catches, what it lets through and what it costs.
+
+    python -m benchmarks.bench_quality [--repeat 5] [--latency 0.05]
+
+Every sample photo from benchmarks/data/images is used as taken ("good") and
+spoiled the ways phone photos go wrong: camera shake ("blurry", a blur of
+1/400 of the long side), a dark room ("dark"), a window or flash behind the
+product ("overexposed"), and a finger over the lens or a shot of a bare wall
+("blank"). A lighter blur ("soft") is reported without an expectation; it is
+where the sharpness threshold sits. Reported per class: photos passed and
+rejected with the reason, and the range of each measurement; then the
+false rejects of good photos, the time of assess_quality per resolution
+(p50/p95), and the vision calls made through identify_product against a
+local Groq stub with the gate on and off, every photo uploaded for the
+first time (a blurred copy of a photo already identified would otherwise
+share its cache entry and cost nothing either way).
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+from PIL import Image, ImageEnhance, ImageFilter
+
+from benchmarks.corpus import corpus
+from benchmarks.groq_stub import GroqStub
+
+EXPECTED = {"good": None, "blurry": "blurry", "dark": "too dark", "overexposed": "overexposed", "blank": "blank"}
+MEASURES = ("brightness", "contrast", "clipped_dark", "clipped_bright", "edge_density", "sharpness")
+
+
+def variants(image):
+    """{class: image} for one photo"""
+    blur = max(image.size) / 400
+    rng = np.random.default_rng(0)
+    wall = np.full((image.height, image.width, 3), 150, dtype=np.float32) + rng.normal(0, 2.5, (image.height, image.width, 3))
+    return {
+        "good": image,
+        "soft": image.filter(ImageFilter.GaussianBlur(blur / 2)),
+        "blurry": image.filter(ImageFilter.GaussianBlur(blur)),
+        "dark": ImageEnhance.Brightness(image).enhance(0.12),
+        "overexposed": ImageEnhance.Brightness(image).enhance(2.5),
+        "blank": Image.fromarray(wall.clip(0, 255).astype(np.uint8)),
+    }
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    os.environ["PRICE_FINDER_DATA_DIR"] = tempfile.mkdtemp(prefix="bench-quality-")
+    # Every photo is new to the caches, so each one that passes costs exactly one call
+    os.environ["VISUAL_INDEX"] = "0"
+    os.environ["GROQ_REQUESTS_PER_MINUTE"] = os.environ["GROQ_TOKENS_PER_MINUTE"] = "0"
+    stub = GroqStub(latency=args.latency).start()
+    os.environ["GROQ_BASE_URL"] = stub.base_url
+    # Imported after the environment points at the stub and a scratch data directory
+    from cache import get_identification_cache
+    from core import identify_product, quality_gate_stats
+    from image_prep import assess_quality
+
+    photos = []
+    for name, path in corpus():
+        with Image.open(path) as image:
+            image.load()
+        for label, variant in variants(image).items():
+            photos.append((name, label, variant))
+
+    classes, timings = {}, {}
+    for name, label, image in photos:
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            report = assess_quality(image)
+            times.append((time.perf_counter() - start) * 1000)
+        timings.setdefault(name.split("-")[-1], []).append(statistics.median(times))
+        stats = classes.setdefault(label, {"photos": 0, "outcomes": Counter(), "measures": {m: [] for m in MEASURES}})
+        stats["photos"] += 1
+        stats["outcomes"][report.problems[0] if report.problems else "passed"] += 1
+        for measure in MEASURES:
+            stats["measures"][measure].append(getattr(report, measure))
+
+    report = {"classes": {}}
+    for label, stats in classes.items():
+        expected = EXPECTED.get(label, "")
+        report["classes"][label] = {
+            "photos": stats["photos"],
+            "outcomes": dict(stats["outcomes"]),
+            "correct": None if expected == "" else stats["outcomes"][expected or "passed"],
+            "range": {m: [round(min(v), 4), round(max(v), 4)] for m, v in stats["measures"].items()},
+        }
+    good = report["classes"]["good"]
+    report["false_rejects"] = good["photos"] - good["correct"]
+    spoiled = [label for label, expected in EXPECTED.items() if expected]
+    report["spoiled_caught"] = f"{sum(report['classes'][l]['correct'] for l in spoiled)}/" \
+                               f"{sum(report['classes'][l]['photos'] for l in spoiled)}"
+    report["assess_ms"] = {size: {"p50": round(percentile(values, 0.5), 2), "p95": round(percentile(values, 0.95), 2)}
+                           for size, values in timings.items()}
+
+    calls = {}
+    for check_quality in (True, False):
+        calls_before = stub.requests
+        for _, _, image in photos:
+            get_identification_cache().clear()
+            identify_product(image, "bench-key", stream=False, check_quality=check_quality)
+        calls["with_gate" if check_quality else "without_gate"] = stub.requests - calls_before
+    gate = quality_gate_stats()
+    report["vision_calls"] = dict(calls, photos=len(photos), avoided=calls["without_gate"] - calls["with_gate"],
+                                  rejected_by_problem=gate["problems"])
+    print(json.dumps(report, indent=2))
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
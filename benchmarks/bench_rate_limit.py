@@ -0,0 +1,144 @@
+"""
+Interactive sessions and batch work sharing one Groq quota, with and without the fair scheduler.
+
+    python -m benchmarks.bench_rate_limit [--sessions 6] [--batch-workers 4] [--duration 30]
+        [--rpm 120] [--tpm 60000]
+
+The local Groq stub enforces --rpm/--tpm over a sliding minute and answers
+429 once they are used up. Interactive sessions upload images (identify, then
+price) in a loop while batch workers price queries as fast as they can.
+"unscheduled" relies on the client's retries alone; "scheduled" gives the
+client the same quota so every call waits its turn in the FairScheduler.
+Reported per mode: 429s returned by the stub, successful Groq calls per
+minute, interactive latency and how evenly sessions were served, and batch
+items done and shed.
+"""
+import argparse
+import io
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("PRICE_FINDER_DATA_DIR", tempfile.mkdtemp(prefix="bench-rate-limit-"))
+
+from PIL import Image  # noqa: E402
+
+import config  # noqa: E402
+import groq_client  # noqa: E402
+from benchmarks.bench_pipeline import add_banner, percentiles, unique_replies  # noqa: E402
+from benchmarks.corpus import corpus  # noqa: E402
+from benchmarks.groq_stub import GroqStub  # noqa: E402
+from cache import get_identification_cache, get_price_cache  # noqa: E402
+from core import identify_product, lookup_prices  # noqa: E402
+from rate_limit import BATCH, request_context  # noqa: E402
+
+API_KEY = "bench"
+
+
+def run_mode(scheduled, args, images):
+    get_identification_cache().clear()
+    get_price_cache().store.clear()
+    stub = GroqStub(latency=args.latency, rpm=args.rpm, tpm=args.tpm, reply=unique_replies(), seed=0)
+    limits = (args.rpm, args.tpm) if scheduled else (0, 0)
+    deadline = time.monotonic() + args.duration
+    seeds = itertools.count()
+    lock = threading.Lock()
+    interactive = {"latency": [], "failed": 0, "per_session": {}}
+    batch = {"done": 0, "failed": 0, "shed": 0}
+
+    def session(index):
+        done = 0
+        for i in itertools.count():
+            if time.monotonic() >= deadline:
+                break
+            with lock:
+                seed = next(seeds)
+            image = add_banner(Image.open(io.BytesIO(images[(index + i) % len(images)])).convert("RGB"), seed)
+            start = time.perf_counter()
+            with request_context(f"session-{index}"):
+                identification = identify_product(image, API_KEY, stream=False)
+                lookup = identification.ok and lookup_prices(identification.product_info["search_query"], API_KEY)
+            with lock:
+                if lookup and lookup.ok:
+                    interactive["latency"].append(time.perf_counter() - start)
+                    done += 1
+                else:
+                    interactive["failed"] += 1
+            # Users take a moment before the next upload
+            time.sleep(args.think_time)
+        interactive["per_session"][index] = done
+
+    def batch_worker(index):
+        for i in itertools.count():
+            if time.monotonic() >= deadline:
+                break
+            with request_context("batch", priority=BATCH):
+                lookup = lookup_prices(f"catalogue item {index}-{i}", API_KEY)
+            with lock:
+                if lookup.ok:
+                    batch["done"] += 1
+                elif "rate limited" in (lookup.error or ""):
+                    batch["shed"] += 1
+                    time.sleep(1)
+                else:
+                    batch["failed"] += 1
+
+    with stub:
+        client = groq_client.GroqClient(API_KEY, base_url=stub.base_url, requests_per_minute=limits[0],
+                                        tokens_per_minute=limits[1])
+        groq_client._clients[API_KEY] = client
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=args.sessions + args.batch_workers) as pool:
+            futures = [pool.submit(session, i) for i in range(args.sessions)]
+            futures += [pool.submit(batch_worker, i) for i in range(args.batch_workers)]
+            for future in futures:
+                future.result()
+        elapsed = time.monotonic() - start
+        stats = stub.stats()
+
+    served = list(interactive["per_session"].values())
+    successful_calls = stats["requests"] - stats["rate_limited"] - stats["errors"]
+    return {
+        "stub_429s": stats["rate_limited"],
+        "groq_calls_per_minute": round(successful_calls / elapsed * 60, 1),
+        "interactive_done": len(interactive["latency"]),
+        "interactive_failed": interactive["failed"],
+        "interactive_latency": percentiles(interactive["latency"]),
+        "uploads_per_session_min_max": [min(served, default=0), max(served, default=0)],
+        "batch_done": batch["done"],
+        "batch_shed": batch["shed"],
+        "batch_failed": batch["failed"],
+        "scheduler": {model: s.stats() for model, s in client.schedulers.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=6)
+    parser.add_argument("--batch-workers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=30, help="seconds per mode")
+    parser.add_argument("--rpm", type=int, default=120, help="stub quota: requests per minute per model")
+    parser.add_argument("--tpm", type=int, default=60000, help="stub quota: tokens per minute per model")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub time to first byte (s)")
+    parser.add_argument("--think-time", type=float, default=1.0, help="pause between a session's uploads (s)")
+    args = parser.parse_args()
+
+    config.VISUAL_INDEX = False
+    # Short waits so shedding shows up within a short run
+    config.GROQ_BATCH_MAX_WAIT = 10
+    images = []
+    for name, path in corpus():
+        if name.endswith("-small"):
+            with open(path, "rb") as f:
+                images.append(f.read())
+
+    report = {mode: run_mode(mode == "scheduled", args, images) for mode in ("unscheduled", "scheduled")}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
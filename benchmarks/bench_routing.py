@@ -0,0 +1,105 @@
+"""
+Price-search latency with one Groq route versus the router over a pool of keys.
+
+    python -m benchmarks.bench_routing [--calls 200] [--concurrency 4] [--latency 0.2]
+        [--tail-rate 0.1] [--tail-latency 2.0] [--error-rate 0.3]
+
+Three local Groq stubs stand in for three API keys: "fast" answers in
+--latency, "tail" does too except for --tail-rate of requests that take
+--tail-latency longer, and "flaky" answers --error-rate of requests with a
+500/503. Each mode makes the same price-search calls:
+
+    single   every call on the "tail" key, as before routing
+    routed   the router over all three keys, failing over on errors
+    hedged   as routed, plus a backup request once a call outlives its route's p95
+
+Reported per mode: p50/p95/p99 latency, failed calls, failovers, hedges (and
+how many the backup won) and the calls each key served.
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import groq_client
+from benchmarks.bench_pipeline import percentiles
+from benchmarks.groq_stub import GroqStub
+from core import build_price_payload
+from groq_client import GroqAPIError
+from router import Router
+
+MODEL = "llama-3.3-70b-versatile"
+
+
+def run_mode(mode, args, stubs):
+    names = ["tail"] if mode == "single" else list(stubs)
+    for name in names:
+        key = (f"bench-{name}", stubs[name].base_url)
+        groq_client._clients[key] = groq_client.GroqClient(*key, requests_per_minute=0, tokens_per_minute=0)
+    router = Router([(f"bench-{name}", stubs[name].base_url) for name in names], {"pricing": [MODEL]},
+                    hedge=mode == "hedged", hedge_budget=args.hedge_budget)
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies, failed = [], 0
+
+    def call():
+        nonlocal failed
+        with lock:
+            n = next(counter)
+        start = time.perf_counter()
+        try:
+            router.chat_completion(build_price_payload(f"benchmark product {n}"), endpoint="pricing")
+        except GroqAPIError:
+            with lock:
+                failed += 1
+            return
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for future in [pool.submit(call) for _ in range(args.calls)]:
+            future.result()
+    stats = router.stats()
+    return {
+        "latency": percentiles(latencies),
+        "failed": failed,
+        "failovers": stats["failovers"],
+        "hedges": stats["hedges"],
+        "hedge_wins": stats["hedge_wins"],
+        "calls_per_key": {route.api_key: route.calls for route in router.routes["pricing"]},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200, help="price searches per mode")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub time to first byte (s)")
+    parser.add_argument("--tail-rate", type=float, default=0.1, help="share of slow requests on the tail key")
+    parser.add_argument("--tail-latency", type=float, default=2.0, help="extra seconds for a slow request")
+    parser.add_argument("--error-rate", type=float, default=0.3, help="share of failed requests on the flaky key")
+    parser.add_argument("--hedge-budget", type=float, default=0.1, help="most hedged calls, as a share of calls")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stubs = {
+        "fast": GroqStub(latency=args.latency, seed=args.seed),
+        "tail": GroqStub(latency=args.latency, tail_rate=args.tail_rate, tail_latency=args.tail_latency,
+                         seed=args.seed + 1),
+        "flaky": GroqStub(latency=args.latency, error_rate=args.error_rate, error_statuses=(500, 503),
+                          seed=args.seed + 2),
+    }
+    for stub in stubs.values():
+        stub.start()
+    try:
+        report = {mode: run_mode(mode, args, stubs) for mode in ("single", "routed", "hedged")}
+    finally:
+        for stub in stubs.values():
+            stub.stop()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
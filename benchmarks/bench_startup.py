@@ -0,0 +1,78 @@
+"""
+Import time of the app's entry points, from `python -X importtime`, and what pre-warming costs.
+
+    python -m benchmarks.bench_startup [--repeat 5] [--budget-ms 150]
+
+Each module is imported in a fresh interpreter --repeat times (bytecode is
+compiled first, as prewarm.py does for containers). Reported per module: the
+best cumulative import time, the heavy third-party packages it pulled in and
+the slowest modules by self time; then the time of each prewarm.py step.
+The headless modules (core, batch, watchlist, catalogue, price_sources) must
+not load any heavy package and core must import within --budget-ms; the
+script exits with status 1 when either check fails.
+"""
+import argparse
+import compileall
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ("config", "core", "batch", "watchlist", "catalogue", "price_sources", "price_table", "main")
+HEADLESS = ("core", "batch", "watchlist", "catalogue", "price_sources")
+HEAVY = ("streamlit", "pandas", "numpy", "plotly", "cv2", "sklearn", "requests", "PIL", "pyarrow")
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def importtime(module):
+    """[(self_us, cumulative_us, depth, name)] for one import of a module in a fresh interpreter"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    return [(int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2, m.group(4))
+            for m in map(LINE.match, result.stderr.splitlines()) if m]
+
+
+def profile(module, repeat):
+    best = None
+    for _ in range(repeat):
+        rows = importtime(module)
+        total = next(cumulative for _, cumulative, depth, name in rows if depth == 0 and name == module)
+        if best is None or total < best[0]:
+            best = (total, rows)
+    total, rows = best
+    loaded = {name.split(".")[0] for _, _, _, name in rows}
+    slowest = sorted(rows, reverse=True)[:5]
+    return {
+        "import_ms": round(total / 1000, 1),
+        "heavy": sorted(loaded & set(HEAVY)),
+        "slowest_self_ms": {name: round(own / 1000, 1) for own, _, _, name in slowest},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=150)
+    args = parser.parse_args()
+
+    compileall.compile_dir(ROOT, quiet=1, rx=re.compile(r"[\\/]\."))
+    report = {"modules": {module: profile(module, args.repeat) for module in MODULES}}
+    env = dict(os.environ, PRICE_FINDER_DATA_DIR=tempfile.mkdtemp(prefix="bench-startup-"))
+    prewarm = subprocess.run([sys.executable, "prewarm.py", "--no-connect"], cwd=ROOT, env=env,
+                             capture_output=True, text=True, check=True)
+    report["prewarm_ms"] = json.loads(prewarm.stdout.strip().splitlines()[-1])
+
+    failures = [f"{module} imports {', '.join(report['modules'][module]['heavy'])}"
+                for module in HEADLESS if report["modules"][module]["heavy"]]
+    if report["modules"]["core"]["import_ms"] > args.budget_ms:
+        failures.append(f"core takes {report['modules']['core']['import_ms']} ms (budget {args.budget_ms} ms)")
+    report["failures"] = failures
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
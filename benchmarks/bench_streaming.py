@@ -0,0 +1,78 @@
+"""
+Time-to-first-result of the identify-then-price flow, sequential vs streamed.
+
+    python -m benchmarks.bench_streaming [--runs 5] [--latency 0.3] [--chunk-delay 0.02]
+
+"sequential" waits for the full vision reply and then runs the price search.
+"streamed" reads the vision reply incrementally and starts the price search
+as soon as search_query is complete. Both run against a local Groq stub that
+simulates time-to-first-byte and per-chunk generation time.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("PRICE_FINDER_DATA_DIR", tempfile.mkdtemp(prefix="bench-streaming-"))
+# Every identification is a new photo to the caches
+os.environ["VISUAL_INDEX"] = "0"
+
+import groq_client  # noqa: E402
+from benchmarks.bench_image_prep import synthetic_photo  # noqa: E402
+from benchmarks.groq_stub import GroqStub  # noqa: E402
+from cache import get_identification_cache, get_price_cache  # noqa: E402
+from core import identify_product, lookup_prices  # noqa: E402
+
+
+def run_once(image, api_key, stream, executor):
+    """Return (seconds to search_query, seconds to price results)"""
+    get_identification_cache().clear()
+    get_price_cache().store.clear()
+    start = time.perf_counter()
+    marks = {}
+    pending = {}
+
+    def on_field(key, value):
+        if key == "search_query" and value not in pending:
+            marks["search_query"] = time.perf_counter() - start
+            pending[value] = executor.submit(lookup_prices, value, api_key)
+
+    identification = identify_product(image, api_key, on_field=on_field if stream else None, stream=stream)
+    query = identification.product_info["search_query"]
+    if query in pending:
+        pending[query].result()
+    else:
+        marks["search_query"] = time.perf_counter() - start
+        lookup_prices(query, api_key)
+    return marks["search_query"], time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.3, help="stub time to first byte (s)")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="stub generation time per chunk (s)")
+    args = parser.parse_args()
+
+    image = synthetic_photo(1280, 960)
+    api_key = "bench"
+    report = {}
+    with GroqStub(latency=args.latency, chunk_chars=4, chunk_delay=args.chunk_delay) as stub, \
+            ThreadPoolExecutor(max_workers=4) as executor:
+        groq_client._clients[api_key] = groq_client.GroqClient(api_key, base_url=stub.base_url,
+                                                           requests_per_minute=0, tokens_per_minute=0)
+        for mode, stream in (("sequential", False), ("streamed", True)):
+            runs = [run_once(image, api_key, stream, executor) for _ in range(args.runs)]
+            report[mode] = {
+                "search_query_ready_ms": round(statistics.median(r[0] for r in runs) * 1000, 1),
+                "prices_ready_ms": round(statistics.median(r[1] for r in runs) * 1000, 1),
+            }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
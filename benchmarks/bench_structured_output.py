@@ -0,0 +1,123 @@
+"""
+Token usage, latency and parse failures with and without structured output.
+
+    python -m benchmarks.bench_structured_output [--runs 10] [--malformed 0.2]
+    python -m benchmarks.bench_structured_output --live     # real Groq, uses GROQ_API_KEY
+
+Each mode ("off", "json_object", "json_schema") runs the same identify and
+price requests without caches and reports the mean prompt/completion tokens
+taken from the API's usage field, median latency, requests sent and how many
+calls still failed to parse. Against the stub, --malformed makes that share of
+replies unparseable to exercise the validation retry; token savings from the
+tighter max_tokens only show up with --live.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("PRICE_FINDER_DATA_DIR", tempfile.mkdtemp(prefix="bench-structured-"))
+# Every identification is a new photo to the caches
+os.environ["VISUAL_INDEX"] = "0"
+
+import config  # noqa: E402
+import groq_client  # noqa: E402
+from benchmarks.bench_image_prep import synthetic_photo  # noqa: E402
+from benchmarks.groq_stub import GroqStub, default_reply  # noqa: E402
+from cache import get_identification_cache  # noqa: E402
+from core import build_identify_payload, build_price_payload, identify_product, request_price_estimates  # noqa: E402
+from llm_json import LLMJSONError  # noqa: E402
+
+MODES = ("off", "json_object", "json_schema")
+QUERIES = ("Sony WH-1000XM5 headphones", "Apple iPhone 15 128GB", "Nike Air Max 270", "Prestige pressure cooker 5L")
+
+
+def malformed_reply(rate, seed=0):
+    rng = random.Random(seed)
+
+    def reply(payload):
+        if rng.random() < rate:
+            return "Sure! Here are the prices you asked for, formatted nicely."
+        return default_reply(payload)
+    return reply
+
+
+def summarise(samples):
+    usage = [s["usage"] for s in samples]
+    return {
+        "prompt_tokens": round(statistics.mean(u.get("prompt_tokens", 0) for u in usage), 1),
+        "completion_tokens": round(statistics.mean(u.get("completion_tokens", 0) for u in usage), 1),
+        "latency_ms": round(statistics.median(s["seconds"] for s in samples) * 1000, 1),
+        "failures": sum(not s["ok"] for s in samples),
+    }
+
+
+def run_mode(mode, api_key, image, runs, stub=None):
+    config.GROQ_RESPONSE_FORMAT = mode
+    requests_before = stub.requests if stub else 0
+    identify, prices = [], []
+    for run in range(runs):
+        get_identification_cache().clear()
+        start = time.perf_counter()
+        identification = identify_product(image, api_key, stream=False)
+        identify.append({"usage": identification.usage, "ok": identification.ok,
+                         "seconds": time.perf_counter() - start})
+
+        usage = {}
+        start = time.perf_counter()
+        try:
+            results, _ = request_price_estimates(QUERIES[run % len(QUERIES)], api_key, usage)
+        except LLMJSONError:
+            results = None
+        prices.append({"usage": usage, "ok": results is not None, "seconds": time.perf_counter() - start})
+
+    report = {
+        "max_tokens": {
+            "vision": build_identify_payload(_Prepared, mode)["max_tokens"],
+            "pricing": build_price_payload(QUERIES[0], mode)["max_tokens"],
+        },
+        "identify": summarise(identify),
+        "pricing": summarise(prices),
+    }
+    if stub:
+        report["requests"] = stub.requests - requests_before
+    return report
+
+
+class _Prepared:
+    """Stand-in PreparedImage for reading payload sizes"""
+    data_url = "data:image/jpeg;base64,"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--malformed", type=float, default=0.2, help="share of unparseable stub replies")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub time to first byte (s)")
+    parser.add_argument("--live", action="store_true", help="call the real Groq API instead of the stub")
+    args = parser.parse_args()
+
+    image = synthetic_photo(1280, 960)
+    report = {}
+    if args.live:
+        api_key = config.load_api_key()
+        if not api_key:
+            parser.error("GROQ_API_KEY not found in the environment or .streamlit/secrets.toml")
+        for mode in MODES:
+            report[mode] = run_mode(mode, api_key, image, args.runs)
+    else:
+        api_key = "bench"
+        with GroqStub(latency=args.latency, reply=malformed_reply(args.malformed)) as stub:
+            groq_client._clients[api_key] = groq_client.GroqClient(api_key, base_url=stub.base_url, max_retries=0,
+                                                               requests_per_minute=0, tokens_per_minute=0)
+            for mode in MODES:
+                report[mode] = run_mode(mode, api_key, image, args.runs, stub)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Query latency and recall of the visual similarity index.
+
+    python -m benchmarks.bench_visual_index [--sizes 10000 100000 1000000] [--products 500]
+
+A few hundred synthetic products are embedded and indexed; the rest of each
+index size is filled with distractor vectors near those embeddings. Queries
+are re-photographed copies of the indexed products (rescaled, recompressed,
+cropped, re-lit) plus products that were never indexed. Reported per size:
+median/p95 query time, recall@1 (the right product is the nearest entry),
+hit rate at the match threshold, and false matches for unseen products.
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageEnhance
+
+import config
+from visual_index import VisualIndex, image_embedding
+
+SHAPES = ("rectangle", "ellipse", "rounded")
+
+
+def product_image(seed, size=(640, 480)):
+    """A distinct product shot per seed: plain backdrop, a few coloured shapes and a label"""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    background = tuple(int(v) for v in rng.integers(150, 256, 3))
+    image = Image.new("RGB", size, background)
+    draw = ImageDraw.Draw(image)
+    for _ in range(rng.integers(2, 5)):
+        x0, y0 = rng.integers(0, width * 2 // 3), rng.integers(0, height * 2 // 3)
+        x1, y1 = x0 + rng.integers(width // 8, width // 2), y0 + rng.integers(height // 8, height // 2)
+        fill = tuple(int(v) for v in rng.integers(0, 256, 3))
+        shape = SHAPES[rng.integers(len(SHAPES))]
+        if shape == "ellipse":
+            draw.ellipse((x0, y0, x1, y1), fill=fill)
+        elif shape == "rounded":
+            draw.rounded_rectangle((x0, y0, x1, y1), radius=20, fill=fill)
+        else:
+            draw.rectangle((x0, y0, x1, y1), fill=fill)
+    draw.text((width // 4, height - 40), f"MODEL {seed}", fill=(20, 20, 20))
+    return image
+
+
+def rephotograph(image, seed):
+    """The same product seen again: rescaled, slightly cropped, re-lit and JPEG recompressed"""
+    rng = np.random.default_rng(seed)
+    width, height = image.size
+    crop = rng.uniform(0, 0.04, 4)
+    image = image.crop((int(crop[0] * width), int(crop[1] * height),
+                        int(width * (1 - crop[2])), int(height * (1 - crop[3]))))
+    scale = rng.uniform(0.5, 1.5)
+    image = image.resize((int(image.width * scale), int(image.height * scale)), Image.BILINEAR)
+    image = ImageEnhance.Brightness(image).enhance(rng.uniform(0.85, 1.15))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=int(rng.integers(60, 90)))
+    return Image.open(io.BytesIO(buffer.getvalue()))
+
+
+def distractors(base, count, rng, batch=100000):
+    """Yield batches of unit vectors scattered around the real embeddings"""
+    for start in range(0, count, batch):
+        n = min(batch, count - start)
+        a, b = base[rng.integers(len(base), size=n)], base[rng.integers(len(base), size=n)]
+        mix = rng.uniform(0.2, 0.8, (n, 1)).astype(np.float32)
+        vectors = mix * a + (1 - mix) * b + rng.normal(0, 0.05, a.shape).astype(np.float32)
+        yield vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def run_size(size, embeddings, queries, unseen, rng, threshold):
+    directory = tempfile.mkdtemp(prefix="bench-visual-")
+    try:
+        index = VisualIndex(directory)
+        index.add_many(embeddings, [{"product": i} for i in range(len(embeddings))])
+        for batch in distractors(embeddings, size - len(embeddings), rng):
+            index.add_many(batch, [{"product": None}] * len(batch))
+
+        start = time.perf_counter()
+        reopened = VisualIndex(directory)
+        open_ms = (time.perf_counter() - start) * 1000
+
+        seconds, correct, hits, false_matches = [], 0, 0, 0
+        for product, query in queries:
+            start = time.perf_counter()
+            (similarity, row_id), = reopened.search(query, k=1)
+            seconds.append(time.perf_counter() - start)
+            correct += row_id == product
+            hits += row_id == product and similarity >= threshold
+        for query in unseen:
+            similarity, _ = reopened.search(query, k=1)[0]
+            false_matches += similarity >= threshold
+        seconds.sort()
+        return {
+            "open_ms": round(open_ms, 1),
+            "query_p50_ms": round(statistics.median(seconds) * 1000, 2),
+            "query_p95_ms": round(seconds[int(len(seconds) * 0.95) - 1] * 1000, 2),
+            "recall_at_1": round(correct / len(queries), 3),
+            "hit_rate_at_threshold": round(hits / len(queries), 3),
+            "false_match_rate": round(false_matches / len(unseen), 3),
+            "index_mb": round(os.path.getsize(os.path.join(directory, "vectors.f32")) / 2 ** 20, 1),
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--threshold", type=float, default=config.VISUAL_MATCH_THRESHOLD)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    images = [product_image(seed) for seed in range(args.products)]
+    start = time.perf_counter()
+    embeddings = np.stack([image_embedding(image) for image in images])
+    embed_ms = (time.perf_counter() - start) * 1000 / len(images)
+
+    picks = rng.choice(args.products, size=min(args.queries, args.products), replace=False)
+    queries = [(int(p), image_embedding(rephotograph(images[p], seed=int(p)))) for p in picks]
+    unseen = [image_embedding(rephotograph(product_image(args.products + i), seed=i)) for i in range(args.queries)]
+
+    report = {"embedding_ms": round(embed_ms, 2), "threshold": args.threshold}
+    for size in args.sizes:
+        report[str(size)] = run_size(max(size, args.products), embeddings, queries, unseen, rng, args.threshold)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
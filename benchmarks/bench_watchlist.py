@@ -0,0 +1,132 @@
+"""
+Background re-pricing of watched products versus every watcher re-running the search.
+
+    python -m benchmarks.bench_watchlist [--watchers 500] [--products 40] [--rpm 600] [--latency 0.05]
+
+Watchers save one of --products products each, typed the way people do
+(different case, word order, punctuation), with targets either side of the
+stub's best price. One scheduler pass re-prices every due product through a
+local Groq stub, paced at --rpm, and delivers alerts to a JSONL file and to a
+local webhook receiver. A second pass with nothing due and a third after the
+interval (prices unchanged) check that products are not re-priced early and
+watchers are not alerted twice. Reported: Groq calls per pass against the
+calls of one manual re-search per watcher, pass time against what --rpm
+allows, and alerts written and received.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.groq_stub import PRICE_REPLY, GroqStub
+
+
+class WebhookReceiver:
+    """Collects the JSON bodies POSTed to it"""
+
+    def __init__(self):
+        self.received = []
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                receiver.received.append(json.loads(body))
+                self.send_response(204)
+                self.end_headers()
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/alerts"
+
+
+def typed(name, rng):
+    words = name.split()
+    if rng.random() < 0.5:
+        rng.shuffle(words)
+    text = " ".join(words)
+    return text.lower() if rng.random() < 0.5 else text + rng.choice(("", "!", " ,"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--watchers", type=int, default=500)
+    parser.add_argument("--products", type=int, default=40)
+    parser.add_argument("--rpm", type=int, default=600)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="bench-watch-")
+    os.environ["PRICE_FINDER_DATA_DIR"] = data_dir
+    stub = GroqStub(latency=args.latency).start()
+    os.environ["GROQ_BASE_URL"] = stub.base_url
+    # The watch scheduler's own --rpm is the pacing under test, not the client's quota
+    os.environ["GROQ_REQUESTS_PER_MINUTE"] = os.environ["GROQ_TOKENS_PER_MINUTE"] = "0"
+    # Imported after the environment points at the stub and a scratch data directory
+    from watchlist import FileSink, WatchScheduler, WebhookSink, get_watchlist
+
+    class BothSinks:
+        def __init__(self, *sinks):
+            self.sinks = sinks
+
+        def send(self, alert):
+            for sink in self.sinks:
+                sink.send(alert)
+
+    rng = random.Random(args.seed)
+    best = min(row["price"] for row in PRICE_REPLY)
+    names = [f"Product {n} Model X{n}" for n in range(args.products)]
+    watchlist = get_watchlist()
+    expected = 0
+    for watcher in range(args.watchers):
+        target = best + rng.choice((-2000, -500, 500, 2000))
+        expected += target >= best
+        watchlist.add(f"user-{watcher}", typed(rng.choice(names), rng), target)
+
+    receiver = WebhookReceiver()
+    alerts_path = os.path.join(data_dir, "alerts.jsonl")
+    scheduler = WatchScheduler(watchlist, "bench-key", BothSinks(FileSink(alerts_path), WebhookSink(receiver.url)),
+                               requests_per_minute=args.rpm, tick=60)
+
+    passes = []
+    for label, interval in (("first", None), ("nothing_due", None), ("after_interval", 1e-6)):
+        if interval:
+            scheduler.interval = interval
+        before, calls_before = stub.requests, scheduler.counts["calls"]
+        start = time.perf_counter()
+        products = scheduler.run_once()
+        passes.append({"pass": label, "products": products, "groq_calls": stub.requests - before,
+                       "seconds": round(time.perf_counter() - start, 2),
+                       "paced_minimum_s": round(max(0, scheduler.counts["calls"] - calls_before - 1) * 60 / args.rpm, 2)})
+
+    with open(alerts_path, encoding="utf-8") as f:
+        written = sum(1 for _ in f)
+    report = {
+        "watchers": args.watchers,
+        **watchlist.stats(),
+        "calls_if_each_watcher_searched": args.watchers,
+        "passes": passes,
+        "alerts_expected": expected,
+        "alerts_file": written,
+        "alerts_webhook": len(receiver.received),
+        "scheduler": scheduler.counts,
+    }
+    print(json.dumps(report, indent=2))
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
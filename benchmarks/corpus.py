@@ -0,0 +1,86 @@
+"""
+Sample product photos for the pipeline benchmark.
+
+    python -m benchmarks.corpus          # (re)write benchmarks/data/images
+
+Each product is rendered at several resolutions, from a small upload to a
+full-size phone photo, and saved as JPEG the way cameras deliver them. The
+files are checked in so every commit is measured on the same bytes; this
+script only documents and reproduces how they were made.
+"""
+import os
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "images")
+RESOLUTIONS = {"small": (640, 480), "medium": (1600, 1200), "large": (4032, 3024)}
+PRODUCTS = ("headphones", "sneaker", "bottle", "watch")
+
+
+def render_product(product, size, seed):
+    """A lit backdrop with one product-like object and its label, drawn resolution-independently"""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    # Soft vignette backdrop in a per-product tint
+    tint = rng.uniform(0.8, 1.0, 3)
+    falloff = 1 - 0.35 * (((x / width - 0.5) ** 2 + (y / height - 0.45) ** 2) * 2)
+    backdrop = (235 * falloff[..., None] * tint).clip(0, 255).astype(np.uint8)
+    image = Image.fromarray(backdrop)
+    draw = ImageDraw.Draw(image)
+
+    unit = min(width, height) / 100
+    cx, cy = width / 2, height / 2
+    body = tuple(int(v) for v in rng.integers(20, 200, 3))
+    accent = tuple(int(v) for v in rng.integers(0, 256, 3))
+    if product == "headphones":
+        draw.arc((cx - 30 * unit, cy - 35 * unit, cx + 30 * unit, cy + 25 * unit), 180, 360, fill=body,
+                 width=int(5 * unit))
+        for side in (-1, 1):
+            draw.rounded_rectangle((cx + side * 30 * unit - 9 * unit, cy - 5 * unit,
+                                    cx + side * 30 * unit + 9 * unit, cy + 22 * unit), radius=int(4 * unit), fill=body)
+    elif product == "sneaker":
+        draw.rounded_rectangle((cx - 38 * unit, cy, cx + 38 * unit, cy + 16 * unit), radius=int(6 * unit),
+                               fill=(245, 245, 245))
+        draw.polygon([(cx - 36 * unit, cy + 2 * unit), (cx - 20 * unit, cy - 22 * unit), (cx + 10 * unit, cy - 18 * unit),
+                      (cx + 36 * unit, cy + 2 * unit)], fill=body)
+        draw.line((cx - 15 * unit, cy - 6 * unit, cx + 20 * unit, cy - 2 * unit), fill=accent, width=int(3 * unit))
+    elif product == "bottle":
+        draw.rounded_rectangle((cx - 12 * unit, cy - 25 * unit, cx + 12 * unit, cy + 38 * unit), radius=int(5 * unit),
+                               fill=body)
+        draw.rectangle((cx - 5 * unit, cy - 36 * unit, cx + 5 * unit, cy - 25 * unit), fill=accent)
+        draw.rectangle((cx - 12 * unit, cy, cx + 12 * unit, cy + 14 * unit), fill=(240, 240, 230))
+    else:
+        draw.rectangle((cx - 8 * unit, cy - 45 * unit, cx + 8 * unit, cy + 45 * unit), fill=body)
+        draw.ellipse((cx - 20 * unit, cy - 20 * unit, cx + 20 * unit, cy + 20 * unit), fill=(200, 200, 205))
+        draw.ellipse((cx - 16 * unit, cy - 16 * unit, cx + 16 * unit, cy + 16 * unit), fill=accent)
+    draw.text((cx - 15 * unit, cy + 40 * unit), f"{product.upper()} {seed}", fill=(30, 30, 30))
+
+    # Lens softness plus light sensor noise, as in a real photo
+    image = image.filter(ImageFilter.GaussianBlur(max(1, unit / 8)))
+    noise = rng.normal(0, 2.5, (height, width, 3))
+    return Image.fromarray((np.asarray(image, dtype=np.float32) + noise).clip(0, 255).astype(np.uint8))
+
+
+def image_path(product, resolution):
+    return os.path.join(IMAGE_DIR, f"{product}-{resolution}.jpg")
+
+
+def corpus():
+    """[(name, path)] of every sample image, smallest resolution first"""
+    return [(f"{product}-{resolution}", image_path(product, resolution))
+            for resolution in RESOLUTIONS for product in PRODUCTS]
+
+
+def build_corpus(quality=85):
+    os.makedirs(IMAGE_DIR, exist_ok=True)
+    for seed, product in enumerate(PRODUCTS):
+        for resolution, size in RESOLUTIONS.items():
+            render_product(product, size, seed).save(image_path(product, resolution), "JPEG", quality=quality)
+
+
+if __name__ == "__main__":
+    build_corpus()
+    for name, path in corpus():
+        print(f"{name:20} {os.path.getsize(path) / 1024:8.0f} KB")
@@ -0,0 +1,366 @@
+"""
+Local stand-in for the Groq chat-completions endpoint.
+
+    python -m benchmarks.groq_stub --port 8787 --latency 0.3
+    GROQ_BASE_URL=http://127.0.0.1:8787/openai/v1 streamlit run main.py
+
+Also usable in-process:
+
+    with GroqStub(latency=0.1, fail_statuses=[429, 503]) as stub:
+        client = GroqClient("test", base_url=stub.base_url)
+
+Random faults for load tests: error_rate answers that share of requests with
+one of error_statuses, and malformed_rate mangles that share of replies the
+way models sometimes do (prose around the JSON, fences, truncation).
+rpm and tpm enforce a per-model quota over a sliding minute the way Groq
+does, answering 429 with Retry-After once it is used up. tail_rate adds
+tail_latency seconds to that share of requests, for a slow long tail.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_json import COMPACT_CODES, COMPACT_PRODUCT_KEYS, COMPACT_RETAILER_KEYS
+
+PRODUCT_REPLY = {
+    "search_query": "Sony WH-1000XM5 headphones",
+    "product_name": "Sony WH-1000XM5 Wireless Headphones",
+    "brand": "Sony",
+    "category": "electronics",
+    "description": "Over-ear noise cancelling headphones in black"
+}
+
+PRICE_REPLY = [
+    {"retailer": "Amazon India", "price": 26990, "condition": "new", "url": "https://amazon.in",
+     "availability": "in stock", "discount": "10% off on HDFC cards"},
+    {"retailer": "Flipkart", "price": 27490, "condition": "new", "url": "https://flipkart.com",
+     "availability": "in stock", "discount": "5% cashback on Axis cards"},
+    {"retailer": "Myntra", "price": 28990, "condition": "new", "url": "https://myntra.com",
+     "availability": "limited stock", "discount": ""},
+    {"retailer": "Ajio", "price": 29990, "condition": "new", "url": "https://ajio.com",
+     "availability": "in stock", "discount": ""},
+    {"retailer": "Meesho", "price": 24999, "condition": "new", "url": "https://meesho.com",
+     "availability": "check availability", "discount": "COD available"},
+]
+
+
+# Items for multi-product requests, laid out left to right
+MULTI_PRODUCT_REPLY = [
+    dict(PRODUCT_REPLY, box=[0.04, 0.26, 0.32, 0.64]),
+    {"search_query": "Nike Air Max 270 sneakers", "product_name": "Nike Air Max 270", "brand": "Nike",
+     "category": "fashion", "description": "Running sneakers with a white sole", "box": [0.36, 0.43, 0.65, 0.81]},
+    {"search_query": "Milton Thermosteel 1 litre bottle", "product_name": "Milton Thermosteel Flask 1000 ml",
+     "brand": "Milton", "category": "home", "description": "Insulated steel bottle with a label band",
+     "box": [0.69, 0.26, 0.97, 0.64]},
+]
+
+
+# Roughly what Groq bills for one image in a vision request
+IMAGE_TOKENS = 1000
+
+
+def compact(value, keys):
+    """A reply the way a model writes it when asked for compact output (prompts v3)"""
+    if isinstance(value, list):
+        return [compact(item, keys) for item in value]
+    short = {full: key for key, full in keys.items()}
+    codes = {field: {full: code for code, full in mapping.items()} for field, mapping in COMPACT_CODES.items()}
+    return {short.get(key, key): codes[key].get(item, item) if key in codes else item
+            for key, item in value.items() if key != "url"}
+
+
+def default_reply(payload):
+    """
+    Product JSON for vision requests (an items list when asked for every product),
+    a retailers array for everything else;
+    the array is wrapped in {"retailers": ...} when JSON mode is requested.
+    Prompts that ask for short keys get them
+    """
+    prompt = " ".join(part.get("text", "") for message in payload.get("messages", [])
+                      for part in (message["content"] if isinstance(message.get("content"), list)
+                                   else [{"text": message.get("content") or ""}]))
+    short_keys = '"q"' in prompt or '"p"' in prompt
+    for message in payload.get("messages", []):
+        if isinstance(message.get("content"), list):
+            regions = re.search(r"(\d+) numbered boxes", prompt)
+            if regions:
+                items = [dict(item, region=n + 1) for n, item in enumerate(MULTI_PRODUCT_REPLY[:int(regions.group(1))])]
+                reply = {"items": [{k: v for k, v in i.items() if k != "box"} for i in items]}
+            elif '"items"' in prompt:
+                reply = {"items": MULTI_PRODUCT_REPLY}
+            else:
+                reply = PRODUCT_REPLY
+            if short_keys:
+                reply = {"items": compact(reply["items"], COMPACT_PRODUCT_KEYS)} if "items" in reply \
+                    else compact(reply, COMPACT_PRODUCT_KEYS)
+            return json.dumps(reply, indent=2)
+    rows = compact(PRICE_REPLY, COMPACT_RETAILER_KEYS) if short_keys else PRICE_REPLY
+    if payload.get("response_format"):
+        return json.dumps({"retailers": rows}, indent=2)
+    return json.dumps(rows, indent=2)
+
+
+def malform(content, rng):
+    """A broken version of a JSON reply: wrapped in prose or fences, truncated, or not JSON at all"""
+    kind = rng.choice(("prose", "fence", "truncated", "trailing_comma", "refusal"))
+    if kind == "prose":
+        return f"Sure! Here is the information you asked for:\n{content}\nLet me know if you need anything else."
+    if kind == "fence":
+        return f"```json\n{content}\n```"
+    if kind == "truncated":
+        return content[:max(1, len(content) // 2)]
+    if kind == "trailing_comma":
+        return content.replace("}", ",}", 1)
+    return "I'm sorry, I can't determine that from the information provided."
+
+
+def count_tokens(text):
+    """Crude ~4 characters per token estimate"""
+    return -(-len(text) // 4)
+
+
+def prompt_tokens(payload):
+    total = 0
+    for message in payload.get("messages", []):
+        content = message.get("content")
+        parts = content if isinstance(content, list) else [{"type": "text", "text": content or ""}]
+        for part in parts:
+            total += IMAGE_TOKENS if part.get("type") == "image_url" else count_tokens(part.get("text", ""))
+    return total
+
+
+def usage_block(payload, content):
+    prompt, completion = prompt_tokens(payload), count_tokens(content)
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+
+class GroqStub:
+    """Threaded HTTP server that answers POST .../chat/completions like Groq does"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, fail_statuses=None,
+                 retry_after=None, reply=default_reply, chunk_chars=8, chunk_delay=0.0,
+                 jitter=0.0, error_rate=0.0, error_statuses=(429, 500, 503), malformed_rate=0.0, seed=None,
+                 rpm=0, tpm=0, window=60.0, tail_rate=0.0, tail_latency=0.0):
+        self.latency = latency
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.jitter = jitter
+        self.chunk_chars = chunk_chars
+        self.chunk_delay = chunk_delay
+        self.fail_statuses = list(fail_statuses or [])
+        self.retry_after = retry_after
+        self.reply = reply
+        self.error_rate = error_rate
+        self.error_statuses = list(error_statuses)
+        self.malformed_rate = malformed_rate
+        self.requests = 0
+        self.connections = 0
+        self.errors = 0
+        self.malformed = 0
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self.rate_limited = 0
+        # Per model, [time, tokens] of recent admitted requests, for the rpm/tpm quota
+        self._recent = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/openai/v1"
+
+    def _next_failure(self):
+        with self._lock:
+            self.requests += 1
+            if self.fail_statuses:
+                return self.fail_statuses.pop(0)
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.errors += 1
+                return self._random.choice(self.error_statuses)
+            return None
+
+    def _admit(self, model, tokens):
+        """
+        (None, entry) if a request reserving `tokens` fits the quota, else (seconds until it would, None).
+        Set entry[1] to the tokens actually used once the reply is known.
+        """
+        if not (self.rpm or self.tpm):
+            return None, [0, 0]
+        with self._lock:
+            now = time.monotonic()
+            recent = self._recent.setdefault(model, deque())
+            while recent and now - recent[0][0] >= self.window:
+                recent.popleft()
+            used = sum(t for _, t in recent)
+            if (self.rpm and len(recent) >= self.rpm) or (self.tpm and used + tokens > self.tpm):
+                self.rate_limited += 1
+                return (self.window - (now - recent[0][0]) if recent else self.window), None
+            entry = [now, tokens]
+            recent.append(entry)
+            return None, entry
+
+    def _delay(self):
+        """Seconds before the first byte: latency plus up to +/- jitter, plus tail_latency for the tail"""
+        with self._lock:
+            spread = self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+            if self.tail_rate and self._random.random() < self.tail_rate:
+                spread += self.tail_latency
+        return max(0.0, self.latency + spread)
+
+    def _content(self, payload):
+        content = self.reply(payload)
+        with self._lock:
+            if self.malformed_rate and self._random.random() < self.malformed_rate:
+                self.malformed += 1
+                return malform(content, self._random)
+        return content
+
+    def stats(self):
+        return {"requests": self.requests, "connections": self.connections, "errors": self.errors,
+                "malformed": self.malformed, "rate_limited": self.rate_limited}
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, body, headers=None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _write_chunk(self, data):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def _send_stream(self, payload, content):
+                """Server-sent events in the OpenAI/Groq chunk format"""
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                starts = range(0, len(content), stub.chunk_chars)
+                for start in starts:
+                    if stub.chunk_delay:
+                        time.sleep(stub.chunk_delay)
+                    event = {"object": "chat.completion.chunk", "model": payload.get("model"),
+                             "choices": [{"index": 0, "delta": {"content": content[start:start + stub.chunk_chars]}}]}
+                    if start == starts[-1]:
+                        # Like Groq, the last chunk carries the usage block under x_groq
+                        event["x_groq"] = {"usage": usage_block(payload, content)}
+                    self._write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+                self._write_chunk(b"data: [DONE]\n\n")
+                self._write_chunk(b"")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+                delay = stub._delay()
+                if delay:
+                    time.sleep(delay)
+
+                status = stub._next_failure()
+                if status:
+                    headers = {"Retry-After": str(stub.retry_after)} if stub.retry_after is not None else None
+                    self._send_json(status, {"error": {"message": f"stub error {status}"}}, headers)
+                    return
+
+                wait, admitted = stub._admit(payload.get("model"), prompt_tokens(payload) + (payload.get("max_tokens") or 0))
+                if wait:
+                    self._send_json(429, {"error": {"message": "rate limit reached", "type": "tokens"}},
+                                    {"Retry-After": f"{wait:.2f}"})
+                    return
+
+                content = stub._content(payload)
+                finish_reason = "stop"
+                max_chars = (payload.get("max_tokens") or 0) * 4
+                if max_chars and len(content) > max_chars:
+                    # Cut the reply off at max_tokens the way a real model is
+                    content, finish_reason = content[:max_chars], "length"
+                admitted[1] = usage_block(payload, content)["total_tokens"]
+                if payload.get("stream"):
+                    self._send_stream(payload, content)
+                    return
+                if stub.chunk_delay:
+                    # Without streaming the client still waits for the whole reply to be generated
+                    time.sleep(stub.chunk_delay * -(-len(content) // stub.chunk_chars))
+                self._send_json(200, {
+                    "id": f"chatcmpl-stub-{stub.requests}",
+                    "object": "chat.completion",
+                    "model": payload.get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                 "finish_reason": finish_reason}],
+                    "usage": usage_block(payload, content),
+                })
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local Groq chat-completions stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before replying")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random +/- seconds added to --latency")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="seconds between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered 429/500/503")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="share of replies with broken JSON")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="share of requests that get --tail-latency extra")
+    parser.add_argument("--tail-latency", type=float, default=0.0, help="extra seconds for the slow tail")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    stub = GroqStub(args.host, args.port, latency=args.latency, chunk_delay=args.chunk_delay, jitter=args.jitter,
+                    error_rate=args.error_rate, malformed_rate=args.malformed_rate, seed=args.seed,
+                    tail_rate=args.tail_rate, tail_latency=args.tail_latency)
+    print(f"Groq stub listening on {stub.base_url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
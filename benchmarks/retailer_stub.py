@@ -0,0 +1,125 @@
+"""
+Local stand-in for retailer search pages, serving the saved HTML fixtures in
+benchmarks/data/retailers.
+
+    python -m benchmarks.retailer_stub --port 8788 --latency 0.2
+    RETAILER_BASE_URL=http://127.0.0.1:8788 PRICE_SOURCES=groq,amazon,flipkart,myntra,ajio,meesho streamlit run main.py
+
+GET /<source name>/<anything> returns data/retailers/<source name>.html.
+Also usable in-process:
+
+    with RetailerStub(latency={"amazon": 0.5}) as stub:
+        config.RETAILER_BASE_URL = stub.base_url
+"""
+import argparse
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "retailers")
+
+
+class RetailerStub:
+    """Threaded HTTP server answering GET /<retailer>/... with that retailer's fixture page"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, fail=None, fixtures=FIXTURES):
+        # latency is seconds for every retailer or a {name: seconds} dict; fail maps names to a status code
+        self.latency = latency
+        self.fail = dict(fail or {})
+        self.fixtures = fixtures
+        self.requests = {}
+        self.active = {}
+        self.max_active = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _latency(self, name):
+        if isinstance(self.latency, dict):
+            return self.latency.get(name, 0.0)
+        return self.latency
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body, content_type="text/html; charset=utf-8"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up (e.g. a source timeout) before the page was sent
+                    pass
+
+            def do_GET(self):
+                name = self.path.lstrip("/").split("/", 1)[0].split("?", 1)[0]
+                path = os.path.join(stub.fixtures, f"{name}.html")
+                with stub._lock:
+                    stub.requests[name] = stub.requests.get(name, 0) + 1
+                    stub.active[name] = stub.active.get(name, 0) + 1
+                    stub.max_active[name] = max(stub.max_active.get(name, 0), stub.active[name])
+                try:
+                    delay = stub._latency(name)
+                    if delay:
+                        time.sleep(delay)
+                    if name in stub.fail:
+                        self._send(stub.fail[name], b"<html><body>Service Unavailable</body></html>")
+                    elif not name or not os.path.exists(path):
+                        self._send(404, b"<html><body>Not found</body></html>")
+                    else:
+                        with open(path, "rb") as f:
+                            self._send(200, f.read())
+                finally:
+                    with stub._lock:
+                        stub.active[name] -= 1
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve saved retailer search pages locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8788)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before each page")
+    args = parser.parse_args()
+
+    stub = RetailerStub(args.host, args.port, latency=args.latency)
+    print(f"Retailer stub listening on {stub.base_url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""
+Persistent caches for Groq results.
+Entries live in a small SQLite database so they survive app restarts and are
+shared by every Streamlit session running on the same machine.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import config
+from rate_limit import BATCH, request_context
+
+logger = logging.getLogger(__name__)
+
+
+class PersistentCache:
+    """SQLite backed key/value cache with TTL expiry and LRU eviction"""
+
+    def __init__(self, path, table, ttl, max_entries):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed)"
+        )
+        self._conn.commit()
+
+    def get_entry(self, key):
+        """Return (value, age_seconds) for a key, or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, created FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl and now - row[1] > self.ttl):
+                if row is not None:
+                    self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute(
+                f"UPDATE {self.table} SET accessed = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return json.loads(row[0]), now - row[1]
+
+    def peek(self, key):
+        """Return the value for a key without touching hit/miss counters or recency"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, created FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or (self.ttl and time.time() - row[1] > self.ttl):
+            return None
+        return json.loads(row[0])
+
+    def age(self, key):
+        """Seconds since a key was stored, or None if missing or expired (counters and recency untouched)"""
+        with self._lock:
+            row = self._conn.execute(f"SELECT created FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        age = None if row is None else time.time() - row[0]
+        return None if age is None or (self.ttl and age > self.ttl) else age
+
+    def get(self, key):
+        """Return the cached value for a key, or None"""
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+
+    def get_nearest(self, key, distance):
+        """
+        Return the value stored under key, or else under the live key nearest to it,
+        where distance(key, other) is a number or None for keys too far to count.
+        Every key is scanned on a miss, which suits caches of a few thousand entries.
+        """
+        if self.age(key) is not None:
+            return self.get(key)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key FROM {self.table} WHERE ? = 0 OR created > ?",
+                (self.ttl or 0, time.time() - (self.ttl or 0))
+            ).fetchall()
+        nearest = None
+        for (other,) in rows:
+            score = distance(key, other)
+            if score is not None and (nearest is None or score < nearest[0]):
+                nearest = score, other
+        if nearest is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        return self.get(nearest[1])
+
+    def set(self, key, value):
+        """Store a JSON-serialisable value and evict the least recently used entries"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created, accessed) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now)
+            )
+            count = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            if self.max_entries and count > self.max_entries:
+                self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN ("
+                    f"SELECT key FROM {self.table} ORDER BY accessed ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+    def stats(self):
+        """Hit/miss counters for this process"""
+        with self._lock:
+            size = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "entries": size,
+        }
+
+
+class StaleWhileRevalidateCache:
+    """
+    Wrapper over PersistentCache that serves stale entries instantly.
+    Entries younger than fresh_ttl are returned as-is. Older entries (still
+    within the store's TTL) are returned too, while a background thread
+    refreshes them for the next caller.
+    """
+
+    def __init__(self, store, fresh_ttl):
+        self.store = store
+        self.fresh_ttl = fresh_ttl
+        self.stale_hits = 0
+        self.refreshes = 0
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, key, refresh=None):
+        """Return the cached value (fresh or stale) or None; stale hits trigger refresh()"""
+        entry = self.store.get_entry(key)
+        if entry is None:
+            return None
+        value, age = entry
+        if age > self.fresh_ttl:
+            self.stale_hits += 1
+            if refresh is not None:
+                self._refresh_in_background(key, refresh)
+        return value
+
+    def set(self, key, value):
+        self.store.set(key, value)
+
+    def _refresh_in_background(self, key, refresh):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                # Nobody is waiting for a refresh: it yields to interactive calls and is shed first under load
+                with request_context("refresh", priority=BATCH):
+                    value = refresh()
+                if value:
+                    self.store.set(key, value)
+                    self.refreshes += 1
+            except Exception:
+                logger.exception("Background refresh failed for %s", key)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, name=f"cache-refresh-{key[:32]}", daemon=True).start()
+
+    def stats(self):
+        stats = self.store.stats()
+        stats.update(stale_hits=self.stale_hits, refreshes=self.refreshes)
+        return stats
+
+
+def normalize_query(query):
+    """Fold case, punctuation, whitespace and token order so equivalent searches share a key"""
+    return " ".join(sorted(re.findall(r"\w+", query.lower())))
+
+
+# Fingerprint layout: aspect ratio in hundredths (3 hex digits), a 16x16 dHash of
+# the grey thumbnail (64) and the mean colour of a 4x4 grid (96)
+_FINGERPRINT_LENGTH = 3 + 64 + 96
+_COLOUR_TOLERANCE = 12
+# Grey levels a gradient must rise by to set its bit, so JPEG noise in flat areas does not
+_FLAT = 2
+
+
+def image_fingerprint(image, size=64):
+    """
+    Perceptual fingerprint of an image: its aspect ratio, a dHash of the
+    greyscale size x size thumbnail shrunk to 17x16 (one bit per rising horizontal
+    gradient) and the mean RGB colour of a 4x4 grid.
+    The same photo re-saved as JPEG, resized or screenshotted again lands within
+    a few bits of the original, which fingerprint_distance measures; the hash is
+    blind to colour, so the grid keeps a red and a blue case apart.
+    """
+    from PIL import Image
+
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGBA")
+        background = Image.new("RGBA", image.size, (255, 255, 255, 255))
+        image = Image.alpha_composite(background, image)
+    small = image.convert("RGB").resize((size, size), Image.BOX)
+    grey = small.convert("L").resize((17, 16), Image.BOX).tobytes()
+    bits = 0
+    for row in range(16):
+        for column in range(16):
+            bits = bits << 1 | (grey[row * 17 + column + 1] > grey[row * 17 + column] + _FLAT)
+    aspect = min(round(image.width / image.height * 100), 0xFFF)
+    return f"{aspect:03x}{bits:064x}" + small.resize((4, 4), Image.BOX).tobytes().hex()
+
+
+def fingerprint_distance(first, second):
+    """
+    Hamming distance between the dHashes of two fingerprints (or cache keys ending
+    in one, compared only with the same prefix), or None if their prefix, aspect
+    ratio or colours differ
+    """
+    split = len(first) - _FINGERPRINT_LENGTH
+    if split < 0 or len(second) != len(first) or first[:split] != second[:split]:
+        return None
+    try:
+        aspects = int(first[split:split + 3], 16), int(second[split:split + 3], 16)
+        bits = int(first[split + 3:split + 67], 16) ^ int(second[split + 3:split + 67], 16)
+        colours = zip(bytes.fromhex(first[split + 67:]), bytes.fromhex(second[split + 67:]))
+    except ValueError:
+        return None
+    if abs(aspects[0] - aspects[1]) > max(1, max(aspects) // 50):
+        return None
+    if any(abs(a - b) > _COLOUR_TOLERANCE for a, b in colours):
+        return None
+    return bin(bits).count("1")
+
+
+def similar_fingerprint(max_distance):
+    """Distance function for PersistentCache.get_nearest that accepts fingerprints at most max_distance bits apart"""
+    def distance(first, second):
+        bits = fingerprint_distance(first, second)
+        return bits if bits is not None and bits <= max_distance else None
+    return distance
+
+
+_identification_cache = None
+_price_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_identification_cache():
+    """Process-wide cache of product_info dicts keyed by image fingerprint (see get_nearest)"""
+    global _identification_cache
+    with _cache_lock:
+        if _identification_cache is None:
+            _identification_cache = PersistentCache(
+                os.path.join(config.DATA_DIR, "cache.sqlite3"),
+                "identifications",
+                ttl=config.IDENTIFY_CACHE_TTL,
+                max_entries=config.IDENTIFY_CACHE_MAX_ENTRIES
+            )
+        return _identification_cache
+
+
+def get_price_cache():
+    """Process-wide stale-while-revalidate cache of price results keyed by normalised query"""
+    global _price_cache
+    with _cache_lock:
+        if _price_cache is None:
+            store = PersistentCache(
+                os.path.join(config.DATA_DIR, "cache.sqlite3"),
+                "price_results",
+                ttl=config.PRICE_CACHE_TTL + config.PRICE_CACHE_STALE_TTL,
+                max_entries=config.PRICE_CACHE_MAX_ENTRIES
+            )
+            _price_cache = StaleWhileRevalidateCache(store, fresh_ttl=config.PRICE_CACHE_TTL)
+        return _price_cache
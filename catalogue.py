@@ -0,0 +1,336 @@
+"""
+Local product catalogue for manual search.
+Products come from past identifications and CSV imports and are kept in a
+SQLite table, with an in-memory index built at startup: a sorted token list
+for prefix autocomplete and trigram postings for fuzzy matching, scored with
+IDF-weighted trigram overlap. A typed query is canonicalised to a catalogue
+product before the price lookup, so misspellings and word-order variants
+share one cache entry instead of each costing an LLM call.
+
+    python catalogue.py products.csv     # import name,brand,category,search_query,aliases
+"""
+import argparse
+import bisect
+import csv
+import heapq
+import io
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+import config
+from cache import normalize_query
+
+_WORD = re.compile(r"\w+")
+# Words a query can carry without naming anything about the product
+_FILLER = {"a", "an", "and", "the", "for", "with", "of", "in", "new", "buy", "price"}
+# Words that tell a model apart from its siblings; with any word that has a digit in it
+# (model numbers, storage sizes) a query has to name them to match a product that has them
+_VARIANTS = {"pro", "max", "ultra", "plus", "mini", "lite", "air", "se", "fe", "neo", "edge", "fold", "flip", "note"}
+
+
+def tokens(text):
+    return _WORD.findall((text or "").lower())
+
+
+def typo_of(word, other):
+    """
+    Whether two words differ at most by a typo: one edit or swap of neighbouring letters,
+    two in words of 8 letters or more. Shorter words than 5 letters and words with digits
+    in them have to be equal.
+    """
+    if word == other:
+        return True
+    if any(char.isdigit() for char in word + other) or min(len(word), len(other)) < 5:
+        return False
+    limit = 2 if min(len(word), len(other)) >= 8 else 1
+    if abs(len(word) - len(other)) > limit:
+        return False
+    # Optimal string alignment distance, rows of the edit-distance table
+    before, previous = None, list(range(len(other) + 1))
+    for i, char in enumerate(word, 1):
+        current = [i]
+        for j, other_char in enumerate(other, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other_char))
+            if i > 1 and j > 1 and char == other[j - 2] and word[i - 2] == other_char:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return False
+        before, previous = previous, current
+    return previous[-1] <= limit
+
+
+def distinguishing(words):
+    """The words of a product that set it apart from other models of the same line"""
+    return {word for word in words if word in _VARIANTS or any(char.isdigit() for char in word)}
+
+
+def covered(words, others):
+    """Whether every word is one of others or a typo of one"""
+    return all(word in others or any(typo_of(word, other) for other in others) for word in words)
+
+
+def trigrams(text):
+    """Character trigrams of each token, padded so short tokens and word starts count"""
+    grams = set()
+    for token in tokens(text):
+        padded = f" {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class Catalogue:
+    """Products with their names and aliases, searchable by prefix and by fuzzy match"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS products ("
+            "id INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL, name TEXT NOT NULL, brand TEXT, category TEXT, "
+            "search_query TEXT, aliases TEXT NOT NULL DEFAULT '', source TEXT, hits INTEGER NOT NULL DEFAULT 0, "
+            "added REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+        self.products = {}
+        # Documents are a product's name, search_query and aliases: [product id, text, trigrams, weight]
+        self._documents = []
+        self._postings = {}
+        self._vocabulary = []  # sorted distinct tokens, for prefix lookups
+        self._token_products = {}
+        # Suggestion order as one int per product: most searched first, then shortest name
+        self._rank = {}
+        self.lookups = 0
+        self.matches = 0
+        rows = self._conn.execute(
+            "SELECT id, name, brand, category, search_query, aliases, hits FROM products"
+        ).fetchall()
+        for row in rows:
+            self._index(self._product(row))
+        self._vocabulary.sort()
+        self._reweigh()
+
+    @staticmethod
+    def _product(row):
+        product_id, name, brand, category, search_query, aliases, hits = row
+        return {"id": product_id, "name": name, "brand": brand or "", "category": category or "",
+                "search_query": search_query or name, "aliases": [a for a in aliases.split("|") if a],
+                "hits": hits}
+
+    def _index(self, product, sort=False):
+        """Add a product's documents and tokens to the in-memory index (lock held)"""
+        self.products[product["id"]] = product
+        self._rank[product["id"]] = len(product["name"]) - 1000 * product["hits"]
+        texts = {product["name"], product["search_query"], *product["aliases"]}
+        for text in texts:
+            grams = trigrams(text)
+            if not grams:
+                continue
+            doc = len(self._documents)
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(doc)
+            self._documents.append([product["id"], text, grams, self._weight(grams) if sort else 0.0])
+        for token in set(tokens(" ".join([product["brand"], *texts]))):
+            if token not in self._token_products:
+                self._token_products[token] = set()
+                if sort:
+                    bisect.insort(self._vocabulary, token)
+                else:
+                    self._vocabulary.append(token)
+            self._token_products[token].add(product["id"])
+
+    def _reweigh(self):
+        """Recompute document weights with the current IDF"""
+        for document in self._documents:
+            document[3] = self._weight(document[2])
+        self._weighed = len(self._documents)
+
+    def _idf(self, gram):
+        return math.log(1 + len(self._documents) / len(self._postings.get(gram) or (None,)))
+
+    def _weight(self, grams):
+        return sum(self._idf(g) for g in grams)
+
+    def add(self, product_info, source="identified", aliases=()):
+        """Insert a product (a product_info dict) unless one with the same normalised name exists; returns its id"""
+        with self._lock:
+            product_id = self._add(product_info, source, aliases)
+            self._conn.commit()
+            self._maybe_reweigh()
+            return product_id
+
+    def _maybe_reweigh(self):
+        # Weights of documents added since the last pass used an older IDF; refresh once that drift adds up
+        # (always while the catalogue is small, where one product shifts the IDF most and a pass is cheap)
+        if len(self._documents) < 2000 or len(self._documents) > self._weighed * 1.1:
+            self._reweigh()
+
+    def _add(self, product_info, source, aliases):
+        name = (product_info.get("product_name") or product_info.get("search_query") or "").strip()
+        key = normalize_query(name)
+        if not key:
+            return None
+        row = self._conn.execute("SELECT id FROM products WHERE key = ?", (key,)).fetchone()
+        if row:
+            return row[0]
+        aliases = "|".join(a.strip() for a in aliases if a and a.strip())
+        search_query = product_info.get("search_query") or name
+        cursor = self._conn.execute(
+            "INSERT INTO products (key, name, brand, category, search_query, aliases, source, added) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, name, product_info.get("brand"), product_info.get("category"), search_query, aliases, source,
+             time.time())
+        )
+        self._index(self._product((cursor.lastrowid, name, product_info.get("brand"), product_info.get("category"),
+                                   search_query, aliases, 0)), sort=True)
+        return cursor.lastrowid
+
+    def import_csv(self, source):
+        """
+        Add every row of a CSV (a path, bytes or a text file object) with a name column and
+        optional brand, category, search_query and aliases (separated by ";").
+        Returns the number of rows read.
+        """
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, newline="", encoding="utf-8-sig") as f:
+                return self.import_csv(f)
+        if isinstance(source, (bytes, bytearray)):
+            source = io.StringIO(source.decode("utf-8-sig"))
+        count = 0
+        with self._lock:
+            for row in csv.DictReader(source):
+                row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+                if not row.get("name"):
+                    continue
+                product_info = {"product_name": row["name"], "brand": row.get("brand"),
+                                "category": row.get("category"), "search_query": row.get("search_query")}
+                self._add(product_info, "csv", row.get("aliases", "").split(";"))
+                count += 1
+            self._conn.commit()
+            self._reweigh()
+        return count
+
+    def suggest(self, text, limit=None):
+        """
+        Products whose words start with what has been typed, most searched first.
+        Every complete word must match a word of the product; the last one may be a prefix.
+        Falls back to fuzzy matches when nothing matches as typed.
+        """
+        limit = limit or config.CATALOGUE_SUGGESTIONS
+        words = tokens(text)
+        if not words:
+            return []
+        complete, prefix = (words, None) if text[-1:].isspace() else (words[:-1], words[-1])
+        with self._lock:
+            found = None
+            for word in complete:
+                products = self._token_products.get(word, set())
+                found = products if found is None else found & products
+            if prefix is not None:
+                start = bisect.bisect_left(self._vocabulary, prefix)
+                end = bisect.bisect_left(self._vocabulary, prefix + "\uffff")
+                products = set().union(*(self._token_products[t] for t in self._vocabulary[start:end]))
+                found = products if found is None else found & products
+            ranked = [self.products[i] for i in heapq.nsmallest(limit, found or (), key=self._rank.__getitem__)]
+        if ranked:
+            return ranked
+        return [product for product, _ in self.search(text, limit)]
+
+    def search(self, text, limit=5):
+        """[(product, score)] best fuzzy matches first; score is weighted trigram overlap from 0 to 1"""
+        grams = trigrams(text)
+        if not grams:
+            return []
+        with self._lock:
+            documents = len(self._documents)
+            if not documents:
+                return []
+            weight = {g: self._idf(g) for g in grams if g in self._postings}
+            # Candidates come from the rarer trigrams; common ones would pull in most of the catalogue
+            common = max(64, documents // 20)
+            candidates = Counter()
+            for gram in sorted(weight, key=lambda g: len(self._postings[g])):
+                postings = self._postings[gram]
+                if len(postings) > common and candidates:
+                    break
+                candidates.update(postings)
+            query_weight = sum(weight.values()) + math.log(1 + documents) * (len(grams) - len(weight))
+            best = {}
+            for doc, _ in candidates.most_common(64):
+                product_id, _, doc_grams, doc_weight = self._documents[doc]
+                shared = sum(weight[g] for g in grams & doc_grams)
+                score = min(1.0, 2 * shared / (query_weight + doc_weight))
+                if score > best.get(product_id, 0):
+                    best[product_id] = score
+            ranked = sorted(best.items(), key=lambda item: -item[1])[:limit]
+            return [(self.products[product_id], score) for product_id, score in ranked]
+
+    def match(self, text, threshold=None):
+        """
+        The product a query refers to and its score, or None when nothing is close enough.
+        Only typos and word order may differ, checked both ways: every word of the query has to be
+        a word of the product's name, brand, search_query or aliases, or a typo of one (model numbers
+        exactly), and the query has to name the model numbers, sizes and variant words of one of the
+        product's names. So "S23 Ultra case" or "iPhone 15 Pro Max" never turn into the phone or the
+        iPhone 15 Pro, and "iPhone 15 Pro" or "galaxy s23" never into the Pro Max or the S23 Ultra.
+        """
+        threshold = config.CATALOGUE_MATCH_THRESHOLD if threshold is None else threshold
+        self.lookups += 1
+        query = set(tokens(text)) - _FILLER
+        for product, score in self.search(text, limit=3):
+            if score < threshold:
+                break
+            names = [product["name"], product["search_query"], *product["aliases"]]
+            if not covered(query, set(tokens(" ".join([product["brand"], *names])))):
+                continue
+            if not any(covered(distinguishing(tokens(name)), query) for name in names):
+                continue
+            self.matches += 1
+            with self._lock:
+                product["hits"] += 1
+                self._rank[product["id"]] -= 1000
+                self._conn.execute("UPDATE products SET hits = hits + 1 WHERE id = ?", (product["id"],))
+                self._conn.commit()
+            return product, score
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {"products": len(self.products), "lookups": self.lookups, "matches": self.matches}
+
+
+_catalogue = None
+_catalogue_lock = threading.Lock()
+
+
+def get_catalogue():
+    """Process-wide catalogue in DATA_DIR/catalogue.sqlite3"""
+    global _catalogue
+    with _catalogue_lock:
+        if _catalogue is None:
+            _catalogue = Catalogue(os.path.join(config.DATA_DIR, "catalogue.sqlite3"))
+        return _catalogue
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import products into the local catalogue")
+    parser.add_argument("csv", help="CSV with a name column and optional brand, category, search_query, aliases")
+    args = parser.parse_args()
+    catalogue = get_catalogue()
+    count = catalogue.import_csv(args.csv)
+    print(f"Read {count} rows; the catalogue now has {catalogue.stats()['products']} products")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Runtime settings for the price finder.
+Values come from environment variables so the same defaults work for the
+Streamlit app and for scripts that run without it.
+"""
+import os
+import re
+
+
+def _env_int(name, default):
+    """Read an integer setting from the environment"""
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        return default
+
+
+def _env_float(name, default):
+    """Read a float setting from the environment"""
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
+
+def _env_bool(name, default):
+    """Read an on/off setting from the environment; 0, false, no, off and empty (any case) are off"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() not in ("0", "false", "no", "off", "")
+
+
+def _env_list(name, default):
+    """Read a comma-separated list setting from the environment"""
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return list(default)
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+SECRETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".streamlit", "secrets.toml")
+
+
+def load_api_key():
+    """GROQ_API_KEY from the environment, falling back to .streamlit/secrets.toml"""
+    api_key = os.environ.get("GROQ_API_KEY")
+    if api_key:
+        return api_key
+    try:
+        with open(SECRETS_PATH, encoding="utf-8") as f:
+            match = re.search(r'^\s*GROQ_API_KEY\s*=\s*["\']([^"\']+)["\']', f.read(), re.MULTILINE)
+    except OSError:
+        return None
+    return match.group(1) if match else None
+
+
+def load_secrets():
+    """Everything in .streamlit/secrets.toml as a dict; empty when missing, unreadable or without tomllib"""
+    try:
+        import tomllib
+    except ImportError:
+        return {}
+    try:
+        with open(SECRETS_PATH, "rb") as f:
+            return tomllib.load(f)
+    except (OSError, tomllib.TOMLDecodeError):
+        return {}
+
+
+# Where caches and other local state are kept
+DATA_DIR = os.environ.get(
+    "PRICE_FINDER_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".price_finder")
+)
+
+# Product identification cache (keyed by image fingerprint)
+IDENTIFY_CACHE_TTL = _env_int("IDENTIFY_CACHE_TTL", 7 * 24 * 3600)
+IDENTIFY_CACHE_MAX_ENTRIES = _env_int("IDENTIFY_CACHE_MAX_ENTRIES", 5000)
+# dHash bits (of 256) a re-saved or resized copy of a photo may differ by and still hit
+IDENTIFY_CACHE_MAX_DISTANCE = _env_int("IDENTIFY_CACHE_MAX_DISTANCE", 12)
+
+# Visual similarity index: images this close to an identified one reuse its product_info.
+# Opt-in: the embedding cannot tell colour variants or printed model numbers apart
+# (black and navy versions of a product score about 0.96, "iPhone 14" and "15" on a box 1.0)
+VISUAL_INDEX = _env_bool("VISUAL_INDEX", False)
+VISUAL_MATCH_THRESHOLD = _env_float("VISUAL_MATCH_THRESHOLD", 0.93)
+
+# Price search cache (keyed by normalised query)
+PRICE_CACHE_TTL = _env_int("PRICE_CACHE_TTL", 6 * 3600)
+PRICE_CACHE_STALE_TTL = _env_int("PRICE_CACHE_STALE_TTL", 24 * 3600)
+PRICE_CACHE_MAX_ENTRIES = _env_int("PRICE_CACHE_MAX_ENTRIES", 20000)
+
+# Groq HTTP client
+GROQ_BASE_URL = os.environ.get("GROQ_BASE_URL", "https://api.groq.com/openai/v1").rstrip("/")
+GROQ_CONNECT_TIMEOUT = _env_int("GROQ_CONNECT_TIMEOUT", 5)
+GROQ_VISION_READ_TIMEOUT = _env_int("GROQ_VISION_READ_TIMEOUT", 60)
+GROQ_PRICE_READ_TIMEOUT = _env_int("GROQ_PRICE_READ_TIMEOUT", 45)
+GROQ_MAX_RETRIES = _env_int("GROQ_MAX_RETRIES", 3)
+GROQ_POOL_SIZE = _env_int("GROQ_POOL_SIZE", 20)
+GROQ_BREAKER_THRESHOLD = _env_int("GROQ_BREAKER_THRESHOLD", 5)
+GROQ_BREAKER_RESET = _env_int("GROQ_BREAKER_RESET", 30)
+
+# Quota shared by every session, per model (Groq's free-tier limits; 0 turns a limit off).
+# Calls queue fairly per session; interactive calls over GROQ_QUEUE_MAX_WAIT seconds of
+# estimated wait fail fast, batch calls are shed after GROQ_BATCH_MAX_WAIT seconds.
+GROQ_REQUESTS_PER_MINUTE = _env_int("GROQ_REQUESTS_PER_MINUTE", 30)
+GROQ_TOKENS_PER_MINUTE = _env_int("GROQ_TOKENS_PER_MINUTE", 12000)
+GROQ_QUEUE_MAX_WAIT = _env_int("GROQ_QUEUE_MAX_WAIT", 120)
+GROQ_BATCH_MAX_WAIT = _env_int("GROQ_BATCH_MAX_WAIT", 30)
+GROQ_QUEUE_MAX = _env_int("GROQ_QUEUE_MAX", 64)
+
+# Routing across a pool of API keys and a ranked list of models per task. The
+# same names in .streamlit/secrets.toml (or st.secrets) take precedence, where
+# GROQ_API_KEYS entries may also be tables: {key = "...", base_url = "..."}.
+GROQ_API_KEYS = _env_list("GROQ_API_KEYS", [])
+GROQ_VISION_MODELS = _env_list("GROQ_VISION_MODELS", ["meta-llama/llama-4-scout-17b-16e-instruct"])
+GROQ_PRICE_MODELS = _env_list("GROQ_PRICE_MODELS", ["llama-3.3-70b-versatile"])
+# Rolling window of calls per (key, model); a route that keeps failing rests for the cooldown
+GROQ_ROUTE_WINDOW = _env_int("GROQ_ROUTE_WINDOW", 50)
+GROQ_ROUTE_COOLDOWN = _env_int("GROQ_ROUTE_COOLDOWN", 30)
+GROQ_ROUTE_MAX_ERROR_RATE = _env_float("GROQ_ROUTE_MAX_ERROR_RATE", 0.5)
+# Send a backup request on the next route once a call outlives its route's p95,
+# for at most this share of calls
+GROQ_HEDGE = _env_bool("GROQ_HEDGE", True)
+GROQ_HEDGE_BUDGET = _env_float("GROQ_HEDGE_BUDGET", 0.1)
+
+# Image preprocessing before vision upload
+IMAGE_MAX_PIXELS = _env_int("IMAGE_MAX_PIXELS", 1024 * 1024)
+IMAGE_MAX_BYTES = _env_int("IMAGE_MAX_BYTES", 300 * 1024)
+IMAGE_FORMAT = os.environ.get("IMAGE_FORMAT", "JPEG").upper()
+IMAGE_QUALITY = _env_int("IMAGE_QUALITY", 80)
+IMAGE_SALIENT_CROP = _env_bool("IMAGE_SALIENT_CROP", True)
+
+# Local quality gate before the vision call (see image_prep.assess_quality):
+# photos that are too dark, overexposed, blank or blurry are sent back for a
+# retake. Brightness is mean gray level 0-255; clipped is the share of pixels
+# at either end; sharpness is Laplacian variance relative to the image's own
+# variance (x100), so it doesn't depend on how much contrast the scene has.
+QUALITY_GATE = _env_bool("QUALITY_GATE", True)
+QUALITY_MIN_BRIGHTNESS = _env_float("QUALITY_MIN_BRIGHTNESS", 40)
+QUALITY_MAX_BRIGHTNESS = _env_float("QUALITY_MAX_BRIGHTNESS", 235)
+QUALITY_MAX_CLIPPED = _env_float("QUALITY_MAX_CLIPPED", 0.6)
+QUALITY_MIN_CONTRAST = _env_float("QUALITY_MIN_CONTRAST", 8)
+QUALITY_MIN_EDGE_DENSITY = _env_float("QUALITY_MIN_EDGE_DENSITY", 0.001)
+QUALITY_MIN_SHARPNESS = _env_float("QUALITY_MIN_SHARPNESS", 1.5)
+
+# Several products in one photo: "model" asks the vision model for every item
+# and its bounding box; "opencv" finds object regions locally, numbers them on
+# the image and has the model name each one. Either way it is one vision call.
+MULTI_PRODUCT_DETECTOR = os.environ.get("MULTI_PRODUCT_DETECTOR", "model").strip().lower()
+MULTI_PRODUCT_MAX_ITEMS = _env_int("MULTI_PRODUCT_MAX_ITEMS", 8)
+
+# Stream the vision reply and start the price search as soon as search_query is known
+GROQ_STREAMING = _env_bool("GROQ_STREAMING", True)
+
+# Structured output: "json_object" (Groq JSON mode), "json_schema" or "off" for
+# the original prompt-only requests. Anything but "off" also sizes max_tokens
+# from the expected schema and retries once when a reply fails validation.
+GROQ_RESPONSE_FORMAT = os.environ.get("GROQ_RESPONSE_FORMAT", "json_object").strip().lower()
+GROQ_VALIDATION_RETRIES = _env_int("GROQ_VALIDATION_RETRIES", 1)
+
+# Prompt templates (see prompts.py): "v1" is the original long-form wording,
+# "v2" the same instructions in far fewer tokens, "v3" is v2 asking for
+# compact output (short keys and codes, expanded locally after parsing).
+# v2 and v3 always size max_tokens from the reply schema. They stay opt-in until
+# a live comparison (python -m benchmarks.bench_prompts --live) shows replies as good as v1's
+PROMPT_VERSION = os.environ.get("PROMPT_VERSION", "v1").strip().lower()
+
+# Price history (every retailer row from a fresh lookup)
+HISTORY_BATCH_SIZE = _env_int("HISTORY_BATCH_SIZE", 500)
+HISTORY_FLUSH_INTERVAL = _env_int("HISTORY_FLUSH_INTERVAL", 2)
+HISTORY_WINDOW_DAYS = _env_int("HISTORY_WINDOW_DAYS", 90)
+HISTORY_MIN_OBSERVATIONS = _env_int("HISTORY_MIN_OBSERVATIONS", 5)
+
+# Price sources queried for every search, comma separated: groq (AI estimates),
+# amazon, flipkart, myntra, ajio, meesho (live search pages)
+PRICE_SOURCES = [name.lower() for name in _env_list("PRICE_SOURCES", ["groq"])]
+PRICE_SOURCE_TIMEOUT = _env_int("PRICE_SOURCE_TIMEOUT", 10)
+RETAILER_HOST_CONCURRENCY = _env_int("RETAILER_HOST_CONCURRENCY", 2)
+# Serve every retailer from <url>/<source name>/ instead, e.g. the fixture server in benchmarks
+RETAILER_BASE_URL = os.environ.get("RETAILER_BASE_URL", "").rstrip("/")
+
+# Prices set aside as unrealistic (see price_table.py): further than this many
+# robust standard deviations, or this many times, from the median price
+PRICE_OUTLIER_Z = _env_float("PRICE_OUTLIER_Z", 3.5)
+PRICE_OUTLIER_RATIO = _env_float("PRICE_OUTLIER_RATIO", 4.0)
+
+# Local product catalogue (see catalogue.py): manual searches are matched to a
+# known product when the weighted trigram overlap is at least the threshold
+CATALOGUE = _env_bool("CATALOGUE", True)
+CATALOGUE_MATCH_THRESHOLD = _env_float("CATALOGUE_MATCH_THRESHOLD", 0.6)
+CATALOGUE_SUGGESTIONS = _env_int("CATALOGUE_SUGGESTIONS", 6)
+
+# Price watches (see watchlist.py): watched products are re-priced in the background
+# every WATCH_INTERVAL seconds, at most WATCH_REQUESTS_PER_MINUTE calls a minute, and
+# alerts go to WATCH_NOTIFY, a JSONL file path or an http(s) webhook URL. Watches expire
+# once their owner has not opened the app for WATCH_TTL seconds (0 keeps them forever)
+WATCH = _env_bool("WATCH", True)
+WATCH_INTERVAL = _env_int("WATCH_INTERVAL", 6 * 3600)
+WATCH_TTL = _env_int("WATCH_TTL", 30 * 24 * 3600)
+WATCH_REQUESTS_PER_MINUTE = _env_int("WATCH_REQUESTS_PER_MINUTE", 6)
+WATCH_TICK = _env_int("WATCH_TICK", 60)
+WATCH_NOTIFY = os.environ.get("WATCH_NOTIFY", "")
+WATCH_WEBHOOK_TIMEOUT = _env_int("WATCH_WEBHOOK_TIMEOUT", 5)
+
+# Timing spans (see telemetry.py)
+TELEMETRY = _env_bool("TELEMETRY", True)
+TELEMETRY_MAX_TRACES = _env_int("TELEMETRY_MAX_TRACES", 50)
+# The sidebar latency panel shows and exports the recent traces of every session, queries
+# included, so it is for local debugging only
+TELEMETRY_PANEL = _env_bool("TELEMETRY_PANEL", False)
+
+# Headless batch pricing
+BATCH_WORKERS = _env_int("BATCH_WORKERS", 4)
+BATCH_REQUESTS_PER_MINUTE = _env_int("BATCH_REQUESTS_PER_MINUTE", 30)
@@ -0,0 +1,669 @@
+"""
+Groq-facing logic shared by the Streamlit page and headless scripts.
+Nothing here imports Streamlit: functions return Identification/PriceLookup
+results carrying either data or an error for the caller to present.
+"""
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+import config
+from cache import get_identification_cache, get_price_cache, image_fingerprint, normalize_query, similar_fingerprint
+from catalogue import get_catalogue
+from groq_client import GroqAPIError
+from history import get_price_history
+from image_prep import PreparedImage, QualityReport, assess_quality, detect_regions, draw_regions, prepare_image
+from llm_json import (
+    COMPACT_PRODUCT_KEYS, JsonFieldWatcher, LLMJSONError, estimate_max_tokens, parse_product_info, parse_product_list,
+    parse_retailers, product_list_schema
+)
+from prompts import estimate_tokens, get_prompts
+from router import get_router
+from singleflight import SingleFlight
+from telemetry import collector, span
+from visual_index import get_visual_index, image_embedding
+
+# Preferred models; the router may send a call to the next model in config.GROQ_*_MODELS instead
+VISION_MODEL = config.GROQ_VISION_MODELS[0]
+PRICE_MODEL = config.GROQ_PRICE_MODELS[0]
+
+PRICE_NOTE = "⚠️ Prices are AI estimates based on market knowledge. Please verify on actual websites before purchasing."
+
+_identify_flight = SingleFlight("identify")
+_price_flight = SingleFlight("prices")
+
+USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "total_tokens")
+_usage_totals = {}
+_usage_lock = threading.Lock()
+# Photos checked by the quality gate, by outcome ("passed" or the problem found)
+_quality_counts = {}
+_quality_lock = threading.Lock()
+
+
+def _response_format(response_format):
+    mode = config.GROQ_RESPONSE_FORMAT if response_format is None else response_format
+    return mode if mode in ("json_object", "json_schema") else None
+
+
+def _apply_response_format(payload, mode, name, schema, stream=False, sized=False):
+    """
+    Size max_tokens from the schema and request structured output (JSON mode cannot stream).
+    With sized (prompt versions after v1), max_tokens is sized even without structured output
+    """
+    if mode is None:
+        if sized:
+            payload["max_tokens"] = estimate_max_tokens(schema)
+        return payload
+    payload["max_tokens"] = estimate_max_tokens(schema)
+    if stream:
+        return payload
+    if mode == "json_schema":
+        payload["response_format"] = {"type": "json_schema", "json_schema": {"name": name, "schema": schema}}
+    else:
+        payload["response_format"] = {"type": "json_object"}
+    return payload
+
+
+def build_identify_payload(prepared, response_format=None, stream=False, version=None):
+    """
+    Chat-completions payload asking the vision model to identify a prepared image
+    response_format is "json_object", "json_schema" or "off"; None uses config.GROQ_RESPONSE_FORMAT
+    version is a prompts.py version; None uses config.PROMPT_VERSION
+    """
+    prompts = get_prompts(version)
+    payload = {
+        "model": VISION_MODEL,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": prepared.data_url
+                        }
+                    },
+                    {
+                        "type": "text",
+                        "text": prompts.identify
+                    }
+                ]
+            }
+        ],
+        "temperature": 0.3,
+        "max_tokens": 1024
+    }
+    return _apply_response_format(payload, _response_format(response_format), "product_info", prompts.product_schema,
+                                  stream, prompts.sized_replies)
+
+
+def build_identify_all_payload(prepared, regions=None, max_items=None, response_format=None, version=None):
+    """
+    Payload asking the vision model for every product in a photo in one call.
+    With regions (the number of boxes drawn on the image) it names each box instead of finding them.
+    """
+    prompts = get_prompts(version)
+    max_items = max_items or config.MULTI_PRODUCT_MAX_ITEMS
+    if regions:
+        prompt, item_schema = prompts.identify_regions.format(count=regions), prompts.region_item_schema
+    else:
+        prompt, item_schema = prompts.identify_all.format(max_items=max_items), prompts.product_item_schema
+    payload = build_identify_payload(prepared, response_format="off", version=version)
+    payload["messages"][0]["content"][1]["text"] = prompt
+    payload["max_tokens"] = 2048
+    return _apply_response_format(payload, _response_format(response_format), "products",
+                                  product_list_schema(item_schema, regions or max_items), sized=prompts.sized_replies)
+
+
+def build_price_payload(product_query, response_format=None, version=None):
+    """Chat-completions payload asking for price estimates for a product query"""
+    prompts = get_prompts(version)
+    mode = _response_format(response_format)
+    user_prompt = prompts.price_user.format(product_query=product_query)
+    if mode is not None:
+        user_prompt += prompts.price_object
+    payload = {
+        "model": PRICE_MODEL,
+        "messages": [
+            {
+                "role": "system",
+                "content": prompts.price_system
+            },
+            {
+                "role": "user",
+                "content": user_prompt
+            }
+        ],
+        "temperature": 0.3,
+        "max_tokens": 2048
+    }
+    return _apply_response_format(payload, mode, "retailers", prompts.retailers_schema, sized=prompts.sized_replies)
+
+
+@dataclass
+class Identification:
+    """Outcome of identify_product(); error is set instead of raising"""
+    product_info: Optional[dict] = None
+    raw_text: str = ""
+    prepared: Optional[PreparedImage] = None
+    cached: bool = False
+    error: Optional[str] = None
+    error_kind: Optional[str] = None  # "config", "quality", "api", "parse", "no_data" or "unexpected"
+    error_details: str = ""
+    usage: dict = field(default_factory=dict)  # tokens reported by the API and estimated before, summed over retries
+    similarity: Optional[float] = None  # set when a visually similar image supplied product_info
+    quality: Optional[QualityReport] = None  # set when the photo went through the quality gate
+
+    @property
+    def ok(self):
+        return self.product_info is not None
+
+
+@dataclass
+class PriceLookup:
+    """Outcome of lookup_prices(); error is set instead of raising"""
+    query: str
+    results: Optional[dict] = None
+    raw_text: str = ""
+    cached: bool = False
+    error: Optional[str] = None
+    error_kind: Optional[str] = None  # "config", "api", "parse", "no_data" or "unexpected"
+    error_details: str = ""
+    usage: dict = field(default_factory=dict)  # tokens reported by the API and estimated before, summed over retries
+
+    @property
+    def ok(self):
+        return self.results is not None
+
+
+@dataclass
+class DetectedProduct:
+    """One product found by identify_products(); box is (left, top, right, bottom) in image fractions"""
+    product_info: dict
+    box: Optional[tuple] = None
+
+    @property
+    def search_query(self):
+        return self.product_info.get("search_query") or self.product_info.get("product_name")
+
+
+@dataclass
+class MultiIdentification:
+    """Outcome of identify_products(); error is set instead of raising"""
+    items: Optional[list] = None  # DetectedProduct, in reading order
+    detector: str = "model"
+    raw_text: str = ""
+    prepared: Optional[PreparedImage] = None
+    cached: bool = False
+    error: Optional[str] = None
+    error_kind: Optional[str] = None  # "config", "quality", "api", "parse", "no_data" or "unexpected"
+    error_details: str = ""
+    usage: dict = field(default_factory=dict)
+    quality: Optional[QualityReport] = None
+
+    @property
+    def ok(self):
+        return self.items is not None
+
+
+def _record_estimate(usage, payload):
+    """Add the estimate of a call about to be made to a result's usage, next to what the API reports"""
+    estimate = estimate_tokens(payload)
+    usage["estimated_prompt_tokens"] = usage.get("estimated_prompt_tokens", 0) + estimate["prompt_tokens"]
+    usage["completion_budget"] = usage.get("completion_budget", 0) + estimate["completion_budget"]
+
+
+def _record_usage(usage, endpoint, reported):
+    """Add the API's usage block to a result's counts and to the process totals"""
+    if not reported:
+        return
+    with _usage_lock:
+        totals = _usage_totals.setdefault(endpoint, dict.fromkeys(USAGE_FIELDS + ("requests",), 0))
+        totals["requests"] += 1
+        for name in USAGE_FIELDS:
+            count = reported.get(name) or 0
+            totals[name] += count
+            usage[name] = usage.get(name, 0) + count
+
+
+def _complete_json(client, payload, endpoint, parse, usage, retries=0):
+    """
+    Run a completion and parse its text, repeating the request up to `retries`
+    times while parse raises LLMJSONError or returns None.
+    Returns (value, text); the final LLMJSONError carries the reply in .text
+    """
+    attempt = 0
+    while True:
+        _record_estimate(usage, payload)
+        data = client.chat_completion(payload, endpoint=endpoint)
+        _record_usage(usage, endpoint, data.get("usage"))
+        text = data['choices'][0]['message']['content']
+        try:
+            with span("llm_json.parse", chars=len(text)):
+                value = parse(text)
+        except LLMJSONError as e:
+            if attempt >= retries:
+                e.text = text
+                raise
+        else:
+            if value is not None or attempt >= retries:
+                return value, text
+        attempt += 1
+
+
+def _stream_identification(client, payload, on_field, usage):
+    watcher = JsonFieldWatcher()
+    parts = []
+    reported = {}
+    _record_estimate(usage, payload)
+    for delta in client.stream_chat_completion(payload, endpoint="vision", usage=reported):
+        parts.append(delta)
+        for key, value in watcher.feed(delta):
+            if on_field:
+                # Compact output streams short keys
+                on_field(COMPACT_PRODUCT_KEYS.get(key, key), value)
+    _record_usage(usage, "vision", reported)
+    return "".join(parts)
+
+
+def identify_product(image, api_key, source_bytes=None, on_field=None, stream=None, check_quality=None):
+    """
+    Identify the product in a PIL image and return an Identification.
+    Results are cached by image fingerprint, so repeat uploads (re-saved or resized
+    copies included) skip the API call, and a close match in the visual index reuses an earlier product_info.
+    Otherwise a photo that fails the quality gate (check_quality, default
+    config.QUALITY_GATE) comes back with error_kind "quality" and no call is made.
+    With streaming on, on_field(key, value) is called for each top-level field
+    as soon as it is complete, so callers can act on search_query early.
+    """
+    if not api_key:
+        return Identification(error="GROQ_API_KEY not found", error_kind="config")
+
+    with span("identify") as root:
+        result = _identify(image, api_key, source_bytes, on_field, stream, check_quality)
+        root.set(ok=result.ok, cached=result.cached, **_usage_attributes(result.usage))
+        return result
+
+
+def _usage_attributes(usage):
+    return {f"tokens.{name}": count for name, count in usage.items()}
+
+
+def check_image_quality(image):
+    """Run the quality gate on a PIL image, counting the outcome for quality_gate_stats()"""
+    with span("image.quality") as check:
+        report = assess_quality(image)
+        check.set(ok=report.ok, problems=",".join(report.problems), sharpness=round(report.sharpness, 2),
+                  brightness=round(report.brightness, 1))
+    outcome = report.problems[0] if report.problems else "passed"
+    with _quality_lock:
+        _quality_counts[outcome] = _quality_counts.get(outcome, 0) + 1
+    return report
+
+
+def _quality_gate(image, check_quality):
+    """The failing QualityReport of a photo the gate sends back, or None to go ahead"""
+    if not (config.QUALITY_GATE if check_quality is None else check_quality):
+        return None
+    report = check_image_quality(image)
+    return None if report.ok else report
+
+
+def _identify(image, api_key, source_bytes, on_field, stream, check_quality):
+    id_cache = get_identification_cache()
+    with span("cache.identify") as lookup:
+        cache_key = image_fingerprint(image)
+        cached = id_cache.get_nearest(cache_key, similar_fingerprint(config.IDENTIFY_CACHE_MAX_DISTANCE))
+        lookup.set(hit=bool(cached))
+    if cached:
+        if on_field:
+            for key, value in cached.items():
+                on_field(key, value)
+        return Identification(product_info=cached, cached=True)
+
+    embedding = None
+    if config.VISUAL_INDEX:
+        with span("visual_index.match") as lookup:
+            embedding = image_embedding(image)
+            match = get_visual_index().match(embedding)
+            lookup.set(hit=bool(match))
+        if match:
+            product_info, similarity = match
+            id_cache.set(cache_key, product_info)
+            if on_field:
+                for key, value in product_info.items():
+                    on_field(key, value)
+            return Identification(product_info=product_info, cached=True, similarity=similarity)
+
+    # Checked only now: a photo already identified, or close to one, costs no call anyway
+    rejected = _quality_gate(image, check_quality)
+    if rejected:
+        return Identification(error=rejected.message, error_kind="quality", quality=rejected)
+
+    ran = []
+
+    def identify_uncached():
+        ran.append(True)
+        return _identify_uncached(image, api_key, source_bytes, on_field, stream, id_cache, cache_key, embedding)
+
+    # Identical images uploaded concurrently share one vision call
+    result = _identify_flight.do(cache_key, identify_uncached)
+    if not ran and result.ok and on_field:
+        for key, value in result.product_info.items():
+            on_field(key, value)
+    return result
+
+
+def _identify_uncached(image, api_key, source_bytes, on_field, stream, id_cache, cache_key, embedding):
+    cached = id_cache.peek(cache_key)
+    if cached:
+        if on_field:
+            for key, value in cached.items():
+                on_field(key, value)
+        return Identification(product_info=cached, cached=True)
+
+    result = Identification()
+    try:
+        with span("image.prepare"):
+            result.prepared = prepare_image(image, source_bytes=source_bytes)
+        client = get_router(api_key)
+        stream = config.GROQ_STREAMING if stream is None else stream
+        retries = config.GROQ_VALIDATION_RETRIES if _response_format(None) else 0
+
+        if stream:
+            payload = build_identify_payload(result.prepared, stream=True)
+            result.raw_text = _stream_identification(client, payload, on_field, result.usage)
+            try:
+                with span("llm_json.parse", chars=len(result.raw_text)):
+                    result.product_info = parse_product_info(result.raw_text)
+            except LLMJSONError:
+                if not retries:
+                    raise
+                # Retry without streaming so JSON mode can constrain the reply
+                result.product_info, result.raw_text = _complete_json(
+                    client, build_identify_payload(result.prepared), "vision", parse_product_info,
+                    result.usage, retries - 1
+                )
+        else:
+            result.product_info, result.raw_text = _complete_json(
+                client, build_identify_payload(result.prepared), "vision", parse_product_info, result.usage, retries
+            )
+        id_cache.set(cache_key, result.product_info)
+        if embedding is not None:
+            get_visual_index().add(embedding, result.product_info)
+        if config.CATALOGUE:
+            get_catalogue().add(result.product_info)
+    except GroqAPIError as e:
+        result.error, result.error_kind, result.error_details = str(e), "api", e.text
+    except LLMJSONError as e:
+        result.raw_text = e.text or result.raw_text
+        result.error = str(e)
+        result.error_kind = "no_data" if e.reason == "not_found" else "parse"
+        result.error_details = result.raw_text
+    except Exception as e:
+        result.error, result.error_kind = f"Error identifying product: {str(e)}", "unexpected"
+    return result
+
+
+def identify_products(image, api_key, source_bytes=None, detector=None, max_items=None, check_quality=None):
+    """
+    Identify every product in a PIL image with a single vision call and return a MultiIdentification.
+    detector is "model" (the model finds the items and their boxes) or "opencv" (regions are
+    found locally and numbered on the image; with fewer than two the model finds them instead).
+    Results are cached by image fingerprint and detector; uncached photos go through the
+    quality gate first, as in identify_product().
+    """
+    if not api_key:
+        return MultiIdentification(error="GROQ_API_KEY not found", error_kind="config")
+    detector = detector or config.MULTI_PRODUCT_DETECTOR
+    max_items = max_items or config.MULTI_PRODUCT_MAX_ITEMS
+
+    with span("identify.multi", detector=detector) as root:
+        id_cache = get_identification_cache()
+        cache_key = f"multi:{detector}:{image_fingerprint(image)}"
+        cached = id_cache.get_nearest(cache_key, similar_fingerprint(config.IDENTIFY_CACHE_MAX_DISTANCE))
+        rejected = _quality_gate(image, check_quality) if cached is None else None
+        if cached is not None:
+            result = MultiIdentification(items=[DetectedProduct(item["product_info"], tuple(item["box"] or ()) or None)
+                                                for item in cached], detector=detector, cached=True)
+        elif rejected:
+            result = MultiIdentification(detector=detector, error=rejected.message, error_kind="quality",
+                                         quality=rejected)
+        else:
+            result = _identify_flight.do(cache_key, lambda: _identify_products_uncached(
+                image, api_key, source_bytes, detector, max_items, id_cache, cache_key
+            ))
+        root.set(ok=result.ok, cached=result.cached, items=len(result.items or ()), **_usage_attributes(result.usage))
+        return result
+
+
+def _identify_products_uncached(image, api_key, source_bytes, detector, max_items, id_cache, cache_key):
+    result = MultiIdentification(detector=detector)
+    try:
+        # Boxes refer to the upright photo
+        from PIL import ImageOps
+
+        image = ImageOps.exif_transpose(image)
+        regions = []
+        if detector == "opencv":
+            with span("image.detect_regions") as detect:
+                regions = detect_regions(image, max_regions=max_items)
+                detect.set(regions=len(regions))
+            if len(regions) < 2:
+                regions = []
+        # Boxes are read against the whole photo, so no salient crop
+        with span("image.prepare"):
+            result.prepared = prepare_image(draw_regions(image, regions) if regions else image, crop=False,
+                                            source_bytes=source_bytes)
+        retries = config.GROQ_VALIDATION_RETRIES if _response_format(None) else 0
+        items, result.raw_text = _complete_json(
+            get_router(api_key), build_identify_all_payload(result.prepared, len(regions), max_items), "vision",
+            lambda text: parse_product_list(text, max_items) or None, result.usage, retries
+        )
+        width, height = image.size
+        result.items = []
+        for item in items or []:
+            box, region = item.pop("box"), item.pop("region")
+            if regions:
+                if region is None or not 1 <= region <= len(regions):
+                    continue
+                left, top, right, bottom = regions[region - 1]
+                box = (left / width, top / height, right / width, bottom / height)
+            result.items.append(DetectedProduct(item, tuple(box) if box else None))
+        if not result.items:
+            result.items = None
+            raise LLMJSONError("No products found in the image", "not_found", result.raw_text)
+        id_cache.set(cache_key, [{"product_info": item.product_info, "box": item.box} for item in result.items])
+        if config.CATALOGUE:
+            for item in result.items:
+                get_catalogue().add(item.product_info)
+    except GroqAPIError as e:
+        result.error, result.error_kind, result.error_details = str(e), "api", e.text
+    except LLMJSONError as e:
+        result.raw_text = e.text or result.raw_text
+        result.error = str(e)
+        result.error_kind = "no_data" if e.reason == "not_found" else "parse"
+        result.error_details = result.raw_text
+    except Exception as e:
+        result.error, result.error_kind = f"Error identifying products: {str(e)}", "unexpected"
+    return result
+
+
+def parse_price_results(product_query, full_text):
+    """
+    Build the results dict from a price reply, or None when it holds no usable prices
+    Raises LLMJSONError on JSON that cannot be repaired
+    """
+    try:
+        retailers = parse_retailers(full_text)
+    except LLMJSONError as e:
+        if e.reason == "not_found":
+            return None
+        raise
+
+    if retailers:
+        return {
+            "product_name": product_query,
+            "search_date": datetime.now().strftime("%Y-%m-%d %H:%M"),
+            "retailers": retailers,
+            "raw_response": full_text,
+            "note": PRICE_NOTE
+        }
+    return None
+
+
+def request_price_estimates(product_query, api_key, usage=None):
+    """
+    Ask Groq for price estimates, bypassing the cache
+    Returns (results, full_text); results is None when no price array could be parsed
+    With structured output on, a reply that fails validation is retried once.
+    Raises GroqAPIError, or LLMJSONError on JSON that cannot be repaired
+    """
+    retries = config.GROQ_VALIDATION_RETRIES if _response_format(None) else 0
+    return _complete_json(
+        get_router(api_key), build_price_payload(product_query), "pricing",
+        lambda text: parse_price_results(product_query, text), {} if usage is None else usage, retries
+    )
+
+
+def resolve_query(product_query):
+    """
+    What to price for a typed query: the search_query of the catalogue product it matches,
+    so misspellings and variants of one product share a cache entry.
+    Returns (query, product), product being None when nothing in the catalogue matched
+    """
+    if not config.CATALOGUE:
+        return product_query, None
+    with span("catalogue.match") as lookup:
+        found = get_catalogue().match(product_query)
+        lookup.set(hit=bool(found))
+    if not found:
+        return product_query, None
+    return found[0]["search_query"], found[0]
+
+
+def lookup_prices(product_query, api_key):
+    """
+    Cached price lookup returning a PriceLookup.
+    Results are cached by normalised query; stale entries are served while a refresh runs
+    """
+    if not api_key:
+        return PriceLookup(product_query, error="GROQ_API_KEY not found", error_kind="config")
+
+    with span("prices.lookup", query=product_query) as root:
+        price_cache = get_price_cache()
+        cache_key = normalize_query(product_query)
+        with span("cache.prices") as lookup:
+            cached = price_cache.get(cache_key, refresh=lambda: _refresh_prices(product_query, api_key))
+            lookup.set(hit=bool(cached))
+        if cached:
+            root.set(ok=True, cached=True)
+            return PriceLookup(product_query, results=cached, cached=True)
+
+        # Concurrent searches for the same normalised query share one LLM call
+        result = _price_flight.do(cache_key, lambda: _lookup_uncached(product_query, api_key, price_cache, cache_key))
+        root.set(ok=result.ok, cached=result.cached, **_usage_attributes(result.usage))
+        return result
+
+
+def refresh_prices(product_query, api_key):
+    """
+    Fresh price lookup that skips the cache and replaces its entry (for background re-pricing).
+    Shares an in-flight lookup of the same query like lookup_prices does
+    """
+    if not api_key:
+        return PriceLookup(product_query, error="GROQ_API_KEY not found", error_kind="config")
+    with span("prices.fresh", query=product_query) as root:
+        price_cache = get_price_cache()
+        cache_key = normalize_query(product_query)
+        result = _price_flight.do(cache_key, lambda: _lookup_uncached(product_query, api_key, price_cache, cache_key,
+                                                                      fresh=True))
+        root.set(ok=result.ok, **_usage_attributes(result.usage))
+        return result
+
+
+def _refresh_prices(product_query, api_key):
+    # Runs on a background thread, so it is a trace of its own
+    with span("prices.refresh", query=product_query):
+        results = request_price_estimates(product_query, api_key)[0]
+        if results:
+            get_price_history().record(product_query, results)
+        return results
+
+
+def _lookup_uncached(product_query, api_key, price_cache, cache_key, fresh=False):
+    # Another caller may have filled the cache while we were queued behind it
+    cached = None if fresh else price_cache.store.peek(cache_key)
+    if cached:
+        return PriceLookup(product_query, results=cached, cached=True)
+
+    result = PriceLookup(product_query)
+    try:
+        result.results, result.raw_text = request_price_estimates(product_query, api_key, result.usage)
+        if result.results:
+            price_cache.set(cache_key, result.results)
+            get_price_history().record(product_query, result.results)
+        else:
+            result.error, result.error_kind = "Could not parse price data", "no_data"
+            result.error_details = result.raw_text
+    except GroqAPIError as e:
+        result.error, result.error_kind, result.error_details = str(e), "api", e.text
+    except LLMJSONError as e:
+        result.raw_text = e.text
+        result.error, result.error_kind, result.error_details = str(e), "parse", result.raw_text
+    except Exception as e:
+        result.error, result.error_kind = f"Error searching prices: {str(e)}", "unexpected"
+    return result
+
+
+def coalescing_stats():
+    """Executions vs coalesced callers for the identification and price single-flight groups"""
+    return {"identify": _identify_flight.stats(), "prices": _price_flight.stats()}
+
+
+def quality_gate_stats():
+    """Photos checked by the quality gate: passed, rejected (each one a vision call avoided) and why"""
+    with _quality_lock:
+        counts = dict(_quality_counts)
+    passed = counts.pop("passed", 0)
+    rejected = sum(counts.values())
+    return {"checked": passed + rejected, "passed": passed, "rejected": rejected, "problems": counts}
+
+
+def token_usage():
+    """Prompt/completion tokens reported by the API so far, per endpoint ("vision", "pricing")"""
+    with _usage_lock:
+        return {endpoint: dict(totals) for endpoint, totals in _usage_totals.items()}
+
+
+def _metrics():
+    """Token and cache counters for telemetry.prometheus_text()"""
+    tokens = [({"endpoint": endpoint, "kind": name}, count)
+              for endpoint, totals in token_usage().items() for name, count in totals.items() if name != "requests"]
+    requests_made = [({"endpoint": endpoint}, totals["requests"]) for endpoint, totals in token_usage().items()]
+    caches = {"identify": get_identification_cache().stats(), "prices": get_price_cache().stats()}
+    if config.CATALOGUE:
+        catalogue = get_catalogue().stats()
+        caches["catalogue"] = {"hits": catalogue["matches"], "misses": catalogue["lookups"] - catalogue["matches"]}
+    if config.VISUAL_INDEX:
+        caches["visual"] = get_visual_index().stats()
+    lookups, ratios = [], []
+    for name, stats in caches.items():
+        lookups += [({"cache": name, "result": "hit"}, stats["hits"]),
+                    ({"cache": name, "result": "miss"}, stats["misses"])]
+        total = stats["hits"] + stats["misses"]
+        ratios.append(({"cache": name}, round(stats["hits"] / total, 4) if total else 0.0))
+    with _quality_lock:
+        quality = [({"result": outcome}, count) for outcome, count in _quality_counts.items()]
+    return [
+        ("price_finder_tokens_total", "counter", "Tokens reported in the Groq usage field", tokens),
+        ("price_finder_groq_requests_total", "counter", "Completions that reported usage", requests_made),
+        ("price_finder_cache_lookups_total", "counter", "Cache lookups by outcome", lookups),
+        ("price_finder_cache_hit_ratio", "gauge", "Hits over lookups since start", ratios),
+        ("price_finder_quality_checks_total", "counter", "Photos checked before identification, by outcome",
+         quality),
+    ]
+
+
+collector.register_metrics(_metrics)
@@ -0,0 +1,322 @@
+"""
+Shared HTTP client for the Groq chat-completions API.
+One pooled keep-alive session per API key, per-endpoint timeouts, retries with
+exponential backoff and jitter on 429/5xx, and a circuit breaker that fails
+fast while Groq is down. Calls wait their turn in a per-model FairScheduler
+so all sessions together stay inside the account's rate limits.
+"""
+import json
+import random
+import threading
+import time
+
+import config
+from rate_limit import FairScheduler, RequestShedError, estimate_payload_tokens
+from telemetry import record, span
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class GroqAPIError(Exception):
+    """Non-200 response (or no response at all) from the Groq API"""
+
+    def __init__(self, status_code, text=""):
+        super().__init__(f"Groq API Error: {status_code}")
+        self.status_code = status_code
+        self.text = text
+
+
+class CircuitOpenError(GroqAPIError):
+    """Raised without making a request while the circuit breaker is open"""
+
+    def __init__(self, retry_in):
+        super().__init__("circuit open", f"Groq API unavailable, retrying in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class QueueFullError(GroqAPIError):
+    """Raised without making a request when the rate-limit queue sheds it"""
+
+    def __init__(self, reason):
+        super().__init__("rate limited", f"Too many requests are waiting for Groq ({reason}). Please try again shortly.")
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures and lets one probe through after `reset_timeout`"""
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError while open; returns True for the one call let through as the probe"""
+        with self._lock:
+            if self.opened_at is None:
+                return False
+            waited = time.monotonic() - self.opened_at
+            if waited < self.reset_timeout:
+                raise CircuitOpenError(self.reset_timeout - waited)
+            if self.probing:
+                # Half-open with a probe in flight: everyone else waits for its verdict
+                raise CircuitOpenError(self.reset_timeout)
+            self.probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.probing = False
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """End a probe that gave no verdict (rate limited or shed), so the next call probes instead"""
+        with self._lock:
+            self.probing = False
+
+    @property
+    def state(self):
+        return "open" if self.opened_at is not None else "closed"
+
+
+def _retry_after_seconds(response):
+    """Parse a Retry-After header given either in seconds or as an HTTP date"""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    import email.utils
+
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class GroqClient:
+    """Thread-safe Groq client; use get_client() to share one per API key"""
+
+    def __init__(self, api_key, base_url=None, timeouts=None, max_retries=None,
+                 backoff_base=0.5, backoff_max=8.0, pool_size=None, breaker=None, limiter=None,
+                 requests_per_minute=None, tokens_per_minute=None):
+        self.api_key = api_key
+        # Optional rate_limit.RateLimiter consulted before every HTTP attempt
+        self.limiter = limiter
+        # Per-model quota for the FairScheduler; both at 0 turns scheduling off
+        self.requests_per_minute = config.GROQ_REQUESTS_PER_MINUTE if requests_per_minute is None \
+            else requests_per_minute
+        self.tokens_per_minute = config.GROQ_TOKENS_PER_MINUTE if tokens_per_minute is None else tokens_per_minute
+        self.schedulers = {}
+        self._schedulers_lock = threading.Lock()
+        self.base_url = (base_url or config.GROQ_BASE_URL).rstrip("/")
+        self.timeouts = timeouts or {
+            "vision": (config.GROQ_CONNECT_TIMEOUT, config.GROQ_VISION_READ_TIMEOUT),
+            "pricing": (config.GROQ_CONNECT_TIMEOUT, config.GROQ_PRICE_READ_TIMEOUT),
+        }
+        self.max_retries = config.GROQ_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker(config.GROQ_BREAKER_THRESHOLD, config.GROQ_BREAKER_RESET)
+
+        # requests is imported on first use, so importing this module (and core) stays cheap
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        pool_size = pool_size or config.GROQ_POOL_SIZE
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}"
+        })
+
+    def warm(self):
+        """Open a pooled connection (TCP and TLS) ahead of the first call; returns whether the API answered"""
+        import requests
+
+        try:
+            self.session.get(f"{self.base_url}/models", timeout=(config.GROQ_CONNECT_TIMEOUT,) * 2).close()
+            return True
+        except requests.RequestException:
+            return False
+
+    def scheduler(self, model):
+        """The FairScheduler for a model's quota, or None when no limits are set"""
+        if not (self.requests_per_minute or self.tokens_per_minute):
+            return None
+        with self._schedulers_lock:
+            scheduler = self.schedulers.get(model)
+            if scheduler is None:
+                scheduler = self.schedulers[model] = FairScheduler(
+                    self.requests_per_minute, self.tokens_per_minute, max_wait=config.GROQ_QUEUE_MAX_WAIT,
+                    batch_max_wait=config.GROQ_BATCH_MAX_WAIT, max_queue=config.GROQ_QUEUE_MAX
+                )
+            return scheduler
+
+    def _timeout(self, endpoint):
+        return self.timeouts.get(endpoint) or (config.GROQ_CONNECT_TIMEOUT, config.GROQ_PRICE_READ_TIMEOUT)
+
+    def _backoff(self, attempt, response=None):
+        """Seconds to wait before the next attempt; Retry-After wins when present"""
+        retry_after = _retry_after_seconds(response)
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max * 4)
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def post(self, path, payload, endpoint="pricing", stream=False):
+        """
+        POST a JSON payload with retries and return the successful response.
+        Raises GroqAPIError once retries are exhausted or on a non-retryable status.
+        With stream=True the body is left unread so it can be consumed incrementally.
+        """
+        probe = self.breaker.before_call()
+        try:
+            return self._post(path, payload, endpoint, stream)
+        finally:
+            if probe:
+                self.breaker.release()
+
+    def _post(self, path, payload, endpoint, stream):
+        import requests
+
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        last_error = None
+        scheduler = self.scheduler(payload.get("model"))
+        cost = estimate_payload_tokens(payload)
+
+        for attempt in range(self.max_retries + 1):
+            response = None
+            if self.limiter is not None:
+                with span("groq.rate_limit"):
+                    self.limiter.acquire()
+            if scheduler is not None:
+                with span("groq.queue", tokens=cost):
+                    try:
+                        scheduler.acquire(cost)
+                    except RequestShedError as e:
+                        raise QueueFullError(str(e)) from e
+            with span("groq.request", endpoint=endpoint, attempt=attempt) as request_span:
+                try:
+                    response = self.session.post(url, json=payload, timeout=self._timeout(endpoint), stream=stream)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    last_error = GroqAPIError("network error", str(e))
+                    request_span.set(status="network error")
+                else:
+                    # elapsed runs to the response headers: network plus, without streaming, generation
+                    request_span.set(status=response.status_code, to_headers_s=response.elapsed.total_seconds())
+            if response is not None:
+                if response.status_code == 200:
+                    self.breaker.record_success()
+                    return response
+                last_error = GroqAPIError(response.status_code, response.text)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    # Client errors (bad key, bad payload) won't improve with retries
+                    self.breaker.record_success()
+                    raise last_error
+            if scheduler is not None:
+                scheduler.refund(cost)
+
+            if attempt < self.max_retries:
+                delay = self._backoff(attempt, response)
+                if scheduler is not None and response is not None and response.status_code == 429:
+                    # Hold every session's queued calls instead of letting each retry on its own
+                    scheduler.pause(delay)
+                    continue
+                with span("groq.backoff"):
+                    time.sleep(delay)
+
+        if last_error.status_code != 429:
+            self.breaker.record_failure()
+        raise last_error
+
+    def chat_completion(self, payload, endpoint="pricing"):
+        """Call /chat/completions and return the decoded JSON body"""
+        response = self.post("chat/completions", payload, endpoint=endpoint)
+        with span("groq.decode", bytes=len(response.content)):
+            data = response.json()
+        self._settle(payload, data.get("usage"))
+        return data
+
+    def _settle(self, payload, usage):
+        scheduler = self.scheduler(payload.get("model"))
+        if scheduler is not None:
+            scheduler.settle(estimate_payload_tokens(payload), usage)
+
+    def stream_chat_completion(self, payload, endpoint="pricing", usage=None):
+        """
+        Call /chat/completions with stream=true and yield content deltas as they arrive.
+        Retries only apply until the first byte; a stream cut off midway raises GroqAPIError.
+        If a usage dict is given it is filled from the usage block sent with the last chunk.
+        """
+        import requests
+
+        payload = dict(payload, stream=True)
+        response = self.post("chat/completions", payload, endpoint=endpoint, stream=True)
+        reported = {}
+        started = time.time_ns()
+        first_token = None
+        chunks = 0
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    # Keep reading to the end of the body so the connection returns to the pool
+                    continue
+                try:
+                    chunk = json.loads(data)
+                except ValueError:
+                    raise GroqAPIError("stream error", data)
+                if chunk.get("error"):
+                    raise GroqAPIError("stream error", json.dumps(chunk["error"]))
+                # Groq reports usage under x_groq; OpenAI-style servers use a top-level field
+                reported = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage") or reported
+                if reported and usage is not None:
+                    usage.update(reported)
+                for choice in chunk.get("choices", []):
+                    content = (choice.get("delta") or {}).get("content")
+                    if content:
+                        chunks += 1
+                        first_token = first_token or time.time_ns()
+                        yield content
+        except requests.RequestException as e:
+            raise GroqAPIError("network error", str(e))
+        finally:
+            response.close()
+            self._settle(payload, reported)
+            # Recorded afterwards: a span held open across yields would leak into the consumer's code
+            record("groq.stream", started, endpoint=endpoint, chunks=chunks,
+                   first_token_s=round((first_token - started) / 1e9, 4) if first_token else -1.0)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key, base_url=None):
+    """Process-wide GroqClient for an API key (and endpoint), so sessions reuse the same connection pool"""
+    cache_key = api_key if base_url is None else (api_key, base_url)
+    with _clients_lock:
+        client = _clients.get(cache_key)
+        if client is None:
+            client = GroqClient(api_key, base_url=base_url)
+            _clients[cache_key] = client
+        return client
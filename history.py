@@ -0,0 +1,159 @@
+"""
+Local price history.
+Every retailer row from a fresh price lookup is appended to a SQLite table
+indexed on (product, retailer, ts), so price-over-time charts and "is this a
+good price?" checks can be answered from disk instead of a new LLM call.
+Writes go through a queue drained by one background thread in batches, so
+recording never blocks the Streamlit script thread.
+"""
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import config
+from cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+DAY = 24 * 3600
+
+
+class PriceHistory:
+    """Append-only time series of (product, retailer, price) observations"""
+
+    def __init__(self, path, batch_size=None, flush_interval=None):
+        self.path = path
+        self.batch_size = batch_size or config.HISTORY_BATCH_SIZE
+        self.flush_interval = flush_interval or config.HISTORY_FLUSH_INTERVAL
+        self.written = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS price_history ("
+            "product TEXT NOT NULL, retailer TEXT NOT NULL, ts REAL NOT NULL, "
+            "price REAL NOT NULL, condition TEXT, source TEXT)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS price_history_product_retailer_ts "
+            "ON price_history (product, retailer, ts)"
+        )
+        # Range queries across all retailers of a product
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS price_history_product_ts ON price_history (product, ts)"
+        )
+        self._conn.commit()
+
+        self._writer = threading.Thread(target=self._write_loop, name="price-history-writer", daemon=True)
+        self._writer.start()
+
+    def record(self, product_query, results, source="llm", ts=None):
+        """Queue every retailer row of a results dict; returns immediately"""
+        product = normalize_query(product_query)
+        if not product:
+            return
+        ts = time.time() if ts is None else ts
+        for row in results.get("retailers", []):
+            price = row.get("price")
+            if row.get("retailer") and isinstance(price, (int, float)) and price > 0:
+                self._queue.put((product, row["retailer"], ts, float(price), row.get("condition"), source))
+
+    def _write_loop(self):
+        # The writer has its own connection; with WAL, readers never wait for a batch commit
+        conn = sqlite3.connect(self.path, timeout=10)
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO price_history (product, retailer, ts, price, condition, source) "
+                        "VALUES (?, ?, ?, ?, ?, ?)", batch
+                    )
+                self.written += len(batch)
+            except sqlite3.Error:
+                logger.exception("Could not write %d price history rows", len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        """Block until every queued row has been written (for scripts and benchmarks)"""
+        self._queue.join()
+
+    def series(self, product_query, start=None, end=None, retailer=None):
+        """(ts, retailer, price) rows for a product between start and end (epoch seconds), oldest first"""
+        sql = "SELECT ts, retailer, price FROM price_history WHERE product = ? AND ts >= ? AND ts <= ?"
+        params = [normalize_query(product_query), start or 0, end or time.time()]
+        if retailer:
+            sql += " AND retailer = ?"
+            params.append(retailer)
+        with self._lock:
+            return self._conn.execute(sql + " ORDER BY ts", params).fetchall()
+
+    def summary(self, product_query, days=None):
+        """Count, min, max, average and first/last timestamps for a product over the last `days`"""
+        days = days or config.HISTORY_WINDOW_DAYS
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*), MIN(price), MAX(price), AVG(price), MIN(ts), MAX(ts) "
+                "FROM price_history WHERE product = ? AND ts >= ?",
+                (normalize_query(product_query), time.time() - days * DAY)
+            ).fetchone()
+        if not row[0]:
+            return None
+        return dict(zip(("count", "min", "max", "avg", "first_ts", "last_ts"), row))
+
+    def assess(self, product_query, price, days=None):
+        """
+        Judge a price against the product's recorded history.
+        Returns None without history, else a dict with verdict "good", "fair" or
+        "high", the share of recorded prices at or above this one, and the summary.
+        """
+        days = days or config.HISTORY_WINDOW_DAYS
+        summary = self.summary(product_query, days)
+        if summary is None or summary["count"] < config.HISTORY_MIN_OBSERVATIONS:
+            return None
+        with self._lock:
+            higher = self._conn.execute(
+                "SELECT COUNT(*) FROM price_history WHERE product = ? AND ts >= ? AND price >= ?",
+                (normalize_query(product_query), time.time() - days * DAY, price)
+            ).fetchone()[0]
+        beats = higher / summary["count"]
+        verdict = "good" if beats >= 0.75 else "fair" if beats >= 0.4 else "high"
+        return {"verdict": verdict, "beats": beats, "days": days, **summary}
+
+    def stats(self):
+        # The table is append-only, so the largest rowid is the row count without a scan
+        with self._lock:
+            rows = self._conn.execute("SELECT MAX(rowid) FROM price_history").fetchone()[0] or 0
+        return {"rows": rows, "pending": self._queue.qsize()}
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_price_history():
+    """Process-wide price history store in DATA_DIR/history.sqlite3"""
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = PriceHistory(os.path.join(config.DATA_DIR, "history.sqlite3"))
+        return _history
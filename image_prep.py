@@ -0,0 +1,309 @@
+"""
+Image preprocessing before the vision upload.
+Phone photos are fixed for EXIF orientation, cropped to the region that
+holds the product, downscaled to a pixel budget and re-encoded until they fit
+a byte budget, so the base64 payload stays small.
+"""
+import base64
+import io
+from dataclasses import dataclass
+
+import config
+from telemetry import span
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+MIN_QUALITY = 40
+# Longest side the quality gate looks at; its thresholds were calibrated at this size
+QUALITY_SIZE = 384
+QUALITY_TIPS = {
+    "too dark": "The photo is too dark. Turn on a light or move near a window.",
+    "overexposed": "The photo is washed out. Avoid pointing at a light or window, or turn off the flash.",
+    "blank": "There's nothing to identify in this photo. Point the camera at the product.",
+    "blurry": "The photo is blurry. Hold the camera steady and tap to focus on the product.",
+}
+
+
+@dataclass
+class PreparedImage:
+    """Encoded image ready to be sent as a data URL"""
+    base64: str
+    mime_type: str
+    width: int
+    height: int
+    encoded_bytes: int
+    source_bytes: int = None
+
+    @property
+    def data_url(self):
+        return f"data:{self.mime_type};base64,{self.base64}"
+
+    @property
+    def bytes_saved(self):
+        if not self.source_bytes:
+            return 0
+        return max(0, self.source_bytes - self.encoded_bytes)
+
+
+@dataclass
+class QualityReport:
+    """Cheap local measurements of a photo, and what is wrong with it for identification"""
+    brightness: float
+    contrast: float
+    clipped_dark: float
+    clipped_bright: float
+    edge_density: float
+    sharpness: float
+    problems: list
+
+    @property
+    def ok(self):
+        return not self.problems
+
+    @property
+    def message(self):
+        return " ".join(QUALITY_TIPS[problem] for problem in self.problems)
+
+
+def assess_quality(image):
+    """
+    Exposure, content and blur of a PIL image, measured on a QUALITY_SIZE grayscale copy
+    in a few milliseconds, with the problems found against the QUALITY_* thresholds.
+    Reports at most one problem; a dark, washed-out or blank photo is not also called blurry.
+    """
+    import numpy as np
+    from PIL import Image
+
+    if image.mode in ("P", "1", "I;16"):
+        image = image.convert('L')
+    # Integer box reduction first (cheap even on a 12 MP photo), then grayscale, then the exact size
+    factor = max(1, max(image.size) // QUALITY_SIZE)
+    gray = (image.reduce(factor) if factor > 1 else image).convert('L')
+    scale = QUALITY_SIZE / float(max(gray.size))
+    if scale < 1:
+        gray = gray.resize((max(3, round(gray.width * scale)), max(3, round(gray.height * scale))), Image.BILINEAR)
+    gray = np.asarray(gray, dtype=np.float32)
+    variance = float(gray.var())
+    inner = gray[1:-1, 1:-1]
+    laplacian = 4 * inner - gray[:-2, 1:-1] - gray[2:, 1:-1] - gray[1:-1, :-2] - gray[1:-1, 2:]
+    gradient = np.abs(gray[1:-1, 2:] - gray[1:-1, :-2]) + np.abs(gray[2:, 1:-1] - gray[:-2, 1:-1])
+    report = QualityReport(
+        brightness=float(gray.mean()),
+        contrast=variance ** 0.5,
+        clipped_dark=float((gray <= 16).mean()),
+        clipped_bright=float((gray >= 240).mean()),
+        edge_density=float((gradient > 48).mean()),
+        sharpness=100 * float(laplacian.var()) / max(variance, 1e-6),
+        problems=[],
+    )
+
+    if report.brightness < config.QUALITY_MIN_BRIGHTNESS or report.clipped_dark > config.QUALITY_MAX_CLIPPED:
+        report.problems.append("too dark")
+    elif report.brightness > config.QUALITY_MAX_BRIGHTNESS or report.clipped_bright > config.QUALITY_MAX_CLIPPED:
+        report.problems.append("overexposed")
+    if report.problems:
+        return report
+    # Blur leaves contrast but wipes out edges, so it is told apart from a blank frame by contrast
+    if report.contrast < config.QUALITY_MIN_CONTRAST:
+        report.problems.append("blank")
+    elif report.sharpness < config.QUALITY_MIN_SHARPNESS:
+        report.problems.append("blurry")
+    elif report.edge_density < config.QUALITY_MIN_EDGE_DENSITY:
+        report.problems.append("blank")
+    return report
+
+
+def salient_crop(image, margin=0.08, min_fraction=0.15, max_fraction=0.85):
+    """
+    Crop to the bounding box of strong edges, where the product usually is.
+    Uses OpenCV when installed; otherwise the image is returned unchanged.
+    """
+    try:
+        import cv2
+        import numpy as np
+    except ImportError:
+        return image
+
+    # Work on a small copy; edges only need a coarse view
+    factor = max(1, max(image.size) // 512)
+    small = image.reduce(factor) if factor > 1 else image
+    gray = cv2.cvtColor(np.asarray(small.convert('RGB')), cv2.COLOR_RGB2GRAY)
+    gray = cv2.GaussianBlur(gray, (5, 5), 0)
+    edges = cv2.Canny(gray, 50, 150)
+    ys, xs = np.nonzero(edges)
+    if len(xs) < 50:
+        return image
+
+    # Trim stray edges at the extremes so background clutter doesn't widen the box
+    left, right = np.percentile(xs, [2, 98])
+    top, bottom = np.percentile(ys, [2, 98])
+    sw, sh = small.size
+    pad_x, pad_y = margin * sw, margin * sh
+    left, top = max(0, left - pad_x), max(0, top - pad_y)
+    right, bottom = min(sw, right + pad_x), min(sh, bottom + pad_y)
+
+    fraction = ((right - left) * (bottom - top)) / float(sw * sh)
+    if not (min_fraction <= fraction <= max_fraction):
+        return image
+
+    factor = image.width / float(sw)
+    box = (int(left * factor), int(top * factor), int(right * factor), int(bottom * factor))
+    return image.crop(box)
+
+
+def _encode(image, image_format, quality):
+    buffered = io.BytesIO()
+    if image_format == "WEBP":
+        image.save(buffered, format="WEBP", quality=quality, method=4)
+    else:
+        image.save(buffered, format="JPEG", quality=quality, optimize=True)
+    return buffered.getvalue()
+
+
+def open_image(fp, max_pixels=None):
+    """
+    Open and decode an image file (path or file object). A JPEG much larger than the
+    max_pixels budget is decoded at a reduced scale, which is several times faster and
+    still leaves prepare_image at least the pixels it sends. Done here because the cache
+    fingerprint, quality gate and visual index all read the pixels before prepare_image.
+    """
+    from PIL import Image
+
+    max_pixels = max_pixels or config.IMAGE_MAX_PIXELS
+    image = Image.open(fp)
+    if image.format == "JPEG" and image.width * image.height > 4 * max_pixels:
+        scale = (max_pixels / float(image.width * image.height)) ** 0.5
+        image.draft('RGB', (int(image.width * scale), int(image.height * scale)))
+    image.load()
+    return image
+
+
+def prepare_image(image, max_pixels=None, max_bytes=None, image_format=None,
+                  quality=None, crop=None, source_bytes=None):
+    """
+    Orient, crop, downscale and encode a PIL image for the vision model.
+    The resolution is chosen from the pixel budget, then quality (and, if
+    needed, resolution) is stepped down until the encoding fits the byte budget.
+    """
+    from PIL import Image, ImageOps
+
+    max_pixels = max_pixels or config.IMAGE_MAX_PIXELS
+    max_bytes = max_bytes or config.IMAGE_MAX_BYTES
+    image_format = (image_format or config.IMAGE_FORMAT).upper()
+    if image_format not in MIME_TYPES:
+        image_format = "JPEG"
+    quality = quality or config.IMAGE_QUALITY
+    crop = config.IMAGE_SALIENT_CROP if crop is None else crop
+
+    with span("image.decode"):
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+    if crop:
+        with span("image.crop"):
+            image = salient_crop(image)
+
+    pixels = image.width * image.height
+    if pixels > max_pixels:
+        with span("image.resize", pixels=pixels):
+            scale = (max_pixels / float(pixels)) ** 0.5
+            image = image.resize((max(1, int(image.width * scale)), max(1, int(image.height * scale))), Image.LANCZOS, reducing_gap=2.0)
+
+    with span("image.encode", format=image_format) as encode_span:
+        data = _encode(image, image_format, quality)
+        while len(data) > max_bytes:
+            if quality > MIN_QUALITY:
+                quality = max(MIN_QUALITY, quality - 10)
+            else:
+                image = image.resize((max(1, int(image.width * 0.75)), max(1, int(image.height * 0.75))), Image.LANCZOS, reducing_gap=2.0)
+            data = _encode(image, image_format, quality)
+            if image.width <= 64 or image.height <= 64:
+                break
+        encode_span.set(quality=quality, bytes=len(data))
+
+    with span("image.base64"):
+        encoded = base64.b64encode(data).decode()
+
+    return PreparedImage(
+        base64=encoded,
+        mime_type=MIME_TYPES[image_format],
+        width=image.width,
+        height=image.height,
+        encoded_bytes=len(data),
+        source_bytes=source_bytes
+    )
+
+
+def legacy_encode(image):
+    """The original full-resolution JPEG q85 encoding, kept for benchmarks"""
+    buffered = io.BytesIO()
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGB')
+    image.save(buffered, format="JPEG", quality=85)
+    return buffered.getvalue()
+
+
+def detect_regions(image, max_regions=8, min_fraction=0.01, max_fraction=0.6):
+    """
+    Bounding boxes (left, top, right, bottom) of separate objects in a photo, largest first.
+    Edges are closed into blobs and each blob's outer contour becomes a box;
+    boxes mostly inside a bigger one are dropped. Empty without OpenCV.
+    """
+    try:
+        import cv2
+        import numpy as np
+    except ImportError:
+        return []
+
+    factor = max(1, max(image.size) // 512)
+    small = image.reduce(factor) if factor > 1 else image
+    gray = cv2.cvtColor(np.asarray(small.convert('RGB')), cv2.COLOR_RGB2GRAY)
+    gray = cv2.GaussianBlur(gray, (5, 5), 0)
+    edges = cv2.Canny(gray, 30, 100)
+    # Join the edges of one object into a solid blob without bridging neighbours
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (9, 9))
+    blobs = cv2.morphologyEx(cv2.dilate(edges, kernel), cv2.MORPH_CLOSE, kernel, iterations=2)
+    contours, _ = cv2.findContours(blobs, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    sw, sh = small.size
+    boxes = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if min_fraction <= (w * h) / float(sw * sh) <= max_fraction:
+            boxes.append((x, y, x + w, y + h))
+    boxes.sort(key=lambda b: (b[2] - b[0]) * (b[3] - b[1]), reverse=True)
+
+    kept = []
+    for box in boxes:
+        area = (box[2] - box[0]) * (box[3] - box[1])
+        if all(_overlap(box, other) < 0.6 * area for other in kept):
+            kept.append(box)
+        if len(kept) == max_regions:
+            break
+
+    scale = image.width / float(sw)
+    # Reading order, so region numbers run left to right, top to bottom
+    kept.sort(key=lambda b: (b[1] // max(1, sh // 4), b[0]))
+    return [tuple(int(v * scale) for v in box) for box in kept]
+
+
+def _overlap(a, b):
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    return max(0, width) * max(0, height)
+
+
+def draw_regions(image, boxes, labels=None):
+    """Copy of the image with each box outlined and numbered from 1 (or given labels)"""
+    from PIL import ImageDraw
+
+    image = image.convert('RGB')
+    draw = ImageDraw.Draw(image)
+    line = max(2, min(image.size) // 200)
+    size = max(12, min(image.size) // 25)
+    for index, box in enumerate(boxes):
+        label = str(labels[index] if labels else index + 1)
+        draw.rectangle(box, outline=(255, 0, 80), width=line)
+        tag = (box[0], box[1], box[0] + size * len(label) * 0.7 + line * 4, box[1] + size + line * 2)
+        draw.rectangle(tag, fill=(255, 0, 80))
+        draw.text((box[0] + line * 2, box[1] + line), label, fill=(255, 255, 255), font_size=size)
+    return image
@@ -0,0 +1,521 @@
+"""
+Helpers for reading JSON out of LLM replies.
+Replies arrive wrapped in markdown fences, surrounded by prose, cut off at
+max_tokens or written with Python-style quoting. find_json() scans once for
+a balanced object/array, repairs what it can, and the schema helpers below
+turn the result into clean product_info / retailers data.
+"""
+import json
+import re
+
+OPENERS = {'{': '}', '[': ']'}
+_DECODER = json.JSONDecoder()
+
+
+class LLMJSONError(ValueError):
+    """No usable JSON in an LLM reply; reason is 'not_found' or 'invalid'"""
+
+    def __init__(self, message, reason="invalid", text=""):
+        super().__init__(message)
+        self.reason = reason
+        self.text = text
+
+
+class JsonFieldWatcher:
+    """
+    Incremental scanner for a streamed JSON object.
+    Feed it text chunks as they arrive; it returns each top-level string field
+    as soon as its closing quote is seen, long before the object is complete.
+    Text before the first '{' (e.g. a ```json fence) is ignored.
+    """
+
+    def __init__(self):
+        self.fields = {}
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._buffer = []
+        self._key = None
+        self._expect = "key"
+
+    def feed(self, chunk):
+        """Consume a chunk and return a list of (key, value) pairs completed by it"""
+        completed = []
+        for char in chunk:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._finish_string(completed)
+                    continue
+                if self._depth == 1:
+                    self._buffer.append(char)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._buffer = []
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+            elif self._depth == 1:
+                if char == ':':
+                    self._expect = "value"
+                elif char == ',':
+                    self._expect = "key"
+                    self._key = None
+        return completed
+
+    def _finish_string(self, completed):
+        raw = "".join(self._buffer)
+        try:
+            text = json.loads(f'"{raw}"')
+        except json.JSONDecodeError:
+            text = raw
+        if self._expect == "key":
+            self._key = text
+        elif self._key is not None:
+            self.fields[self._key] = text
+            completed.append((self._key, text))
+            self._key = None
+
+
+def _normalise_quotes(text):
+    """Rewrite single-quoted strings as JSON strings, leaving double-quoted ones untouched"""
+    out = []
+    quote = None
+    escape = False
+    for char in text:
+        if quote:
+            if escape:
+                escape = False
+                # \' is not a valid JSON escape
+                out.append("'" if (char == "'" and quote == "'") else '\\' + char)
+                continue
+            if char == '\\':
+                escape = True
+                continue
+            if char == quote:
+                quote = None
+                out.append('"')
+                continue
+            out.append('\\"' if (char == '"' and quote == "'") else char)
+            continue
+        if char in '"\'':
+            quote = char
+            out.append('"')
+        else:
+            out.append(char)
+    return "".join(out)
+
+
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+_PY_LITERALS = re.compile(r'\b(True|False|None)\b')
+_PY_TO_JSON = {"True": "true", "False": "false", "None": "null"}
+
+
+def loads_lenient(text):
+    """json.loads, retried after fixing single quotes, trailing commas and Python literals"""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as first_error:
+        fixed = _normalise_quotes(text) if "'" in text else text
+        fixed = _TRAILING_COMMA.sub(r'\1', fixed)
+        fixed = _PY_LITERALS.sub(lambda m: _PY_TO_JSON[m.group(1)], fixed)
+        if fixed == text:
+            raise first_error
+        return json.loads(fixed)
+
+
+_SPECIAL = re.compile(r'[\\"\'{}\[\],]')
+
+
+def _scan(text, start):
+    """
+    Walk from an opening bracket to its matching close, tracking strings.
+    Returns (end, None) for a balanced span, or (None, state) when the text runs
+    out first; state holds what is needed to repair the truncation.
+    Only structural characters are visited, so long string values cost little.
+    """
+    stack = []
+    quote = None
+    skip = -1
+    commas = []
+    for match in _SPECIAL.finditer(text, start):
+        pos = match.start()
+        if pos <= skip:
+            continue
+        char = text[pos]
+        if quote:
+            if char == '\\':
+                skip = pos + 1
+            elif char == quote:
+                quote = None
+            continue
+        if char in '"\'':
+            quote = char
+        elif char in OPENERS:
+            stack.append(OPENERS[char])
+        elif char in '}]':
+            if not stack or stack[-1] != char:
+                return None, None
+            stack.pop()
+            if not stack:
+                return pos + 1, None
+        elif char == ',':
+            commas.append((pos, tuple(stack)))
+    return None, {"stack": stack, "quote": quote, "commas": commas}
+
+
+def _repair(text, start, state, max_cuts=8):
+    """Close a truncated span: first as-is, then cut back to each of the last few commas"""
+    closers = "".join(reversed(state["stack"]))
+    tail = text[start:].rstrip()
+    if state["quote"]:
+        tail += state["quote"]
+    candidates = [tail.rstrip(',') + closers]
+    if tail.endswith(':'):
+        candidates.insert(0, tail + "null" + closers)
+    for pos, stack in reversed(state["commas"][-max_cuts:]):
+        candidates.append(text[start:pos] + "".join(reversed(stack)))
+    for candidate in candidates:
+        try:
+            return loads_lenient(candidate)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def find_json(text, kind=None, repair=True):
+    """
+    Return the first JSON value in text whose outer type matches kind
+    (dict, list or None for either). Markdown fences and surrounding prose are
+    skipped, and truncated values are repaired when repair is True.
+    Raises LLMJSONError.
+    """
+    openers = {dict: '{', list: '['}.get(kind, '{[')
+    last_error = None
+    pos = 0
+    while True:
+        starts = [i for i in (text.find(o, pos) for o in openers) if i != -1]
+        if not starts:
+            break
+        start = min(starts)
+        # Fast path: the C decoder parses a well-formed value and ignores whatever follows it
+        try:
+            return _DECODER.raw_decode(text, start)[0]
+        except json.JSONDecodeError:
+            pass
+        end, state = _scan(text, start)
+        if end is not None:
+            try:
+                return loads_lenient(text[start:end])
+            except json.JSONDecodeError as e:
+                last_error = e
+        elif state is not None and repair:
+            value = _repair(text, start, state)
+            if value is not None:
+                return value
+        pos = start + 1
+
+    if last_error is not None:
+        raise LLMJSONError(f"Error parsing JSON: {last_error}", "invalid", text)
+    raise LLMJSONError("Could not find valid JSON in response", "not_found", text)
+
+
+PRODUCT_FIELDS = ("search_query", "product_name", "brand", "category", "description")
+RETAILER_TEXT_FIELDS = ("retailer", "condition", "url", "availability", "discount")
+
+# Compact output (prompts.py v3): short keys, and codes instead of free text for
+# condition and availability. Rows are expanded back to the full fields as they
+# are validated, so nothing after parsing sees the difference.
+COMPACT_PRODUCT_KEYS = {"q": "search_query", "n": "product_name", "b": "brand", "c": "category",
+                        "d": "description", "bb": "box", "r": "region"}
+COMPACT_RETAILER_KEYS = {"r": "retailer", "p": "price", "c": "condition", "s": "availability", "o": "discount",
+                         "u": "url"}
+COMPACT_CODES = {
+    "condition": {"n": "new", "r": "refurbished", "u": "used"},
+    "availability": {"in": "in stock", "low": "limited stock", "out": "out of stock"},
+}
+# Compact price replies leave out the URL; these retailers get their home page back
+RETAILER_HOMEPAGES = {
+    "amazon": "https://amazon.in", "amazon india": "https://amazon.in", "flipkart": "https://flipkart.com",
+    "myntra": "https://myntra.com", "ajio": "https://ajio.com", "meesho": "https://meesho.com",
+    "snapdeal": "https://snapdeal.com", "tata cliq": "https://tatacliq.com", "croma": "https://croma.com",
+    "reliance digital": "https://reliancedigital.in", "nykaa": "https://nykaa.com",
+}
+
+
+def expand_compact(row, keys):
+    """A compact-output row with full field names and its codes spelled out; other values are returned as-is"""
+    if not isinstance(row, dict) or not any(key in keys for key in row):
+        return row
+    expanded = {keys.get(key, key): value for key, value in row.items()}
+    for field, codes in COMPACT_CODES.items():
+        value = expanded.get(field)
+        if isinstance(value, str) and value.strip().lower() in codes:
+            expanded[field] = codes[value.strip().lower()]
+    return expanded
+
+_NUMBER = re.compile(r'\d[\d,]*(?:\.\d+)?')
+_MULTIPLIER = re.compile(r'\s*(crore|cr|lakhs?|lacs?|k)\b', re.IGNORECASE)
+_MULTIPLIERS = {"crore": 10 ** 7, "cr": 10 ** 7, "lakh": 10 ** 5, "lakhs": 10 ** 5,
+                "lac": 10 ** 5, "lacs": 10 ** 5, "k": 10 ** 3}
+
+
+def coerce_price(value):
+    """
+    Turn an LLM price into a number: 89999, "₹89,999", "Rs. 1,299.00",
+    "1.2 lakh" and "₹1,000 - ₹1,200" (first figure) are all accepted.
+    Returns None when no positive price can be read.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value if value > 0 else None
+    if not isinstance(value, str):
+        return None
+    match = _NUMBER.search(value)
+    if not match:
+        return None
+    number = float(match.group().replace(',', ''))
+    multiplier = _MULTIPLIER.match(value, match.end())
+    if multiplier:
+        number *= _MULTIPLIERS[multiplier.group(1).lower()]
+    if number <= 0:
+        return None
+    return int(number) if number.is_integer() else number
+
+
+def validate_product_info(value):
+    """Check a parsed identification reply and normalise its fields to stripped strings"""
+    if not isinstance(value, dict):
+        raise LLMJSONError("Product JSON is not an object", "invalid")
+    value = expand_compact(value, COMPACT_PRODUCT_KEYS)
+    product_info = {}
+    for field in PRODUCT_FIELDS:
+        field_value = value.get(field)
+        if field_value is None:
+            continue
+        field_value = field_value if isinstance(field_value, str) else json.dumps(field_value)
+        if field_value.strip():
+            product_info[field] = field_value.strip()
+    if not (product_info.get("product_name") or product_info.get("search_query")):
+        raise LLMJSONError("Product JSON has no product_name or search_query", "invalid")
+    return product_info
+
+
+def validate_retailers(value):
+    """
+    Check a parsed price reply and return the usable retailer rows.
+    Accepts a bare array or an object wrapping one (e.g. {"retailers": [...]}).
+    Rows without a retailer name or a positive price are dropped.
+    """
+    if isinstance(value, dict):
+        value = next((v for v in value.values() if isinstance(v, list)), None)
+    if not isinstance(value, list):
+        raise LLMJSONError("Price JSON is not an array", "invalid")
+    retailers = []
+    for row in value:
+        if not isinstance(row, dict):
+            continue
+        compact = expand_compact(row, COMPACT_RETAILER_KEYS)
+        if compact is not row and not compact.get("url") and isinstance(compact.get("retailer"), str):
+            compact["url"] = RETAILER_HOMEPAGES.get(compact["retailer"].strip().lower())
+        row = compact
+        price = coerce_price(row.get("price"))
+        name = row.get("retailer")
+        if price is None or not isinstance(name, str) or not name.strip():
+            continue
+        clean = {field: str(row[field]).strip() for field in RETAILER_TEXT_FIELDS if row.get(field) is not None}
+        clean["price"] = price
+        retailers.append(clean)
+    return retailers
+
+
+def parse_product_list(text, max_items=None):
+    """Extract and validate the items of a multi-product vision reply; raises LLMJSONError"""
+    # The outermost value: looking for an object first would pick the first item of a bare array
+    return validate_product_list(find_json(text), max_items)
+
+
+def parse_product_info(text):
+    """Extract and validate product_info from a vision reply; raises LLMJSONError"""
+    return validate_product_info(find_json(text, dict))
+
+
+def _coerce_box(value):
+    """[left, top, right, bottom] as fractions of the image size, or None when unusable"""
+    if not isinstance(value, (list, tuple)) or len(value) != 4:
+        return None
+    try:
+        box = [float(v) for v in value]
+    except (TypeError, ValueError):
+        return None
+    # Some models answer in per-mille or percent instead of fractions
+    scale = max(box)
+    if scale > 1:
+        box = [v / (1000.0 if scale > 100 else 100.0) for v in box]
+    left, top, right, bottom = (min(1.0, max(0.0, v)) for v in box)
+    if right <= left or bottom <= top:
+        return None
+    return [left, top, right, bottom]
+
+
+def validate_product_list(value, max_items=None):
+    """
+    Check a multi-product reply ({"items": [...]} or a bare array) and return its items.
+    Each item is a product_info dict plus "box" (fractions, or None) and "region" (int, or None).
+    Items without a product_name or search_query are dropped.
+    """
+    if isinstance(value, dict):
+        value = next((v for v in value.values() if isinstance(v, list)), None)
+    if not isinstance(value, list):
+        raise LLMJSONError("Product list JSON is not an array", "invalid")
+    items = []
+    for row in value:
+        row = expand_compact(row, COMPACT_PRODUCT_KEYS)
+        try:
+            item = validate_product_info(row)
+        except LLMJSONError:
+            continue
+        item["box"] = _coerce_box(row.get("box"))
+        try:
+            item["region"] = int(row["region"])
+        except (KeyError, TypeError, ValueError):
+            item["region"] = None
+        items.append(item)
+    return items[:max_items] if max_items else items
+
+
+def parse_retailers(text):
+    """Extract and validate the retailers list from a price reply; raises LLMJSONError"""
+    try:
+        value = find_json(text, list)
+    except LLMJSONError as e:
+        if e.reason != "not_found":
+            raise
+        # Some replies wrap the array in an object
+        value = find_json(text, dict)
+    return validate_retailers(value)
+
+
+# JSON Schemas for Groq structured output. maxLength/maxItems are not enforced by
+# the API; they are the budget estimate_max_tokens() sizes the reply from.
+PRODUCT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "search_query": {"type": "string", "maxLength": 80},
+        "product_name": {"type": "string", "maxLength": 100},
+        "brand": {"type": "string", "maxLength": 40},
+        "category": {"type": "string", "maxLength": 40},
+        "description": {"type": "string", "maxLength": 240},
+    },
+    "required": list(PRODUCT_FIELDS),
+    "additionalProperties": False,
+}
+
+RETAILER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "retailer": {"type": "string", "maxLength": 30},
+        "price": {"type": "number"},
+        "condition": {"type": "string", "maxLength": 20},
+        "url": {"type": "string", "maxLength": 40},
+        "availability": {"type": "string", "maxLength": 24},
+        "discount": {"type": "string", "maxLength": 40},
+    },
+    "required": ["retailer", "price", "condition", "url", "availability", "discount"],
+    "additionalProperties": False,
+}
+
+# Every product in one photo, located by a box in image fractions or by a numbered region
+PRODUCT_ITEM_SCHEMA = {
+    "type": "object",
+    "properties": dict(PRODUCT_SCHEMA["properties"], box={"type": "array", "items": {"type": "number"},
+                                                         "minItems": 4, "maxItems": 4}),
+    "required": list(PRODUCT_FIELDS) + ["box"],
+    "additionalProperties": False,
+}
+
+REGION_ITEM_SCHEMA = {
+    "type": "object",
+    "properties": dict(PRODUCT_SCHEMA["properties"], region={"type": "integer"}),
+    "required": list(PRODUCT_FIELDS) + ["region"],
+    "additionalProperties": False,
+}
+
+
+def product_list_schema(item_schema, max_items):
+    return {
+        "type": "object",
+        "properties": {"items": {"type": "array", "items": item_schema, "maxItems": max_items}},
+        "required": ["items"],
+        "additionalProperties": False,
+    }
+
+
+# JSON mode only allows an object at the top level, so the array is wrapped
+RETAILERS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "retailers": {"type": "array", "items": RETAILER_SCHEMA, "minItems": 5, "maxItems": 8},
+    },
+    "required": ["retailers"],
+    "additionalProperties": False,
+}
+
+
+def compact_schema(schema, keys):
+    """schema with the properties of its objects renamed to the compact keys (keys maps short to full names)"""
+    short = {full: key for key, full in keys.items()}
+    kind = schema.get("type")
+    if kind == "object":
+        return dict(schema, properties={short.get(name, name): compact_schema(sub, keys)
+                                        for name, sub in schema.get("properties", {}).items()},
+                    required=[short.get(name, name) for name in schema.get("required", [])])
+    if kind == "array" and "items" in schema:
+        return dict(schema, items=compact_schema(schema["items"], keys))
+    return schema
+
+
+# Compact price rows: no URL, codes for condition and availability, a short offer
+COMPACT_RETAILER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "r": {"type": "string", "maxLength": 30},
+        "p": {"type": "number"},
+        "c": {"type": "string", "enum": list(COMPACT_CODES["condition"]), "maxLength": 1},
+        "s": {"type": "string", "enum": list(COMPACT_CODES["availability"]), "maxLength": 3},
+        "o": {"type": "string", "maxLength": 24},
+    },
+    "required": ["r", "p", "c", "s", "o"],
+    "additionalProperties": False,
+}
+
+COMPACT_RETAILERS_SCHEMA = dict(RETAILERS_SCHEMA, properties={
+    "retailers": dict(RETAILERS_SCHEMA["properties"]["retailers"], items=COMPACT_RETAILER_SCHEMA),
+})
+
+
+def _schema_tokens(schema):
+    """Rough upper bound on the tokens needed to write a value matching schema"""
+    kind = schema.get("type")
+    if kind == "object":
+        # Key, quotes, colon, comma and indentation cost a few tokens per property
+        return 2 + sum(len(key) // 4 + 4 + _schema_tokens(sub) for key, sub in schema.get("properties", {}).items())
+    if kind == "array":
+        return 2 + schema.get("maxItems", 10) * (_schema_tokens(schema.get("items", {})) + 1)
+    if kind == "string":
+        return schema.get("maxLength", 200) // 4 + 1
+    return 6
+
+
+def estimate_max_tokens(schema, headroom=1.25, floor=64):
+    """max_tokens that comfortably fits a reply matching schema without leaving room to ramble"""
+    return max(floor, int(_schema_tokens(schema) * headroom))
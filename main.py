@@ -1,21 +1,45 @@
 import streamlit as st
-import requests
-from PIL import Image
+from PIL import ImageOps
+import contextvars
 import io
-import base64
-from datetime import datetime
-import json
+import queue
 import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+from datetime import datetime
 
-# Page configuration
-st.set_page_config(
-    page_title="AI Product Price Finder - India",
-    page_icon="🔍",
-    layout="wide"
+import numpy as np
+import pandas as pd
+
+import config
+from cache import get_identification_cache, get_price_cache
+from catalogue import get_catalogue
+from core import (
+    PriceLookup, coalescing_stats, identify_product, identify_products, lookup_prices, quality_gate_stats, resolve_query,
+    token_usage
 )
+from history import get_price_history
+from image_prep import draw_regions, open_image
+from prewarm import prewarm
+from price_sources import collect_prices
+from price_table import analyse
+from rate_limit import current_request, request_context
+import router
+from telemetry import collector, export_otlp_json, prometheus_text, span
+from visual_index import get_visual_index
+from watchlist import get_watchlist, start_scheduler
+
+def configure_page():
+    """Page configuration and custom CSS; set_page_config has to be the first Streamlit call"""
+    st.set_page_config(
+        page_title="AI Product Price Finder - India",
+        page_icon="🔍",
+        layout="wide"
+    )
 
-# Custom CSS
-st.markdown("""
+    # Custom CSS
+    st.markdown("""
 <style>
     .main-header {
         font-size: 2.5rem;
@@ -62,247 +86,220 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize session state
-if 'search_results' not in st.session_state:
-    st.session_state.search_results = None
-if 'product_name' not in st.session_state:
-    st.session_state.product_name = None
-if 'identified_product' not in st.session_state:
-    st.session_state.identified_product = None
-
-def image_to_base64(image):
-    """Convert PIL Image to base64 string"""
-    buffered = io.BytesIO()
-    if image.mode in ('RGBA', 'LA', 'P'):
-        image = image.convert('RGB')
-    image.save(buffered, format="JPEG", quality=85)
-    return base64.b64encode(buffered.getvalue()).decode()
-
-def identify_product_from_image(image):
-    """
-    Use Groq API with Llama 4 Scout vision model to identify product
-    """
-    text_content = ""
+# Static sections are fragments so widget interactions elsewhere don't re-run them
+# (st.fragment on Streamlit >= 1.37, st.experimental_fragment on 1.33-1.36)
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+def init_session_state():
+    if 'search_results' not in st.session_state:
+        st.session_state.search_results = None
+    if 'product_name' not in st.session_state:
+        st.session_state.product_name = None
+    if 'identified_product' not in st.session_state:
+        st.session_state.identified_product = None
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    if 'watcher_id' not in st.session_state:
+        # Owner of this browser's price watches, kept in the page URL so a reload or bookmark finds them again
+        watcher = st.query_params.get("watcher", "")
+        st.session_state.watcher_id = watcher if re.fullmatch(r"[0-9a-f]{32}", watcher) else uuid.uuid4().hex
+
+@st.cache_resource
+def get_price_executor():
+    """Worker threads for price searches started while the vision reply is still streaming"""
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="price-search")
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_image(data):
+    """Decode uploaded bytes once; reruns reuse the decoded image"""
+    with span("image.decode", bytes=len(data)):
+        return open_image(io.BytesIO(data))
+
+def get_api_key():
+    """GROQ_API_KEY from Streamlit secrets, falling back to the environment"""
+    try:
+        api_key = st.secrets.get("GROQ_API_KEY", None)
+    except FileNotFoundError:
+        api_key = None
+    return api_key or config.load_api_key()
+
+@st.cache_resource
+def configure_routing():
+    """Hand the key pool and model lists in st.secrets to the router, once per process"""
     try:
-        with st.spinner("🤖 Analyzing image with AI..."):
-            base64_image = image_to_base64(image)
-            
-            # Get API key from Streamlit secrets
-            api_key = st.secrets.get("GROQ_API_KEY", None)
-            if not api_key:
-                st.error("⚠️ GROQ_API_KEY not found. Please add it to .streamlit/secrets.toml")
-                st.code("""
+        router.configure(st.secrets)
+    except FileNotFoundError:
+        pass
+
+@st.cache_resource
+def start_price_watch(api_key):
+    """Start re-pricing watched products in the background, once per process"""
+    return start_scheduler(api_key)
+
+@st.cache_resource
+def start_prewarm(api_key):
+    """Import heavy modules, open stores and connect to Groq on a background thread, once per process"""
+    thread = threading.Thread(target=prewarm, args=(api_key,), name="prewarm", daemon=True)
+    thread.start()
+    return thread
+
+def show_missing_api_key():
+    st.error("⚠️ GROQ_API_KEY not found. Please add it to .streamlit/secrets.toml")
+    st.code("""
 # Create .streamlit/secrets.toml with:
 GROQ_API_KEY = "gsk_your-groq-api-key-here"
-                """)
-                return None
-            
-            response = requests.post(
-                "https://api.groq.com/openai/v1/chat/completions",
-                headers={
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {api_key}"
-                },
-                json={
-                    "model": "meta-llama/llama-4-scout-17b-16e-instruct",
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/jpeg;base64,{base64_image}"
-                                    }
-                                },
-                                {
-                                    "type": "text",
-                                    "text": """Analyze this product image carefully and identify what it is. Be as specific as possible about brand, model, and features.
-
-Return ONLY a valid JSON object with no additional text, explanations, or markdown:
-{
-    "product_name": "specific product name with brand and model if visible",
-    "brand": "brand name",
-    "category": "product category (electronics/fashion/home/etc)",
-    "description": "brief description of visible features",
-    "search_query": "optimized search query for Indian e-commerce sites"
-}
+    """)
 
-Important: Return ONLY the JSON object, nothing else."""
-                                }
-                            ]
-                        }
-                    ],
-                    "temperature": 0.3,
-                    "max_tokens": 1024
-                }
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                text_content = data['choices'][0]['message']['content']
-                
-                # Clean and extract JSON
-                text_content = text_content.strip()
-                
-                # Remove markdown if present
-                if '```json' in text_content:
-                    start = text_content.find('```json') + 7
-                    end = text_content.find('```', start)
-                    if end == -1:
-                        end = len(text_content)
-                    text_content = text_content[start:end].strip()
-                elif '```' in text_content:
-                    start = text_content.find('```') + 3
-                    end = text_content.find('```', start)
-                    if end == -1:
-                        end = len(text_content)
-                    text_content = text_content[start:end].strip()
-                
-                # Find JSON object
-                json_start = text_content.find('{')
-                json_end = text_content.rfind('}') + 1
-                
-                if json_start != -1 and json_end > json_start:
-                    json_str = text_content[json_start:json_end]
-                    product_info = json.loads(json_str)
-                    return product_info
-                else:
-                    st.error("Could not find valid JSON in response")
-                    with st.expander("View raw response"):
-                        st.text_area("Raw Response", text_content, height=200)
-                    return None
-            else:
-                st.error(f"Groq API Error: {response.status_code}")
-                with st.expander("View error details"):
-                    st.code(response.text)
-                return None
-                
-    except json.JSONDecodeError as e:
-        st.error(f"Error parsing JSON: {str(e)}")
+def identify_anyway():
+    st.session_state.skip_quality_check = True
+
+def show_error(result):
+    """Render the error of a core.Identification or core.PriceLookup"""
+    if result.error_kind == "config":
+        show_missing_api_key()
+    elif result.error_kind == "quality":
+        st.warning(f"📸 {result.error} Then upload or take the photo again.")
+        st.button("Use this photo anyway", on_click=identify_anyway,
+                  help="Skip the photo check and send it to the AI as it is")
+    elif result.error_kind == "no_data" and isinstance(result, PriceLookup):
+        st.warning(f"⚠️ {result.error}")
+        with st.expander("View response"):
+            st.text_area("Response", result.error_details, height=300)
+    elif result.error_kind == "api":
+        st.error(result.error)
+        with st.expander("View error details"):
+            st.code(result.error_details)
+    elif result.error_kind in ("parse", "no_data"):
+        st.error(result.error)
         with st.expander("View raw response"):
-            st.text_area("Raw Response", text_content, height=200)
-        return None
-    except Exception as e:
-        st.error(f"Error identifying product: {str(e)}")
-        return None
-
-def search_product_prices_groq(product_query):
+            st.text_area("Raw Response", result.error_details or "No content", height=200)
+    else:
+        st.error(result.error)
+
+def show_queue_position(notice, position, wait):
+    """Tell the user where their Groq call stands in the queue shared by all sessions"""
+    if position is None:
+        notice.empty()
+    else:
+        notice.info(f"🚦 Groq is busy: you're #{position} in line, about {wait:.0f}s to go")
+
+def groq_session():
+    """Attribute Groq calls made in this block to the current session, showing any queue wait"""
+    notice = st.empty()
+    return request_context(st.session_state.session_id,
+                           on_wait=lambda position, wait: show_queue_position(notice, position, wait))
+
+def wait_for_result(future):
+    """Wait for a background Groq call, showing its queue position while it waits for quota"""
+    request = current_request()
+    notice = st.empty()
+    while True:
+        try:
+            result = future.result(timeout=0.2)
+            break
+        except FutureTimeoutError:
+            if request is not None:
+                show_queue_position(notice, request.position, request.wait)
+    notice.empty()
+    return result
+
+def identify_product_from_image(image, source_bytes=None, on_field=None, check_quality=None):
+    """
+    Use Groq API with Llama 4 Scout vision model to identify product
+    The reply is streamed: fields are shown as they arrive and passed to on_field
+    source_bytes is the size of the uploaded file, used to report bytes saved
+    Returns the core.Identification; errors have already been shown
+    """
+    preview = st.empty()
+    seen = {}
+
+    def show_field(key, value):
+        seen[key] = value
+        lines = [f"**{label}:** {seen[field]}" for field, label in
+                 (("product_name", "Name"), ("brand", "Brand"), ("category", "Category")) if field in seen]
+        if lines:
+            preview.info("  \n".join(["⏳ " + lines[0]] + lines[1:]))
+        if on_field:
+            on_field(key, value)
+
+    with st.spinner("🤖 Analyzing image with AI..."):
+        result = identify_product(image, get_api_key(), source_bytes=source_bytes, on_field=show_field,
+                                  check_quality=check_quality)
+    preview.empty()
+
+    if result.similarity is not None:
+        st.caption(f"🔁 Matched a product identified earlier ({result.similarity:.0%} similar), no AI call needed")
+    prepared = result.prepared
+    if prepared and prepared.source_bytes:
+        st.caption(f"📉 Sent {prepared.encoded_bytes / 1024:,.0f} KB "
+                   f"({prepared.width}×{prepared.height}), "
+                   f"{prepared.bytes_saved / 1024:,.0f} KB smaller than the original")
+    if not result.ok:
+        show_error(result)
+    return result
+
+def start_price_search(product_query):
+    """Start a price search in the background and return its Future"""
+    # Run in a copy of this context so the lookup's spans join the current request's trace
+    return get_price_executor().submit(contextvars.copy_context().run, lookup_prices, product_query, get_api_key())
+
+def search_product_prices_groq(product_query, pending=None):
     """
     Use Groq API to generate search strategy and provide price estimates
     Note: Groq doesn't have built-in web search, so this provides intelligent estimates
+    pending is an optional Future from start_price_search() for the same query
     """
-    try:
-        with st.spinner(f"🔍 Analyzing prices for: {product_query}..."):
-            api_key = st.secrets.get("GROQ_API_KEY", None)
-            
-            response = requests.post(
-                "https://api.groq.com/openai/v1/chat/completions",
-                headers={
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {api_key}"
-                },
-                json={
-                    "model": "llama-3.3-70b-versatile",
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": """You are an expert on Indian e-commerce pricing. Provide realistic price estimates based on your knowledge of the Indian market. Focus on these platforms: Amazon India, Flipkart, Myntra, Ajio, Meesho, Snapdeal.
-
-Important: 
-1. All prices must be in Indian Rupees (INR)
-2. Consider Indian market conditions and pricing
-3. Include typical discounts and offers
-4. Be realistic about availability
-5. Return ONLY valid JSON, no explanations"""
-                        },
-                        {
-                            "role": "user",
-                            "content": f"""Based on your knowledge of Indian e-commerce, provide typical current prices for: {product_query}
-
-List at least 5 major Indian retailers with realistic price estimates.
-
-Return ONLY a JSON array with NO other text, explanations, or markdown:
-[
-  {{
-    "retailer": "Amazon India",
-    "price": 89999,
-    "condition": "new",
-    "url": "https://amazon.in",
-    "availability": "typically in stock",
-    "discount": "10% off on HDFC cards"
-  }}
-]
-
-Remember:
-- Prices in INR (Indian Rupees)
-- Include Amazon India, Flipkart, Myntra, Ajio, Meesho
-- Realistic Indian market prices
-- Common payment offers (card discounts, EMI, COD)
-- Return ONLY JSON array, nothing else"""
-                        }
-                    ],
-                    "temperature": 0.3,
-                    "max_tokens": 2048
-                }
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                full_text = data['choices'][0]['message']['content']
-                
-                # Clean and extract JSON
-                clean_text = full_text.strip()
-                
-                # Remove markdown if present
-                if '```json' in clean_text:
-                    start = clean_text.find('```json') + 7
-                    end = clean_text.find('```', start)
-                    if end == -1:
-                        end = len(clean_text)
-                    clean_text = clean_text[start:end]
-                elif '```' in clean_text:
-                    start = clean_text.find('```') + 3
-                    end = clean_text.find('```', start)
-                    if end == -1:
-                        end = len(clean_text)
-                    clean_text = clean_text[start:end]
-                
-                # Find JSON array
-                json_start = clean_text.find('[')
-                json_end = clean_text.rfind(']') + 1
-                
-                if json_start != -1 and json_end > json_start:
-                    json_str = clean_text[json_start:json_end]
-                    retailers = json.loads(json_str)
-                    
-                    if retailers and len(retailers) > 0:
-                        return {
-                            "product_name": product_query,
-                            "search_date": datetime.now().strftime("%Y-%m-%d %H:%M"),
-                            "retailers": retailers,
-                            "raw_response": full_text,
-                            "note": "⚠️ Prices are AI estimates based on market knowledge. Please verify on actual websites before purchasing."
-                        }
-                
-                st.warning("⚠️ Could not parse price data")
-                with st.expander("View response"):
-                    st.text_area("Response", full_text, height=300)
-                return None
-            else:
-                st.error(f"Groq API Error: {response.status_code}")
-                with st.expander("View error details"):
-                    st.code(response.text)
-                return None
-                
-    except json.JSONDecodeError as e:
-        st.error(f"Error parsing JSON: {str(e)}")
-        with st.expander("View raw response"):
-            st.text_area("Raw Response", full_text if 'full_text' in locals() else "No content", height=300)
+    with st.spinner(f"🔍 Analyzing prices for: {product_query}..."):
+        if pending is not None:
+            result = wait_for_result(pending)
+        else:
+            result = lookup_prices(product_query, get_api_key())
+    if not result.ok:
+        show_error(result)
         return None
-    except Exception as e:
-        st.error(f"Error searching prices: {str(e)}")
+    return result.results
+
+def search_all_price_sources(product_query, pending=None):
+    """
+    Query every source in config.PRICE_SOURCES at once, redrawing the comparison as each one answers
+    Returns the merged results, or None when no source found prices
+    """
+    updates = queue.Queue()
+    future = get_price_executor().submit(contextvars.copy_context().run, collect_prices, product_query,
+                                         get_api_key(), None, updates.put, pending)
+    placeholder = st.empty()
+    notice = st.empty()
+    request = current_request()
+    collection = None
+    with st.spinner(f"🔍 Checking {len(config.PRICE_SOURCES)} price sources for: {product_query}..."):
+        while not (future.done() and updates.empty()):
+            try:
+                collection = updates.get(timeout=0.1)
+            except queue.Empty:
+                if request is not None:
+                    show_queue_position(notice, request.position, request.wait)
+                continue
+            if collection.ok:
+                with placeholder.container():
+                    display_price_results(collection.results)
+    collection = future.result()
+    notice.empty()
+
+    for name, error in collection.errors.items():
+        st.caption(f"⚠️ {name}: {error}")
+    if not collection.ok:
+        placeholder.warning("⚠️ No price data found.")
         return None
+    return collection.results
+
+def search_and_show_prices(product_query, pending=None):
+    """Find and display prices for a query; returns the results shown, or None"""
+    if config.PRICE_SOURCES == ["groq"]:
+        price_results = search_product_prices_groq(product_query, pending=pending)
+        if price_results:
+            display_price_results(price_results)
+        return price_results
+    return search_all_price_sources(product_query, pending=pending)
 
 def display_product_info(product_info):
     """Display identified product information"""
@@ -322,6 +319,10 @@ def display_product_info(product_info):
 
 def display_price_results(results):
     """Display price comparison results"""
+    with span("render.price_results", rows=len((results or {}).get('retailers') or [])):
+        render_price_results(results)
+
+def render_price_results(results):
     if not results or not results.get('retailers'):
         st.warning("⚠️ No price data found.")
         return
@@ -333,230 +334,486 @@ def display_price_results(results):
     st.markdown(f"### 💰 Price Comparison for: {results['product_name']}")
     st.caption(f"Last updated: {results['search_date']}")
     
-    retailers = results['retailers']
-    valid_retailers = [r for r in retailers if r.get('price') and r['price'] > 0]
-    
-    if not valid_retailers:
+    table = analyse(results['retailers'])
+    summary = table.summary()
+    if summary is None:
         st.warning("No valid prices found.")
         return
-    
-    # Sort by price
-    valid_retailers.sort(key=lambda x: x['price'])
-    
-    # Display results
-    for idx, retailer in enumerate(valid_retailers):
-        is_best = (idx == 0)
-        
-        col1, col2, col3 = st.columns([2, 1, 1])
-        
-        with col1:
-            icon = "🏆 " if is_best else ""
-            st.markdown(f"{icon}**{retailer['retailer']}**")
-            condition_text = f"{retailer.get('condition', 'New')} • {retailer.get('availability', 'Check availability')}"
-            if retailer.get('discount'):
-                condition_text += f" • 🎁 {retailer['discount']}"
-            st.caption(condition_text)
-        
-        with col2:
-            price_color = "#27ae60" if is_best else "#2ecc71"
-            st.markdown(f"<span style='font-size:1.5rem;font-weight:bold;color:{price_color}'>₹{retailer['price']:,.0f}</span>", unsafe_allow_html=True)
-        
-        with col3:
-            if retailer.get('url'):
-                st.link_button("Visit Store", retailer['url'], use_container_width=True)
-        
-        st.divider()
+
+    best = table.best
+    st.success(f"🏆 Best price: **₹{best['price']:,.0f}** at **{best['retailer']}**")
+    st.dataframe(price_display_frame(table), hide_index=True, use_container_width=True, column_config={
+        "": st.column_config.TextColumn(width="small"),
+        "Price": st.column_config.NumberColumn(format="₹%d"),
+        "Store": st.column_config.LinkColumn(display_text="Visit Store"),
+    })
+    if table.outliers:
+        st.caption(f"⚠️ {table.outliers} price(s) far from the rest look unrealistic and are left out of the analytics")
+    if table.duplicates:
+        st.caption(f"🔁 {table.duplicates} duplicate listing(s) merged, keeping each retailer's live or lowest price")
     
     # Analytics
     st.markdown("### 📊 Price Analytics")
     col1, col2, col3, col4 = st.columns(4)
     
-    prices = [r['price'] for r in valid_retailers]
-    
     with col1:
-        st.metric("Lowest Price", f"₹{min(prices):,.0f}")
+        st.metric("Lowest Price", f"₹{summary['min']:,.0f}")
     with col2:
-        st.metric("Highest Price", f"₹{max(prices):,.0f}")
+        st.metric("Highest Price", f"₹{summary['max']:,.0f}")
     with col3:
-        st.metric("Average Price", f"₹{sum(prices)/len(prices):,.0f}")
+        st.metric("Average Price", f"₹{summary['mean']:,.0f}")
     with col4:
-        savings = max(prices) - min(prices)
-        st.metric("Potential Savings", f"₹{savings:,.0f}", delta=f"-{(savings/max(prices)*100):.1f}%", delta_color="inverse")
-
-# Main App UI
-st.markdown('<div class="main-header">🇮🇳 AI Product Price Finder - India</div>', unsafe_allow_html=True)
-st.markdown("**Upload a product image to find the best prices across Indian e-commerce platforms**")
+        savings = summary['savings']
+        st.metric("Potential Savings", f"₹{savings:,.0f}", delta=f"-{(savings/summary['max']*100):.1f}%", delta_color="inverse")
+
+    display_price_history(results['product_name'], summary['min'])
+
+def price_display_frame(table):
+    """The ranked rows with display columns: a best/outlier marker, offer text and where the price came from"""
+    frame = table.frame
+    marker = np.where(frame["outlier"], "⚠️", "")
+    marker[0] = "🏆"
+    return pd.DataFrame({
+        "": marker,
+        "Retailer": frame["retailer"],
+        "Price": frame["price"],
+        "Condition": frame["condition"].astype(str).replace("", "New"),
+        "Availability": frame["availability"].astype(str).replace("", "Check availability"),
+        "Offer": frame["discount"],
+        "Source": np.where(frame["source"] == "groq", "AI estimate", "🟢 Live"),
+        "Store": frame["url"].replace("", None),
+    })
+
+VERDICTS = {
+    "good": ("✅", "a good price"),
+    "fair": ("👌", "a fair price"),
+    "high": ("⚠️", "on the high side"),
+}
 
-# Important Notice
-st.info("💡 **Powered by Groq AI** - This app uses Llama 4 Scout for product identification and provides intelligent price estimates. For real-time prices, always verify on the retailer's website.")
+def show_price_verdict(product_query, price):
+    """Judge a price against recorded history; returns False when there isn't enough history"""
+    assessment = get_price_history().assess(product_query, price)
+    if not assessment:
+        return False
+    icon, label = VERDICTS[assessment['verdict']]
+    st.markdown(
+        f"{icon} **₹{price:,.0f} is {label}**: {assessment['beats']*100:.0f}% of the "
+        f"{assessment['count']} prices seen in the last {assessment['days']} days were the same or higher "
+        f"(₹{assessment['min']:,.0f} – ₹{assessment['max']:,.0f}, average ₹{assessment['avg']:,.0f})"
+    )
+    return True
 
-# Image Input Section
-tab1, tab2 = st.tabs(["📷 Take Photo", "📁 Upload Image"])
+def display_price_history(product_query, lowest_price):
+    """Price-over-time chart per retailer from the local history store"""
+    rows = get_price_history().series(product_query)
+    if len({ts for ts, _, _ in rows}) < 2:
+        return
 
-uploaded_image = None
+    st.markdown("### 📈 Price History")
+    show_price_verdict(product_query, lowest_price)
+
+    by_retailer = {}
+    for ts, retailer, price in rows:
+        points = by_retailer.setdefault(retailer, ([], []))
+        points[0].append(datetime.fromtimestamp(ts))
+        points[1].append(price)
+
+    import plotly.graph_objects as go
+
+    figure = go.Figure()
+    for retailer, (times, prices) in sorted(by_retailer.items()):
+        figure.add_trace(go.Scatter(x=times, y=prices, mode="lines+markers", name=retailer))
+    figure.update_layout(yaxis_title="Price (₹)", height=350, margin=dict(l=0, r=0, t=10, b=0),
+                         legend=dict(orientation="h"))
+    st.plotly_chart(figure, use_container_width=True)
+
+def render_header():
+    st.markdown('<div class="main-header">🇮🇳 AI Product Price Finder - India</div>', unsafe_allow_html=True)
+    st.markdown("**Upload a product image to find the best prices across Indian e-commerce platforms**")
+
+    # Important Notice
+    st.info("💡 **Powered by Groq AI** - This app uses Llama 4 Scout for product identification and provides intelligent price estimates. For real-time prices, always verify on the retailer's website.")
+
+def render_image_section():
+    """Camera/upload tabs plus the identify-and-price flow; returns the uploaded image"""
+    tab1, tab2 = st.tabs(["📷 Take Photo", "📁 Upload Image"])
+
+    uploaded_image = None
+    uploaded_bytes = None
+
+    with tab1:
+        st.info("📸 Allow camera access when prompted")
+        camera_photo = st.camera_input("Take a picture of the product")
+        if camera_photo:
+            uploaded_image = load_image(camera_photo.getvalue())
+            uploaded_bytes = camera_photo.size
+
+    with tab2:
+        uploaded_file = st.file_uploader(
+            "Choose a product image",
+            type=['jpg', 'jpeg', 'png', 'webp'],
+            help="Upload a clear photo of the product"
+        )
+        if uploaded_file:
+            uploaded_image = load_image(uploaded_file.getvalue())
+            uploaded_bytes = uploaded_file.size
+
+    # Process uploaded image
+    if uploaded_image:
+        col1, col2 = st.columns([1, 2])
 
-with tab1:
-    st.info("📸 Allow camera access when prompted")
-    camera_photo = st.camera_input("Take a picture of the product")
-    if camera_photo:
-        uploaded_image = Image.open(camera_photo)
+        with col1:
+            st.image(uploaded_image, caption="Your Product", use_container_width=True)
 
-with tab2:
-    uploaded_file = st.file_uploader(
-        "Choose a product image",
-        type=['jpg', 'jpeg', 'png', 'webp'],
-        help="Upload a clear photo of the product"
+        with col2:
+            several = st.toggle("🧺 Several products in this photo", key="multi_product",
+                                help="Shelf photos, flat-lays and carts: every item is identified in one AI call and priced")
+            # Set by "Use this photo anyway" after the quality check sent the photo back
+            anyway = st.session_state.pop('skip_quality_check', False)
+            if st.button("🔍 Identify Product & Find Prices", type="primary", use_container_width=True) or anyway:
+                check_quality = False if anyway else None
+                with span("request.image"), groq_session():
+                    if several:
+                        identify_and_price_all(uploaded_image, uploaded_bytes, check_quality)
+                    else:
+                        identify_and_price(uploaded_image, uploaded_bytes, check_quality)
+
+    return uploaded_image
+
+def identify_and_price(uploaded_image, uploaded_bytes, check_quality=None):
+    """The identify-then-price flow behind the main button"""
+    # Step 1: Identify product, starting the price search as soon as search_query streams in
+    pending_searches = {}
+
+    def start_speculative_search(key, value):
+        if key == "search_query" and value and value not in pending_searches:
+            pending_searches[value] = start_price_search(value)
+
+    result = identify_product_from_image(
+        uploaded_image, source_bytes=uploaded_bytes, on_field=start_speculative_search, check_quality=check_quality
     )
-    if uploaded_file:
-        uploaded_image = Image.open(uploaded_file)
+    product_info = result.product_info
 
-# Process uploaded image
-if uploaded_image:
-    col1, col2 = st.columns([1, 2])
-    
-    with col1:
-        st.image(uploaded_image, caption="Your Product", use_container_width=True)
-    
-    with col2:
-        if st.button("🔍 Identify Product & Find Prices", type="primary", use_container_width=True):
-            # Step 1: Identify product
-            product_info = identify_product_from_image(uploaded_image)
-            
-            if product_info:
-                st.session_state.identified_product = product_info
-                display_product_info(product_info)
-                
-                # Step 2: Search for prices
-                search_query = product_info.get('search_query') or product_info.get('product_name')
-                
-                if search_query:
-                    st.markdown("---")
-                    price_results = search_product_prices_groq(search_query)
-                    
-                    if price_results:
-                        st.session_state.search_results = price_results
-                        display_price_results(price_results)
-            else:
-                st.error("❌ Could not identify the product. Please try with a clearer image.")
+    if product_info:
+        st.session_state.identified_product = product_info
+        display_product_info(product_info)
 
-# Manual Search Section
-st.markdown("---")
-st.markdown("### 🔤 Manual Product Search")
-st.caption("Know the product name? Search directly:")
+        # Step 2: Search for prices
+        search_query = product_info.get('search_query') or product_info.get('product_name')
 
-manual_query = st.text_input(
-    "Enter product name:",
-    placeholder="e.g., Samsung Galaxy S23 Ultra, Nike Air Max Shoes, Sony WH-1000XM5"
-)
+        if search_query:
+            st.markdown("---")
+            price_results = search_and_show_prices(search_query, pending=pending_searches.get(search_query))
 
-col1, col2 = st.columns([3, 1])
-with col1:
-    if st.button("Search Prices Manually", use_container_width=True):
-        if manual_query:
-            price_results = search_product_prices_groq(manual_query)
             if price_results:
                 st.session_state.search_results = price_results
-                display_price_results(price_results)
-        else:
-            st.warning("Please enter a product name")
+    elif result.error_kind != "quality":
+        st.error("❌ Could not identify the product. Please try with a clearer image.")
 
-with col2:
-    if st.button("Clear Results", use_container_width=True):
-        st.session_state.search_results = None
-        st.session_state.identified_product = None
-        st.rerun()
+def use_suggestion(name):
+    st.session_state.manual_query = name
 
-# Show previous results if available
-if st.session_state.search_results and not uploaded_image and not manual_query:
+def show_catalogue_suggestions(manual_query):
+    """Catalogue products matching what has been typed, as buttons that fill in the search box"""
+    suggestions = [p for p in get_catalogue().suggest(manual_query) if p['name'] != manual_query]
+    if not suggestions:
+        return
+    st.caption("📚 From your catalogue:")
+    columns = st.columns(min(3, len(suggestions)))
+    for index, product in enumerate(suggestions):
+        columns[index % len(columns)].button(product['name'], key=f"suggestion_{product['id']}",
+                                             on_click=use_suggestion, args=(product['name'],),
+                                             use_container_width=True)
+
+def start_item_price_search(product_query):
+    """Price one detected item in the background, from every configured source"""
+    if config.PRICE_SOURCES == ["groq"]:
+        return start_price_search(product_query)
+    return get_price_executor().submit(contextvars.copy_context().run, collect_prices, product_query, get_api_key())
+
+def identify_and_price_all(uploaded_image, uploaded_bytes, check_quality=None):
+    """Identify every product in the photo with one vision call, then price them all at once"""
+    with st.spinner("🤖 Looking for every product in the photo..."):
+        result = identify_products(uploaded_image, get_api_key(), source_bytes=uploaded_bytes,
+                                   check_quality=check_quality)
+    if not result.ok:
+        show_error(result)
+        return
+
+    # Boxes refer to the upright photo
+    uploaded_image = ImageOps.exif_transpose(uploaded_image)
+    width, height = uploaded_image.size
+    boxes = [(int(i.box[0] * width), int(i.box[1] * height), int(i.box[2] * width), int(i.box[3] * height))
+             for i in result.items if i.box]
+    st.success(f"✅ Found {len(result.items)} products" + (" (saved from an earlier scan)" if result.cached else ""))
+    if len(boxes) == len(result.items):
+        st.image(draw_regions(uploaded_image, boxes), use_column_width=True)
+
+    # Every item's search starts now; cards fill in as their prices arrive
+    searches = {}
+    for item in result.items:
+        if item.search_query and item.search_query not in searches:
+            searches[item.search_query] = start_item_price_search(item.search_query)
+    display_product_grid(uploaded_image, result.items, searches)
+
+def display_product_grid(image, items, searches, columns=3):
+    """One card per detected product, in a grid, with its best price once the search finishes"""
+    cards = []
+    for row in range(0, len(items), columns):
+        for col, item in zip(st.columns(columns), items[row:row + columns]):
+            with col, st.container(border=True):
+                st.markdown(f"**{len(cards) + 1}. {item.product_info.get('product_name', 'Unknown')}**")
+                if item.box:
+                    width, height = image.size
+                    st.image(image.crop((int(item.box[0] * width), int(item.box[1] * height),
+                                         int(item.box[2] * width), int(item.box[3] * height))),
+                             use_column_width=True)
+                st.caption(f"{item.product_info.get('brand', 'Unknown')} • {item.product_info.get('category', 'Unknown')}")
+                cards.append(st.empty())
+
+    placeholders = {}
+    for item, card in zip(items, cards):
+        placeholders.setdefault(item.search_query, []).append(card)
+        card.caption("🔍 Finding prices...")
+    futures = {future: query for query, future in searches.items()}
+    for future in as_completed(futures):
+        query = futures[future]
+        lookup = future.result()
+        for card in placeholders.get(query, []):
+            with card.container():
+                render_price_card(lookup)
+
+def render_price_card(lookup):
+    """Best price and spread for one grid item"""
+    table = analyse((lookup.results or {}).get('retailers'))
+    summary = table.summary()
+    if summary is None:
+        st.warning(f"⚠️ {getattr(lookup, 'error', None) or 'No price data found.'}")
+        return
+    best = table.best
+    st.metric(f"🏆 {best['retailer']}", f"₹{best['price']:,.0f}")
+    if summary['count'] > 1:
+        st.caption(f"₹{summary['min']:,.0f} – ₹{summary['max']:,.0f} across {summary['count']} retailers")
+    with st.expander("All prices"):
+        st.dataframe(price_display_frame(table), hide_index=True, use_container_width=True,
+                     column_order=("", "Retailer", "Price"),
+                     column_config={"Price": st.column_config.NumberColumn(format="₹%d")})
+    if best['url']:
+        st.link_button("Visit Store", best['url'], use_container_width=True)
+
+@fragment
+def render_manual_search():
+    """Manual search runs as a fragment, so searching doesn't re-run the rest of the page"""
     st.markdown("---")
-    st.markdown("### 📋 Previous Search Results")
-    display_price_results(st.session_state.search_results)
-
-# Supported Platforms Section
-st.markdown("---")
-st.markdown("### 🛒 Supported Indian E-commerce Platforms")
-
-col1, col2, col3, col4, col5 = st.columns(5)
-
-with col1:
-    st.markdown("**🟠 Amazon India**")
-    st.caption("amazon.in")
-with col2:
-    st.markdown("**🔵 Flipkart**")
-    st.caption("flipkart.com")
-with col3:
-    st.markdown("**🟣 Myntra**")
-    st.caption("myntra.com")
-with col4:
-    st.markdown("**🔴 Ajio**")
-    st.caption("ajio.com")
-with col5:
-    st.markdown("**🟢 Meesho**")
-    st.caption("meesho.com")
-
-# Features Section
-st.markdown("---")
-st.markdown("### ✨ Features")
-
-col1, col2, col3 = st.columns(3)
-
-with col1:
-    st.markdown("""
-    **🎯 Smart Identification**
-    - AI-powered product recognition
-    - Brand & model detection
-    - Category classification
-    - Feature extraction
-    """)
+    st.markdown("### 🔤 Manual Product Search")
+    st.caption("Know the product name? Search directly:")
 
-with col2:
-    st.markdown("""
-    **💰 Price Intelligence**
-    - Multi-platform comparison
-    - Best deal highlighting
-    - Savings calculation
-    - Discount tracking
-    """)
+    manual_query = st.text_input(
+        "Enter product name:",
+        placeholder="e.g., Samsung Galaxy S23 Ultra, Nike Air Max Shoes, Sony WH-1000XM5",
+        key="manual_query"
+    )
+    if manual_query and config.CATALOGUE:
+        show_catalogue_suggestions(manual_query)
 
-with col3:
-    st.markdown("""
-    **🇮🇳 India-Focused**
-    - INR currency support
-    - Indian platforms
-    - Festival sale awareness
-    - COD & EMI info
-    """)
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        if st.button("Search Prices Manually", use_container_width=True):
+            if manual_query:
+                with span("request.manual"), groq_session():
+                    search_query, product = resolve_query(manual_query)
+                    if product and search_query != manual_query:
+                        st.caption(f"📚 Matched **{product['name']}** in your catalogue, searching \"{search_query}\"")
+                    price_results = search_and_show_prices(search_query)
+                if price_results:
+                    st.session_state.search_results = price_results
+            else:
+                st.warning("Please enter a product name")
 
-# Footer
-st.markdown("---")
-st.markdown("""
-<div style='text-align: center; color: #7f8c8d; padding: 20px;'>
-    <p>🔒 <strong>Privacy First:</strong> Images are processed securely and never stored</p>
-    <p>⚡ Powered by Groq AI (Llama 4 Scout Vision + Llama 3.3 70B)</p>
-    <p>🇮🇳 <strong>Made for India:</strong> Amazon India, Flipkart, Meesho, Ajio, Myntra</p>
-    <p>💡 <strong>Tip:</strong> Use clear, well-lit photos for best results</p>
-    <p>⚠️ <strong>Disclaimer:</strong> Prices are AI estimates. Always verify on retailer websites.</p>
-</div>
-""", unsafe_allow_html=True)
+    with col2:
+        if st.button("Clear Results", use_container_width=True):
+            st.session_state.search_results = None
+            st.session_state.identified_product = None
+            st.rerun()
+
+    if config.CATALOGUE:
+        with st.expander("📚 Product catalogue"):
+            st.caption("Products you've identified are added automatically. Import more from a CSV with a "
+                       "`name` column and optional `brand`, `category`, `search_query` and `aliases` (separated by `;`).")
+            catalogue_file = st.file_uploader("Catalogue CSV", type=["csv"], key="catalogue_csv")
+            if catalogue_file and st.button("Import Products", use_container_width=True):
+                count = get_catalogue().import_csv(catalogue_file.getvalue())
+                st.success(f"✅ Read {count} products; the catalogue now has {get_catalogue().stats()['products']:,}")
+
+    with st.expander("📈 Is this a good price?"):
+        st.caption("Check a price you've seen against the prices recorded for this product, without a new search")
+        offered_price = st.number_input("Price offered (₹)", min_value=0, step=100, key="offered_price")
+        if st.button("Check Price History", use_container_width=True):
+            if not manual_query or not offered_price:
+                st.warning("Enter a product name above and a price")
+            elif not show_price_verdict(manual_query, offered_price):
+                st.info("📭 Not enough price history for this product yet. Search it a few times to build some up.")
+
+def watch_candidates():
+    """{label: (query, name)} of products that can be watched: the identified product and the manual query"""
+    candidates = {}
+    product_info = st.session_state.identified_product
+    if product_info:
+        query = product_info.get('search_query') or product_info.get('product_name')
+        if query:
+            candidates[f"📸 {product_info.get('product_name') or query}"] = (query, product_info.get('product_name'))
+    manual_query = st.session_state.get('manual_query')
+    if manual_query:
+        candidates[f"🔤 {manual_query}"] = (manual_query, None)
+    return candidates
+
+@fragment
+def render_price_watch():
+    """Watchlist: save a product with a target price; the background scheduler re-prices it"""
+    if not config.WATCH:
+        return
+    st.markdown("---")
+    st.markdown("### 🔔 Price Watch")
+    st.caption("Save a product with the price you're waiting for. It's re-checked in the background, "
+               "so you don't need to search again to see if the price has dropped.")
+    watchlist = get_watchlist()
+    owner = st.session_state.watcher_id
+
+    candidates = watch_candidates()
+    if candidates:
+        col1, col2, col3 = st.columns([3, 2, 1])
+        with col1:
+            choice = st.selectbox("Product", list(candidates), key="watch_product")
+        with col2:
+            target = st.number_input("Target price (₹)", min_value=0, step=100, key="watch_target")
+        with col3:
+            st.write("")
+            if st.button("Watch", use_container_width=True):
+                if target:
+                    query, name = candidates[choice]
+                    watchlist.add(owner, query, target, name=name)
+                    st.query_params["watcher"] = owner
+                    st.success(f"🔔 Watching **{name or query}** for ₹{target:,.0f} or less")
+                else:
+                    st.warning("Enter a target price")
+    else:
+        st.caption("Identify a product or type a product name above to watch its price.")
+
+    watches = watchlist.for_owner(owner)
+    if watches and config.WATCH_TTL:
+        st.caption(f"🔖 Your watches belong to this page's address: bookmark it to come back to them. "
+                   f"Watches not opened for {max(1, config.WATCH_TTL // 86400)} days are removed.")
+    for watch in watches:
+        with st.container(border=True):
+            col1, col2 = st.columns([5, 1])
+            with col1:
+                st.markdown(f"**{watch['name']}** • target ₹{watch['target']:,.0f}")
+                if watch['price'] is None:
+                    st.caption("⏳ Waiting for the first check")
+                else:
+                    reached = "🎯 Target reached! " if watch['price'] <= watch['target'] else ""
+                    st.caption(f"{reached}Best price ₹{watch['price']:,.0f} at {watch['retailer']} • checked "
+                               f"{datetime.fromtimestamp(watch['checked']):%d %b %H:%M}")
+            with col2:
+                if st.button("Remove", key=f"unwatch_{watch['id']}", use_container_width=True):
+                    watchlist.remove(owner, watch['id'])
+                    st.rerun()
+
+def render_previous_results(uploaded_image):
+    if st.session_state.search_results and not uploaded_image and not st.session_state.get('manual_query'):
+        st.markdown("---")
+        st.markdown("### 📋 Previous Search Results")
+        display_price_results(st.session_state.search_results)
+
+@fragment
+def render_platforms():
+    st.markdown("---")
+    st.markdown("### 🛒 Supported Indian E-commerce Platforms")
+
+    col1, col2, col3, col4, col5 = st.columns(5)
+
+    with col1:
+        st.markdown("**🟠 Amazon India**")
+        st.caption("amazon.in")
+    with col2:
+        st.markdown("**🔵 Flipkart**")
+        st.caption("flipkart.com")
+    with col3:
+        st.markdown("**🟣 Myntra**")
+        st.caption("myntra.com")
+    with col4:
+        st.markdown("**🔴 Ajio**")
+        st.caption("ajio.com")
+    with col5:
+        st.markdown("**🟢 Meesho**")
+        st.caption("meesho.com")
+
+@fragment
+def render_features():
+    st.markdown("---")
+    st.markdown("### ✨ Features")
 
-# Sidebar with info
-with st.sidebar:
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        st.markdown("""
+        **🎯 Smart Identification**
+        - AI-powered product recognition
+        - Brand & model detection
+        - Category classification
+        - Feature extraction
+        """)
+
+    with col2:
+        st.markdown("""
+        **💰 Price Intelligence**
+        - Multi-platform comparison
+        - Best deal highlighting
+        - Savings calculation
+        - Discount tracking
+        """)
+
+    with col3:
+        st.markdown("""
+        **🇮🇳 India-Focused**
+        - INR currency support
+        - Indian platforms
+        - Festival sale awareness
+        - COD & EMI info
+        """)
+
+@fragment
+def render_footer():
+    st.markdown("---")
+    st.markdown("""
+    <div style='text-align: center; color: #7f8c8d; padding: 20px;'>
+        <p>🔒 <strong>Privacy First:</strong> Images are processed securely and never stored</p>
+        <p>⚡ Powered by Groq AI (Llama 4 Scout Vision + Llama 3.3 70B)</p>
+        <p>🇮🇳 <strong>Made for India:</strong> Amazon India, Flipkart, Meesho, Ajio, Myntra</p>
+        <p>💡 <strong>Tip:</strong> Use clear, well-lit photos for best results</p>
+        <p>⚠️ <strong>Disclaimer:</strong> Prices are AI estimates. Always verify on retailer websites.</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+@fragment
+def render_about():
+    """About, tips and API setup; a fragment, so it is drawn once per page run"""
     st.markdown("## About This App")
     st.markdown("""
     This AI-powered app helps you find the best prices for products across Indian e-commerce platforms.
-    
+
     ### How it works:
     1. **Upload/Capture** a product image
     2. **AI identifies** the product
     3. **Compare prices** across platforms
     4. **Find best deals** instantly
-    
+
     ### Technology:
     - **Groq API** for fast AI inference
     - **Llama 4 Scout** for vision
     - **Llama 3.3 70B** for analysis
     - **Streamlit** for interface
-    
+
     ### Supported Platforms:
     - 🟠 Amazon India
     - 🔵 Flipkart
@@ -564,20 +821,20 @@ with st.sidebar:
     - 🔴 Ajio
     - 🟢 Meesho
     - 🟡 Snapdeal
-    
+
     ### Payment Options Tracked:
     - 💳 Card discounts
     - 📱 UPI cashback
     - 💰 COD availability
     - 📊 EMI options
-    
+
     ---
-    
+
     **Project by:** Nikhil K (3GN23CD031)  
     **Guide:** Prof. Syed Saqlain Ahmed  
     **Institution:** GNDEC Bidar
     """)
-    
+
     st.markdown("---")
     st.markdown("### Quick Tips")
     st.info("""
@@ -588,7 +845,7 @@ with st.sidebar:
     - No reflections
     - Focus on product
     """)
-    
+
     st.markdown("---")
     st.markdown("### API Setup")
     with st.expander("How to get Groq API Key"):
@@ -600,4 +857,127 @@ with st.sidebar:
         ```toml
         GROQ_API_KEY = "gsk_your_key_here"
         ```
-        """)
\ No newline at end of file
+        """)
+
+def render_sidebar_info():
+    # A fragment may not open st.sidebar itself (Streamlit >= 1.37 raises), so it is called inside it
+    with st.sidebar:
+        render_about()
+
+def render_cache_stats():
+    with st.sidebar:
+        st.markdown("---")
+        st.markdown("### Cache")
+        id_stats = get_identification_cache().stats()
+        st.caption(f"🧠 Identification cache: {id_stats['hits']} hits • {id_stats['misses']} misses • {id_stats['entries']} saved")
+        price_stats = get_price_cache().stats()
+        st.caption(f"💰 Price cache: {price_stats['hits']} hits ({price_stats['stale_hits']} stale) • {price_stats['misses']} misses • {price_stats['entries']} saved")
+        flights = coalescing_stats()
+        st.caption(f"🔀 Shared in-flight calls: {flights['identify']['coalesced']} identify • {flights['prices']['coalesced']} price")
+        quality = quality_gate_stats()
+        if quality['checked']:
+            st.caption(f"📸 Photo check: {quality['checked']} checked • {quality['rejected']} sent back for a retake "
+                       f"(AI calls avoided)")
+        if config.VISUAL_INDEX:
+            visual_stats = get_visual_index().stats()
+            st.caption(f"🖼️ Visual index: {visual_stats['hits']} matches • {visual_stats['entries']} images indexed")
+        if config.CATALOGUE:
+            catalogue_stats = get_catalogue().stats()
+            st.caption(f"📚 Catalogue: {catalogue_stats['products']:,} products • {catalogue_stats['matches']} searches matched")
+        if config.WATCH and get_api_key():
+            watch_stats = start_price_watch(get_api_key()).stats()
+            st.caption(f"🔔 Price watch: {watch_stats['watches']} watches of {watch_stats['products']} products • "
+                       f"{watch_stats['calls']} calls • {watch_stats['shared']} from cache • {watch_stats['alerts']} alerts")
+        history_stats = get_price_history().stats()
+        st.caption(f"📈 Price history: {history_stats['rows']:,} prices recorded")
+        api_key = get_api_key()
+        if api_key:
+            groq_router = router.get_router(api_key)
+            for client in groq_router.clients():
+                for model, scheduler in client.schedulers.items():
+                    queue_stats = scheduler.stats()
+                    st.caption(f"🚦 {model.split('/')[-1]} queue (…{client.api_key[-4:]}): {queue_stats['admitted']} calls • {queue_stats['shed']} shed • {sum(queue_stats['queued'].values())} waiting")
+            route_stats = groq_router.stats()
+            st.caption(f"🔁 Routing: {route_stats['failovers']} failovers • {route_stats['hedges']} hedged ({route_stats['hedge_wins']} won)")
+            for route in route_stats['routes']:
+                if route['calls']:
+                    health = "✅" if route['healthy'] else "⛔"
+                    st.caption(f"{health} {route['endpoint']} {route['route']}: {route['calls']} calls • p50 {route['p50_ms'] or '–'} ms • {route['error_rate']:.0%} errors")
+        for endpoint, usage in token_usage().items():
+            st.caption(f"🔢 {endpoint.title()} tokens: {usage['prompt_tokens']} in • {usage['completion_tokens']} out ({usage['requests']} calls)")
+
+def latency_waterfall(trace):
+    """Horizontal bars per span, offset from the start of the trace and indented by depth"""
+    import plotly.graph_objects as go
+
+    start = trace[0].start_ns
+    depth = {}
+    labels, offsets, durations, hovers = [], [], [], []
+    for s in trace:
+        depth[s.span_id] = depth.get(s.parent_id, -1) + 1
+        labels.append(f"{'  ' * depth[s.span_id]}{s.name} #{len(labels) + 1}")
+        offsets.append((s.start_ns - start) / 1e6)
+        durations.append(s.duration * 1000)
+        hovers.append("<br>".join(f"{k}: {v}" for k, v in s.attributes.items()) or s.name)
+
+    figure = go.Figure(go.Bar(y=labels, x=durations, base=offsets, orientation="h", hovertext=hovers,
+                              marker_color=["#e74c3c" if "error" in s.attributes else "#3498db" for s in trace]))
+    figure.update_layout(xaxis_title="ms", height=120 + 22 * len(trace), margin=dict(l=0, r=0, t=10, b=0),
+                         yaxis=dict(autorange="reversed"))
+    return figure
+
+def render_latency_panel():
+    """Debug view of recent request traces (of every session), with OpenTelemetry and Prometheus exports"""
+    if not (config.TELEMETRY and config.TELEMETRY_PANEL):
+        return
+    with st.sidebar:
+        if not st.toggle("🐞 Latency breakdown", key="show_latency"):
+            return
+        traces = collector.recent()
+        if not traces:
+            st.caption("No requests traced yet.")
+            return
+        choice = st.selectbox(
+            "Request", range(len(traces)),
+            format_func=lambda i: (f"{datetime.fromtimestamp(traces[i][0].start_ns / 1e9):%H:%M:%S} "
+                                   f"{traces[i][0].name} • {traces[i][0].duration * 1000:,.0f} ms"),
+        )
+        trace = traces[choice]
+        st.plotly_chart(latency_waterfall(trace), use_container_width=True)
+        tokens = {}
+        for s in trace:
+            for key, count in s.attributes.items():
+                if key.startswith("tokens."):
+                    tokens[key[7:]] = tokens.get(key[7:], 0) + count
+        if tokens:
+            st.caption("🔢 " + " • ".join(f"{name}: {count}" for name, count in tokens.items()))
+        st.download_button("⬇️ OpenTelemetry JSON", export_otlp_json(), file_name="traces.json",
+                           mime="application/json", use_container_width=True)
+        st.download_button("⬇️ Prometheus metrics", prometheus_text(), file_name="metrics.prom",
+                           mime="text/plain", use_container_width=True)
+
+def main():
+    configure_page()
+    init_session_state()
+    configure_routing()
+    if get_api_key():
+        start_prewarm(get_api_key())
+        if config.WATCH:
+            start_price_watch(get_api_key())
+
+    # Main App UI
+    render_header()
+    uploaded_image = render_image_section()
+    render_manual_search()
+    render_price_watch()
+    render_previous_results(uploaded_image)
+    render_platforms()
+    render_features()
+    render_footer()
+    render_sidebar_info()
+    render_cache_stats()
+    render_latency_panel()
+
+# streamlit run executes this file as __main__; importing it builds no UI
+if __name__ == "__main__":
+    main()
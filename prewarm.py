@@ -0,0 +1,93 @@
+"""
+Warm-up before the first user request.
+The app's modules import their heavy dependencies (numpy, pandas, OpenCV,
+requests) at first use, so importing them is cheap; prewarm() pays those costs
+ahead of time instead of on someone's first search: it imports the heavy
+modules, opens the caches, price history, catalogue and visual index, and
+opens a pooled connection to every Groq route.
+
+main.py runs it on a background thread when the server starts its first
+session. From a container entrypoint or readiness hook, the CLI also writes
+bytecode for the app's modules, which matters where PYTHONDONTWRITEBYTECODE
+is set and every process would otherwise recompile them:
+
+    python prewarm.py [--no-connect]
+"""
+import argparse
+import compileall
+import importlib
+import json
+import logging
+import os
+import re
+import time
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Imported at first use by the modules that need them; price_table brings pandas
+HEAVY_MODULES = ("numpy", "price_table", "PIL.Image", "PIL.ImageOps", "cv2", "plotly.graph_objects")
+
+
+def _import_heavy():
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            # OpenCV is optional
+            pass
+
+
+def _open_stores():
+    from cache import get_identification_cache, get_price_cache
+    from catalogue import get_catalogue
+    from history import get_price_history
+    from visual_index import get_visual_index
+
+    get_identification_cache()
+    get_price_cache()
+    get_price_history()
+    if config.CATALOGUE:
+        get_catalogue()
+    if config.VISUAL_INDEX:
+        get_visual_index()
+
+
+def _connect(api_key):
+    from router import get_router
+
+    return {client.base_url: client.warm() for client in get_router(api_key).clients()}
+
+
+def prewarm(api_key=None, connect=True):
+    """Run each warm-up step; returns {step: milliseconds}. Failures are logged, not raised"""
+    api_key = api_key or config.load_api_key()
+    steps = [("imports", _import_heavy), ("stores", _open_stores)]
+    if connect and api_key:
+        steps.append(("connections", lambda: _connect(api_key)))
+    timings = {}
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.exception("Pre-warm step %s failed", name)
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm up imports, stores and connections")
+    parser.add_argument("--no-connect", action="store_true", help="skip opening connections to Groq")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    compileall.compile_dir(os.path.dirname(os.path.abspath(__file__)), quiet=1,
+                           rx=re.compile(r"[\\/](\.|benchmarks)"))
+    timings = {"bytecode": round((time.perf_counter() - start) * 1000, 1)}
+    timings.update(prewarm(connect=not args.no_connect))
+    print(json.dumps(timings))
+
+
+if __name__ == "__main__":
+    main()
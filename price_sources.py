@@ -0,0 +1,318 @@
+"""
+Pluggable price sources.
+A PriceSource turns a product query into retailer rows (the same dicts as the
+"retailers" list of a price result). The Groq estimator is one source; the
+retailer sources fetch and parse live search pages. collect_prices() runs all
+configured sources concurrently on an asyncio loop, with a concurrency limit
+per host and a timeout per source, and reports the merged result each time a
+source finishes so callers can show partial results.
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+from urllib.parse import quote_plus, urlsplit
+
+import config
+from cache import normalize_query
+from core import PRICE_NOTE, lookup_prices
+from history import get_price_history
+from retailer_parsers import parse_ajio, parse_amazon, parse_flipkart, parse_meesho, parse_myntra
+from telemetry import span
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/124.0 Safari/537.36")
+LIVE_NOTE = "🟢 Live prices from {sources}. Other rows are AI estimates; verify before purchasing."
+
+
+class PriceSourceError(Exception):
+    """A source could not produce prices for a query"""
+
+
+class PriceSource:
+    """
+    Base class for price sources.
+    Subclasses set name (the key used in PRICE_SOURCES) and implement fetch().
+    """
+    name = ""
+    live = False
+    # Seconds before collect_prices() gives up on this source; None waits as long as fetch() takes
+    timeout = None
+
+    def host(self):
+        """Key that concurrent fetches are limited by (defaults to the source itself)"""
+        return self.name
+
+    def fetch(self, query, api_key):
+        """Return a list of retailer rows for query; blocking, raises PriceSourceError"""
+        raise NotImplementedError
+
+    async def fetch_async(self, query, api_key, executor=None):
+        loop = asyncio.get_running_loop()
+        # The executor thread runs in this task's context so its spans stay in the caller's trace
+        return await loop.run_in_executor(executor, contextvars.copy_context().run, self.fetch, query, api_key)
+
+
+class GroqEstimateSource(PriceSource):
+    """AI price estimates for the major retailers from core.lookup_prices()"""
+    name = "groq"
+
+    def __init__(self, pending=None):
+        # Optional Future of a lookup_prices() call already started for the same query
+        self.pending = pending
+
+    def fetch(self, query, api_key):
+        lookup = self.pending.result() if self.pending is not None else lookup_prices(query, api_key)
+        if not lookup.ok:
+            raise PriceSourceError(lookup.error)
+        return [dict(row, source=self.name) for row in lookup.results["retailers"]]
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _http():
+    """Shared keep-alive session for retailer pages"""
+    global _session
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers.update({"User-Agent": USER_AGENT, "Accept-Language": "en-IN,en;q=0.9"})
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=config.RETAILER_HOST_CONCURRENCY * 4)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+class RetailerSource(PriceSource):
+    """Fetches one retailer's search page and picks the listing that best matches the query"""
+    live = True
+    retailer = ""
+    base_url = ""
+    search_path = ""
+
+    def __init__(self, base_url=None):
+        # RETAILER_BASE_URL points every retailer at a local fixture server instead
+        override = config.RETAILER_BASE_URL and f"{config.RETAILER_BASE_URL}/{self.name}/"
+        self.base_url = base_url or override or self.base_url
+        self.timeout = config.PRICE_SOURCE_TIMEOUT
+
+    def host(self):
+        # Limits protect the real site, so they stay per retailer when pointed at a fixture server
+        return urlsplit(type(self).base_url).netloc
+
+    def search_url(self, query):
+        return self.base_url.rstrip("/") + self.search_path.format(
+            query=quote_plus(query), slug="-".join(normalize_query(query).split()) or "search"
+        )
+
+    def parse(self, html):
+        raise NotImplementedError
+
+    def fetch(self, query, api_key):
+        import requests
+
+        try:
+            response = _http().get(self.search_url(query), timeout=(config.GROQ_CONNECT_TIMEOUT, self.timeout))
+        except requests.RequestException as e:
+            raise PriceSourceError(f"{self.retailer}: {e}") from e
+        if response.status_code != 200:
+            raise PriceSourceError(f"{self.retailer}: HTTP {response.status_code}")
+        product = best_match(query, self.parse(response.text))
+        if product is None:
+            return []
+        return [self.to_row(product)]
+
+    def to_row(self, product):
+        row = {"retailer": self.retailer, "price": product["price"], "condition": "new", "url": product["url"],
+               "availability": "in stock", "title": product["title"], "source": self.name}
+        if product.get("mrp") and product["mrp"] > product["price"]:
+            off = (1 - product["price"] / product["mrp"]) * 100
+            row["discount"] = f"{off:.0f}% off MRP ₹{product['mrp']:,.0f}"
+        return row
+
+
+class AmazonIndiaSource(RetailerSource):
+    name = "amazon"
+    retailer = "Amazon India"
+    base_url = "https://www.amazon.in/"
+    search_path = "/s?k={query}"
+
+    def parse(self, html):
+        return parse_amazon(html, self.base_url)
+
+
+class FlipkartSource(RetailerSource):
+    name = "flipkart"
+    retailer = "Flipkart"
+    base_url = "https://www.flipkart.com/"
+    search_path = "/search?q={query}"
+
+    def parse(self, html):
+        return parse_flipkart(html, self.base_url)
+
+
+class MyntraSource(RetailerSource):
+    name = "myntra"
+    retailer = "Myntra"
+    base_url = "https://www.myntra.com/"
+    search_path = "/{slug}?rawQuery={query}"
+
+    def parse(self, html):
+        return parse_myntra(html, self.base_url)
+
+
+class AjioSource(RetailerSource):
+    name = "ajio"
+    retailer = "Ajio"
+    base_url = "https://www.ajio.com/"
+    search_path = "/search/?text={query}"
+
+    def parse(self, html):
+        return parse_ajio(html, self.base_url)
+
+
+class MeeshoSource(RetailerSource):
+    name = "meesho"
+    retailer = "Meesho"
+    base_url = "https://www.meesho.com/"
+    search_path = "/search?q={query}"
+
+    def parse(self, html):
+        return parse_meesho(html, self.base_url)
+
+
+SOURCES = {source.name: source for source in (
+    GroqEstimateSource, AmazonIndiaSource, FlipkartSource, MyntraSource, AjioSource, MeeshoSource
+)}
+
+
+def register_source(source_class):
+    """Make a PriceSource subclass available to PRICE_SOURCES under its name; usable as a decorator"""
+    SOURCES[source_class.name] = source_class
+    return source_class
+
+
+def best_match(query, products, min_overlap=0.5):
+    """The earliest listing whose title shares the most query words, or None if none shares enough"""
+    wanted = set(normalize_query(query).split())
+    best, best_score = None, 0.0
+    for product in products:
+        score = len(wanted & set(normalize_query(product["title"]).split())) / (len(wanted) or 1)
+        if score > best_score:
+            best, best_score = product, score
+    return best if best_score >= min_overlap else None
+
+
+def merge_results(query, rows_by_source):
+    """One results dict in the usual shape; a live row replaces the estimate for the same retailer"""
+    by_retailer = {}
+    live = []
+    for rows in rows_by_source.values():
+        for row in rows:
+            key = row["retailer"].lower()
+            is_live = row.get("source") != GroqEstimateSource.name
+            if is_live:
+                live.append(row["retailer"])
+            if key not in by_retailer or (is_live and by_retailer[key].get("source") == GroqEstimateSource.name):
+                by_retailer[key] = row
+
+    if not live:
+        note = PRICE_NOTE
+    elif len(live) < len(by_retailer):
+        note = LIVE_NOTE.format(sources=", ".join(live))
+    else:
+        note = f"🟢 Live prices from {', '.join(live)}."
+    return {
+        "product_name": query,
+        "search_date": datetime.now().strftime("%Y-%m-%d %H:%M"),
+        "retailers": list(by_retailer.values()),
+        "note": note,
+    }
+
+
+@dataclass
+class PriceCollection:
+    """Progress of collect_prices(): merged results so far plus per-source errors"""
+    query: str
+    results: Optional[dict] = None
+    rows: dict = field(default_factory=dict)
+    errors: dict = field(default_factory=dict)
+    pending: list = field(default_factory=list)
+
+    @property
+    def ok(self):
+        return bool(self.results and self.results["retailers"])
+
+    @property
+    def done(self):
+        return not self.pending
+
+
+def configured_sources(groq_pending=None):
+    """Instances of the sources named in config.PRICE_SOURCES; unknown names are skipped"""
+    sources = []
+    for name in config.PRICE_SOURCES:
+        source_class = SOURCES.get(name)
+        if source_class is None:
+            logger.warning("Unknown price source %r", name)
+        elif source_class is GroqEstimateSource:
+            sources.append(GroqEstimateSource(groq_pending))
+        else:
+            sources.append(source_class())
+    return sources
+
+
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="price-source")
+
+
+async def _gather(query, api_key, sources, on_update):
+    collection = PriceCollection(query, pending=[source.name for source in sources])
+    limits = {}
+
+    async def run(source):
+        limit = limits.setdefault(source.host(), asyncio.Semaphore(config.RETAILER_HOST_CONCURRENCY))
+        try:
+            with span("price_source", source=source.name) as fetch:
+                async with limit:
+                    rows = await asyncio.wait_for(source.fetch_async(query, api_key, _executor), source.timeout)
+                fetch.set(rows=len(rows))
+            return source, rows, None
+        except asyncio.TimeoutError:
+            return source, None, f"timed out after {source.timeout}s"
+        except Exception as e:
+            return source, None, str(e)
+
+    for next_done in asyncio.as_completed([run(source) for source in sources]):
+        source, rows, error = await next_done
+        collection.pending.remove(source.name)
+        if error is not None:
+            collection.errors[source.name] = error
+        else:
+            collection.rows[source.name] = rows
+            if rows and source.live:
+                get_price_history().record(query, {"retailers": rows}, source=source.name)
+        collection.results = merge_results(query, collection.rows)
+        if on_update:
+            on_update(collection)
+    return collection
+
+
+def collect_prices(query, api_key, sources=None, on_update=None, groq_pending=None):
+    """
+    Query every source concurrently and return a PriceCollection.
+    on_update(collection) is called after each source finishes, so partial
+    results can be shown before the slowest source answers.
+    """
+    sources = configured_sources(groq_pending) if sources is None else sources
+    return asyncio.run(_gather(query, api_key, sources, on_update))
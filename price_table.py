@@ -0,0 +1,124 @@
+"""
+Price results as a typed, columnar table.
+A results dict keeps its "retailers" list of dicts (that is what is cached and
+recorded); for display and analytics the rows become a pandas frame with a
+float price column and categorical text columns. Cleaning, dedupe by
+retailer, outlier flagging and ranking are whole-column operations, so they
+cost about the same for five rows as for the thousands that history and live
+sources can bring.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import config
+
+TEXT_COLUMNS = ("retailer", "condition", "availability", "discount", "url", "source")
+# 1.4826 * MAD estimates the standard deviation of normally distributed values
+MAD_SCALE = 1.4826
+
+
+def _clean_text(values, default=""):
+    """A text column as a categorical of stripped strings; the cleaning runs once per distinct value"""
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object), use_na_sentinel=False)
+    cleaned = [value.strip() if isinstance(value, str) else "" if value is None or value != value else str(value)
+               for value in uniques]
+    # Stripping can make distinct raw values equal, so the cleaned values are factorized again
+    remap, categories = pd.factorize(np.array([value or default for value in cleaned], dtype=object))
+    return pd.Categorical.from_codes(remap[codes] if len(codes) else codes, categories=categories)
+
+
+def to_frame(retailers):
+    """Rows of a results dict as a frame: price as float64 (NaN when unreadable), text columns categorical"""
+    retailers = retailers or []
+    price = pd.to_numeric(pd.Series([row.get("price") for row in retailers], dtype=object), errors="coerce")
+    columns = {"price": price.astype("float64").to_numpy()}
+    for column in TEXT_COLUMNS:
+        columns[column] = _clean_text([row.get(column) for row in retailers], "groq" if column == "source" else "")
+    return pd.DataFrame(columns)
+
+
+def flag_outliers(prices, z=None, ratio=None):
+    """
+    Boolean mask of unrealistic prices: more than `z` robust standard deviations from the
+    median in log space, or more than `ratio` times away from the median either way.
+    Needs at least four prices; fewer are never flagged.
+    """
+    z = config.PRICE_OUTLIER_Z if z is None else z
+    ratio = config.PRICE_OUTLIER_RATIO if ratio is None else ratio
+    prices = np.asarray(prices, dtype=np.float64)
+    if len(prices) < 4:
+        return np.zeros(len(prices), dtype=bool)
+    logs = np.log(prices)
+    median = np.median(logs)
+    distance = np.abs(logs - median)
+    mad = np.median(distance) * MAD_SCALE
+    outliers = distance > np.log(ratio)
+    if mad > 0:
+        outliers |= distance / mad > z
+    return outliers
+
+
+@dataclass
+class PriceTable:
+    """Cleaned, ranked rows plus the analytics over the rows that are not outliers"""
+    frame: pd.DataFrame
+    duplicates: int = 0
+    invalid: int = 0
+
+    @property
+    def valid(self):
+        return self.frame[~self.frame["outlier"].to_numpy()]
+
+    @property
+    def empty(self):
+        return self.frame.empty
+
+    @property
+    def outliers(self):
+        return int(self.frame["outlier"].sum())
+
+    @property
+    def best(self):
+        """Cheapest row that is not an outlier, as a dict"""
+        valid = self.valid
+        return valid.iloc[0].to_dict() if len(valid) else None
+
+    def summary(self):
+        prices = self.valid["price"].to_numpy()
+        if not len(prices):
+            return None
+        low, high = float(prices.min()), float(prices.max())
+        return {"min": low, "max": high, "mean": float(prices.mean()), "median": float(np.median(prices)),
+                "savings": high - low, "count": len(prices)}
+
+
+def analyse(retailers, dedupe=True):
+    """
+    Clean, dedupe, flag and rank the rows of a results dict (or a frame from to_frame).
+    Rows without a positive price are dropped. With dedupe, each retailer keeps one row:
+    a live price over an estimate, then the lowest. Rows are sorted by price with outliers last.
+    """
+    frame = retailers if isinstance(retailers, pd.DataFrame) else to_frame(retailers)
+    prices = frame["price"].to_numpy()
+    retailer = frame["retailer"].cat
+    usable = np.isfinite(prices) & (prices > 0) & (retailer.categories.to_numpy() != "")[retailer.codes]
+    invalid = int(len(frame) - usable.sum())
+    frame = frame[usable]
+
+    duplicates = 0
+    if dedupe and len(frame):
+        # Retailer names compared case-insensitively, via the (few) distinct names
+        retailer = frame["retailer"].cat
+        key = pd.factorize(retailer.categories.str.lower())[0][retailer.codes]
+        estimate = (frame["source"] == "groq").to_numpy()
+        order = np.lexsort((frame["price"].to_numpy(), estimate))
+        _, first = np.unique(key[order], return_index=True)
+        keep = order[np.sort(first)]
+        duplicates = int(len(frame) - len(keep))
+        frame = frame.iloc[keep]
+
+    frame = frame.assign(outlier=flag_outliers(frame["price"].to_numpy()))
+    frame = frame.sort_values(["outlier", "price"], kind="stable").reset_index(drop=True)
+    return PriceTable(frame, duplicates=duplicates, invalid=invalid)
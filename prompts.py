@@ -0,0 +1,211 @@
+"""
+Versioned prompt templates and token estimates for the Groq calls.
+Every version asks for the same fields, so parsing, caching and display do
+not change with it; config.PROMPT_VERSION picks the one in use and
+benchmarks/bench_prompts.py compares them.
+
+v1  the long-form prompts in use before versioning: the original wording,
+    with search_query moved first for streaming; the default
+v2  the same instructions in a fraction of the tokens, with max_tokens
+    sized from the reply schema even without structured output
+v3  v2 with compact output: short keys, codes for condition and
+    availability, no URL; llm_json expands replies back to the full fields
+"""
+from dataclasses import dataclass
+
+import config
+from llm_json import (
+    COMPACT_PRODUCT_KEYS, COMPACT_RETAILERS_SCHEMA, PRODUCT_ITEM_SCHEMA, PRODUCT_SCHEMA, REGION_ITEM_SCHEMA,
+    RETAILERS_SCHEMA, compact_schema
+)
+from rate_limit import DEFAULT_MAX_TOKENS, estimate_prompt_tokens
+
+# v1: the prompts in use before versioning, the original wording with search_query moved
+# first. In every version search_query comes first, so a streamed reply can start the price
+# search early
+IDENTIFY_PROMPT = """Analyze this product image carefully and identify what it is. Be as specific as possible about brand, model, and features.
+
+Return ONLY a valid JSON object with no additional text, explanations, or markdown:
+{
+    "search_query": "optimized search query for Indian e-commerce sites",
+    "product_name": "specific product name with brand and model if visible",
+    "brand": "brand name",
+    "category": "product category (electronics/fashion/home/etc)",
+    "description": "brief description of visible features"
+}
+
+Important: Return ONLY the JSON object, nothing else."""
+
+IDENTIFY_ALL_PROMPT = """This photo may show several different products (a shelf, a flat-lay, a cart). Identify every distinct product you can see, up to {max_items}, as specifically as possible about brand, model and features.
+
+Return ONLY a valid JSON object with no additional text, explanations, or markdown:
+{{
+    "items": [
+        {{
+            "search_query": "optimized search query for Indian e-commerce sites",
+            "product_name": "specific product name with brand and model if visible",
+            "brand": "brand name",
+            "category": "product category (electronics/fashion/home/etc)",
+            "description": "brief description of visible features",
+            "box": [left, top, right, bottom]
+        }}
+    ]
+}}
+
+box is where the product is in the photo, as fractions of the width and height from 0 to 1.
+Important: Return ONLY the JSON object, nothing else."""
+
+IDENTIFY_REGIONS_PROMPT = """This photo has {count} numbered boxes, each drawn around one object. Identify the product inside each box as specifically as possible about brand, model and features. Skip boxes that hold no product.
+
+Return ONLY a valid JSON object with no additional text, explanations, or markdown:
+{{
+    "items": [
+        {{
+            "region": 1,
+            "search_query": "optimized search query for Indian e-commerce sites",
+            "product_name": "specific product name with brand and model if visible",
+            "brand": "brand name",
+            "category": "product category (electronics/fashion/home/etc)",
+            "description": "brief description of visible features"
+        }}
+    ]
+}}
+
+Important: Return ONLY the JSON object, nothing else."""
+
+PRICE_SYSTEM_PROMPT = """You are an expert on Indian e-commerce pricing. Provide realistic price estimates based on your knowledge of the Indian market. Focus on these platforms: Amazon India, Flipkart, Myntra, Ajio, Meesho, Snapdeal.
+
+Important: 
+1. All prices must be in Indian Rupees (INR)
+2. Consider Indian market conditions and pricing
+3. Include typical discounts and offers
+4. Be realistic about availability
+5. Return ONLY valid JSON, no explanations"""
+
+PRICE_USER_PROMPT = """Based on your knowledge of Indian e-commerce, provide typical current prices for: {product_query}
+
+List at least 5 major Indian retailers with realistic price estimates.
+
+Return ONLY a JSON array with NO other text, explanations, or markdown:
+[
+  {{
+    "retailer": "Amazon India",
+    "price": 89999,
+    "condition": "new",
+    "url": "https://amazon.in",
+    "availability": "typically in stock",
+    "discount": "10% off on HDFC cards"
+  }}
+]
+
+Remember:
+- Prices in INR (Indian Rupees)
+- Include Amazon India, Flipkart, Myntra, Ajio, Meesho
+- Realistic Indian market prices
+- Common payment offers (card discounts, EMI, COD)
+- Return ONLY JSON array, nothing else"""
+
+# JSON mode only accepts an object, so structured price requests ask for a wrapped array
+PRICE_OBJECT_INSTRUCTION = """
+
+Wrap the array in a JSON object: {"retailers": [...]}"""
+
+
+IDENTIFY_PROMPT_V2 = """Identify the product in this photo as precisely as you can: brand, model, key features.
+Reply with only this JSON:
+{"search_query": "search query for Indian shopping sites", "product_name": "name with brand and model", "brand": "brand", "category": "electronics/fashion/home/...", "description": "visible features, under 15 words"}"""
+
+IDENTIFY_ALL_PROMPT_V2 = """Identify each distinct product in this photo (shelf, flat-lay, cart), up to {max_items}, with brand and model where visible.
+Reply with only this JSON; box is [left, top, right, bottom] as fractions 0-1 of the photo:
+{{"items": [{{"search_query": "search query", "product_name": "name with brand and model", "brand": "brand", "category": "category", "description": "under 10 words", "box": [0.1, 0.2, 0.4, 0.9]}}]}}"""
+
+IDENTIFY_REGIONS_PROMPT_V2 = """This photo has {count} numbered boxes, each around one object. Identify the product in each box, with brand and model where visible; skip boxes without a product.
+Reply with only this JSON:
+{{"items": [{{"region": 1, "search_query": "search query", "product_name": "name with brand and model", "brand": "brand", "category": "category", "description": "under 10 words"}}]}}"""
+
+PRICE_SYSTEM_PROMPT_V2 = """You estimate current prices on Indian e-commerce sites (Amazon India, Flipkart, Myntra, Ajio, Meesho, Snapdeal): realistic INR prices, typical card/EMI/COD offers and availability. Reply with JSON only."""
+
+PRICE_USER_PROMPT_V2 = """Typical current prices for: {product_query}
+At least 5 Indian retailers, as a JSON array:
+[{{"retailer": "Amazon India", "price": 89999, "condition": "new", "url": "https://amazon.in", "availability": "in stock", "discount": "10% off on HDFC cards"}}]"""
+
+PRICE_OBJECT_INSTRUCTION_V2 = """
+Wrap the array in {"retailers": [...]}"""
+
+# v3: the v2 wording with short keys; the key legend costs less than the keys save
+IDENTIFY_PROMPT_V3 = """Identify the product in this photo as precisely as you can: brand, model, key features.
+Reply with only this JSON; q search query for Indian shopping sites, n name with brand and model, b brand, c category, d visible features:
+{"q": "", "n": "", "b": "", "c": "", "d": "under 15 words"}"""
+
+IDENTIFY_ALL_PROMPT_V3 = """Identify each distinct product in this photo (shelf, flat-lay, cart), up to {max_items}, with brand and model where visible.
+Reply with only this JSON; q search query, n name with brand and model, b brand, c category, d features, bb [left, top, right, bottom] as fractions 0-1 of the photo:
+{{"items": [{{"q": "", "n": "", "b": "", "c": "", "d": "under 10 words", "bb": [0.1, 0.2, 0.4, 0.9]}}]}}"""
+
+IDENTIFY_REGIONS_PROMPT_V3 = """This photo has {count} numbered boxes, each around one object. Identify the product in each box, with brand and model where visible; skip boxes without a product.
+Reply with only this JSON; r box number, q search query, n name with brand and model, b brand, c category, d features:
+{{"items": [{{"r": 1, "q": "", "n": "", "b": "", "c": "", "d": "under 10 words"}}]}}"""
+
+PRICE_USER_PROMPT_V3 = """Typical current prices for: {product_query}
+At least 5 Indian retailers, as a JSON array; r retailer, p price in INR, c condition (n new, r refurbished, u used), s stock (in, low, out), o best offer in a few words or "":
+[{{"r": "Amazon India", "p": 89999, "c": "n", "s": "in", "o": "10% off HDFC cards"}}]"""
+
+
+@dataclass(frozen=True)
+class PromptSet:
+    """One version of every prompt, and the reply schemas that go with it"""
+    version: str
+    identify: str
+    identify_all: str  # .format(max_items=...)
+    identify_regions: str  # .format(count=...)
+    price_system: str
+    price_user: str  # .format(product_query=...)
+    price_object: str  # appended to price_user when JSON mode needs an object
+    compact_output: bool = False
+    sized_replies: bool = True  # max_tokens from the reply schema, not a flat 1024/2048
+
+    def _schema(self, schema):
+        return compact_schema(schema, COMPACT_PRODUCT_KEYS) if self.compact_output else schema
+
+    @property
+    def product_schema(self):
+        return self._schema(PRODUCT_SCHEMA)
+
+    @property
+    def product_item_schema(self):
+        return self._schema(PRODUCT_ITEM_SCHEMA)
+
+    @property
+    def region_item_schema(self):
+        return self._schema(REGION_ITEM_SCHEMA)
+
+    @property
+    def retailers_schema(self):
+        return COMPACT_RETAILERS_SCHEMA if self.compact_output else RETAILERS_SCHEMA
+
+
+PROMPTS = {
+    "v1": PromptSet("v1", IDENTIFY_PROMPT, IDENTIFY_ALL_PROMPT, IDENTIFY_REGIONS_PROMPT, PRICE_SYSTEM_PROMPT,
+                    PRICE_USER_PROMPT, PRICE_OBJECT_INSTRUCTION, sized_replies=False),
+    "v2": PromptSet("v2", IDENTIFY_PROMPT_V2, IDENTIFY_ALL_PROMPT_V2, IDENTIFY_REGIONS_PROMPT_V2,
+                    PRICE_SYSTEM_PROMPT_V2, PRICE_USER_PROMPT_V2, PRICE_OBJECT_INSTRUCTION_V2),
+    "v3": PromptSet("v3", IDENTIFY_PROMPT_V3, IDENTIFY_ALL_PROMPT_V3, IDENTIFY_REGIONS_PROMPT_V3,
+                    PRICE_SYSTEM_PROMPT_V2, PRICE_USER_PROMPT_V3, PRICE_OBJECT_INSTRUCTION_V2, compact_output=True),
+}
+
+
+def get_prompts(version=None):
+    """The PromptSet for a version; None uses config.PROMPT_VERSION"""
+    version = version or config.PROMPT_VERSION
+    try:
+        return PROMPTS[version]
+    except KeyError:
+        raise ValueError(f"Unknown prompt version {version!r}; expected one of {', '.join(PROMPTS)}") from None
+
+
+def estimate_tokens(payload):
+    """
+    What a chat-completions payload can cost, before it is sent: the estimated prompt tokens
+    and the completion budget (max_tokens), which the reply cannot exceed
+    """
+    return {"prompt_tokens": estimate_prompt_tokens(payload),
+            "completion_budget": payload.get("max_tokens") or DEFAULT_MAX_TOKENS}
@@ -0,0 +1,310 @@
+"""
+Rate limiting for Groq calls shared by every thread in the process.
+RateLimiter is a plain blocking token bucket. FairScheduler sits in front of
+each Groq model: it keeps requests and tokens per minute under the provider's
+quota, queues callers per session and serves those queues round-robin
+(interactive before batch), and sheds batch work first when the wait grows.
+Callers say who they are with request_context().
+"""
+import contextvars
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+# Roughly what Groq bills for one image in a vision request
+IMAGE_TOKENS = 1000
+DEFAULT_MAX_TOKENS = 1024
+
+
+class RateLimiter:
+    """Blocking token bucket: at most `rate_per_minute` acquisitions per minute, bursting up to `burst`"""
+
+    def __init__(self, rate_per_minute, burst=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst or max(1, rate_per_minute // 10))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` are available, then take them"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def try_acquire(self, tokens=1):
+        """
+        Take `tokens` if available and return 0, else return the seconds until they will be.
+        A request larger than the bucket goes through once the bucket is full, leaving it in debt.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            needed = min(tokens, self.capacity)
+            if self.tokens >= needed:
+                self.tokens -= tokens
+                return 0.0
+            return (needed - self.tokens) / self.rate
+
+    def available(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return self.tokens
+
+    def refund(self, tokens):
+        """Give back tokens that were not used (negative to charge extra)"""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + tokens)
+
+
+class RequestShedError(Exception):
+    """A queued request was dropped instead of waiting longer for quota"""
+
+
+class QueuedRequest:
+    """
+    Who is calling Groq, set with request_context(). position and wait are
+    updated while one of its calls is queued (None otherwise) so other threads
+    can display them; on_wait(position, wait) is only called on the thread
+    that opened the context, and with (None, None) once the wait is over.
+    """
+
+    def __init__(self, session, priority=INTERACTIVE, on_wait=None):
+        self.session = session
+        self.priority = priority
+        self.on_wait = on_wait
+        self.owner = threading.get_ident()
+        self.position = None
+        self.wait = None
+
+    def report(self, position, wait):
+        self.position, self.wait = position, wait
+        if self.on_wait and threading.get_ident() == self.owner:
+            self.on_wait(position, wait)
+
+
+_request = contextvars.ContextVar("groq_request", default=None)
+
+
+@contextmanager
+def request_context(session, priority=INTERACTIVE, on_wait=None):
+    """Attribute Groq calls made in this block (and in contexts copied from it) to a session"""
+    request = QueuedRequest(session, priority, on_wait)
+    token = _request.set(request)
+    try:
+        yield request
+    finally:
+        _request.reset(token)
+
+
+def current_request():
+    return _request.get()
+
+
+def estimate_prompt_tokens(payload):
+    """Prompt tokens of a chat-completions call: about 4 characters a token, plus a flat cost per image"""
+    total = 0
+    for message in payload.get("messages", []):
+        content = message.get("content")
+        parts = content if isinstance(content, list) else [{"type": "text", "text": content or ""}]
+        for part in parts:
+            total += IMAGE_TOKENS if part.get("type") == "image_url" else -(-len(part.get("text") or "") // 4)
+    return total
+
+
+def estimate_payload_tokens(payload):
+    """Tokens a chat-completions call can use: the prompt and max_tokens"""
+    return estimate_prompt_tokens(payload) + (payload.get("max_tokens") or DEFAULT_MAX_TOKENS)
+
+
+class _Ticket:
+    __slots__ = ("request", "cost", "shed")
+
+    def __init__(self, request, cost):
+        self.request = request
+        self.cost = cost
+        self.shed = None
+
+
+class FairScheduler:
+    """
+    Admission control for one model's quota, shared by every session.
+    acquire() blocks until the request and token buckets allow a call and it is
+    the caller's turn: sessions are served round-robin, each in arrival order,
+    and batch requests only once no interactive request is waiting.
+    """
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0, max_wait=120, batch_max_wait=30,
+                 max_queue=64):
+        self.requests = RateLimiter(requests_per_minute, burst=max(1, requests_per_minute // 10)) \
+            if requests_per_minute else None
+        self.tokens = RateLimiter(tokens_per_minute, burst=max(1, tokens_per_minute // 4)) \
+            if tokens_per_minute else None
+        self.max_wait = max_wait
+        self.batch_max_wait = batch_max_wait
+        self.max_queue = max_queue
+        # One OrderedDict per priority: session -> deque of tickets, rotated as sessions are served
+        self._queues = (OrderedDict(), OrderedDict())
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+        self.admitted = 0
+        self.shed = 0
+        self.waited = 0.0
+
+    def _head(self):
+        for queues in self._queues:
+            for tickets in queues.values():
+                return tickets[0]
+        return None
+
+    def _remove(self, ticket):
+        queues = self._queues[ticket.request.priority]
+        tickets = queues.get(ticket.request.session)
+        if tickets and ticket in tickets:
+            tickets.remove(ticket)
+            if tickets:
+                # Served: this session goes to the back of the round-robin
+                queues.move_to_end(ticket.request.session)
+            else:
+                del queues[ticket.request.session]
+
+    def _ahead(self, ticket):
+        """Tickets served before this one, in dispatch order"""
+        ahead = []
+        for priority, queues in enumerate(self._queues):
+            lanes = [list(tickets) for tickets in queues.values()]
+            for depth in range(max(map(len, lanes), default=0)):
+                for lane in lanes:
+                    if depth < len(lane):
+                        if lane[depth] is ticket:
+                            return ahead
+                        ahead.append(lane[depth])
+        return ahead
+
+    def _estimate(self, ticket):
+        """(position, seconds) for a queued ticket, position counting from 1"""
+        ahead = self._ahead(ticket)
+        wait = max(0.0, self._paused_until - time.monotonic())
+        if self.requests is not None:
+            wait = max(wait, (len(ahead) + 1 - self.requests.available()) / self.requests.rate)
+        if self.tokens is not None:
+            cost = sum(t.cost for t in ahead) + ticket.cost
+            wait = max(wait, (cost - self.tokens.available()) / self.tokens.rate)
+        return len(ahead) + 1, max(0.0, wait)
+
+    def _try_take(self, cost):
+        """0 if a call may start now (buckets charged), else seconds until it might"""
+        paused = self._paused_until - time.monotonic()
+        if paused > 0:
+            return paused
+        if self.requests is not None:
+            wait = self.requests.try_acquire(1)
+            if wait:
+                return wait
+        if self.tokens is not None:
+            wait = self.tokens.try_acquire(cost)
+            if wait:
+                if self.requests is not None:
+                    self.requests.refund(1)
+                return wait
+        return 0.0
+
+    def _shed_batch(self):
+        """Drop the newest batch request to make room for interactive ones"""
+        for session in reversed(self._queues[BATCH]):
+            ticket = self._queues[BATCH][session][-1]
+            ticket.shed = "shed to make room for interactive requests"
+            self._remove(ticket)
+            self.shed += 1
+            self._cond.notify_all()
+            return True
+        return False
+
+    def acquire(self, cost=0, request=None):
+        """
+        Wait for this caller's turn and quota, then charge one request and `cost` tokens.
+        Raises RequestShedError if the request is shed or would wait longer than allowed.
+        """
+        request = request or current_request() or QueuedRequest(None)
+        ticket = _Ticket(request, cost)
+        started = time.monotonic()
+        reported = False
+        with self._cond:
+            if request.priority == INTERACTIVE and sum(map(len, self._queues[INTERACTIVE].values())) \
+                    + sum(map(len, self._queues[BATCH].values())) >= self.max_queue:
+                self._shed_batch()
+            self._queues[request.priority].setdefault(request.session, deque()).append(ticket)
+            try:
+                while True:
+                    if ticket.shed:
+                        raise RequestShedError(ticket.shed)
+                    wait = None
+                    if self._head() is ticket:
+                        wait = self._try_take(cost)
+                        if not wait:
+                            self._remove(ticket)
+                            self.admitted += 1
+                            self.waited += time.monotonic() - started
+                            self._cond.notify_all()
+                            break
+                    position, estimate = self._estimate(ticket)
+                    limit = self.batch_max_wait if request.priority == BATCH else self.max_wait
+                    if limit and estimate > limit:
+                        self.shed += 1
+                        raise RequestShedError(f"estimated wait of {estimate:.0f}s is over the {limit}s limit")
+                    # Report outside the lock: on_wait may redraw the page
+                    self._cond.release()
+                    try:
+                        request.report(position, estimate)
+                        reported = True
+                    finally:
+                        self._cond.acquire()
+                    if ticket.shed:
+                        continue
+                    self._cond.wait(timeout=min(max(wait or 0.25, 0.02), 0.25))
+            except BaseException:
+                self._remove(ticket)
+                self._cond.notify_all()
+                raise
+            finally:
+                if reported:
+                    self._cond.release()
+                    try:
+                        request.report(None, None)
+                    finally:
+                        self._cond.acquire()
+
+    def refund(self, cost):
+        """Return the quota of a call that was rejected before it ran"""
+        if self.requests is not None:
+            self.requests.refund(1)
+        if self.tokens is not None:
+            self.tokens.refund(cost)
+        with self._cond:
+            self._cond.notify_all()
+
+    def settle(self, cost, usage):
+        """Replace a call's token estimate with the usage the API reported"""
+        if self.tokens is not None and usage and usage.get("total_tokens"):
+            self.tokens.refund(cost - usage["total_tokens"])
+
+    def pause(self, seconds):
+        """Hold every queued call, e.g. after a 429 with Retry-After"""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def stats(self):
+        with self._cond:
+            queued = {PRIORITY_NAMES[p]: sum(map(len, q.values())) for p, q in enumerate(self._queues)}
+        return {"admitted": self.admitted, "shed": self.shed, "queued": queued,
+                "mean_wait_s": self.waited / self.admitted if self.admitted else 0.0}
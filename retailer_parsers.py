@@ -0,0 +1,204 @@
+"""
+Search-page parsers for Indian retailers.
+Each parse_* function takes the HTML of a search results page and returns the
+listed products as dicts with title, price, mrp (or None) and url, in page
+order. Amazon and Flipkart are read from the markup; Myntra, Ajio and Meesho
+embed their search results as JSON in a <script>, which is far more stable.
+Only the standard library is used.
+"""
+import json
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from llm_json import coerce_price
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+_DECODER = json.JSONDecoder()
+
+
+class Node:
+    """Minimal element tree node built by _TreeBuilder"""
+
+    def __init__(self, tag, attrs, parent=None):
+        self.tag = tag
+        self.attrs = dict(attrs)
+        self.parent = parent
+        self.children = []
+        self.text_parts = []
+
+    @property
+    def classes(self):
+        return (self.attrs.get("class") or "").split()
+
+    def text(self):
+        """All text inside this node, whitespace collapsed"""
+        parts = []
+
+        def walk(node):
+            parts.extend(node.text_parts)
+            for child in node.children:
+                walk(child)
+        walk(self)
+        return " ".join(" ".join(parts).split())
+
+    def iter(self):
+        yield self
+        for child in self.children:
+            yield from child.iter()
+
+    def find_all(self, tag=None, cls=None, **attrs):
+        """Descendants matching a tag, a CSS class and exact attribute values (True = present)"""
+        for node in self.iter():
+            if node is self:
+                continue
+            if tag and node.tag != tag:
+                continue
+            if cls and cls not in node.classes:
+                continue
+            if all((name in node.attrs) if value is True else node.attrs.get(name) == value
+                   for name, value in attrs.items()):
+                yield node
+
+    def find(self, tag=None, cls=None, **attrs):
+        return next(self.find_all(tag, cls, **attrs), None)
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Node("document", {})
+        self._current = self.root
+
+    def handle_starttag(self, tag, attrs):
+        node = Node(tag, attrs, self._current)
+        self._current.children.append(node)
+        if tag not in VOID_TAGS:
+            self._current = node
+
+    def handle_endtag(self, tag):
+        # Close the nearest open element with this tag; stray end tags are ignored
+        node = self._current
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+        if node is not self.root:
+            self._current = node.parent
+
+    def handle_data(self, data):
+        self._current.text_parts.append(data)
+
+
+def parse_html(html):
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+def embedded_json(html, marker):
+    """Decode the JSON object that follows the first match of the regex `marker` in a page, or None"""
+    match = re.search(marker, html)
+    if match is None:
+        return None
+    start = html.find("{", match.end())
+    if start == -1:
+        return None
+    try:
+        return _DECODER.raw_decode(html, start)[0]
+    except json.JSONDecodeError:
+        return None
+
+
+def _dict(value):
+    """value if it is a JSON object, else an empty one: embedded state changes shape without notice"""
+    return value if isinstance(value, dict) else {}
+
+
+def _list(value):
+    return value if isinstance(value, list) else []
+
+
+def _product(title, price, mrp, url, base_url):
+    price = coerce_price(price)
+    if not title or price is None:
+        return None
+    return {"title": " ".join(str(title).split()), "price": price, "mrp": coerce_price(mrp),
+            "url": urljoin(base_url, url) if url else base_url}
+
+
+def parse_amazon(html, base_url="https://www.amazon.in/"):
+    products = []
+    for card in parse_html(html).find_all("div", **{"data-component-type": "s-search-result"}):
+        if "Sponsored" in card.text():
+            continue
+        heading = card.find("h2")
+        link = (heading.find("a") if heading else None) or card.find("a", cls="a-link-normal")
+        prices = [node.find("span", cls="a-offscreen") for node in card.find_all("span", cls="a-price")]
+        prices = [node.text() for node in prices if node is not None]
+        product = _product(heading.text() if heading else None, prices[0] if prices else None,
+                           prices[1] if len(prices) > 1 else None, link.attrs.get("href") if link else None,
+                           base_url)
+        if product:
+            products.append(product)
+    return products
+
+
+_RUPEES = re.compile(r'₹\s*[\d,]+(?:\.\d+)?')
+
+
+def parse_flipkart(html, base_url="https://www.flipkart.com/"):
+    # Flipkart's class names are generated and change often, so cards are found
+    # by their data-id and read by shape: the product link, then the ₹ amounts
+    products = []
+    for card in parse_html(html).find_all("div", **{"data-id": True}):
+        link = next((a for a in card.find_all("a", href=True) if "/p/" in a.attrs["href"]), None)
+        if link is None:
+            continue
+        image = card.find("img", alt=True)
+        title = link.attrs.get("title") or (image.attrs["alt"] if image else None) or link.text()
+        amounts = _RUPEES.findall(card.text())
+        product = _product(title, amounts[0] if amounts else None, amounts[1] if len(amounts) > 1 else None,
+                           link.attrs["href"], base_url)
+        if product:
+            products.append(product)
+    return products
+
+
+def parse_myntra(html, base_url="https://www.myntra.com/"):
+    data = _dict(embedded_json(html, r'window\.__myx\s*='))
+    results = _dict(_dict(data.get("searchData")).get("results"))
+    products = []
+    for item in filter(None, map(_dict, _list(results.get("products")))):
+        title = " ".join(filter(None, (item.get("brand"), item.get("productName") or item.get("product"))))
+        product = _product(title, item.get("price"), item.get("mrp"), item.get("landingPageUrl"), base_url)
+        if product:
+            products.append(product)
+    return products
+
+
+def parse_ajio(html, base_url="https://www.ajio.com/"):
+    data = _dict(embedded_json(html, r'window\.__PRELOADED_STATE__\s*='))
+    entities = _dict(_dict(data.get("grid")).get("entities"))
+    products = []
+    for item in filter(None, map(_dict, entities.values())):
+        title = " ".join(filter(None, (item.get("brandName"), item.get("name"))))
+        price = _dict(item.get("price")).get("value")
+        mrp = _dict(item.get("wasPriceData")).get("value")
+        product = _product(title, price, mrp, item.get("url"), base_url)
+        if product:
+            products.append(product)
+    return products
+
+
+def parse_meesho(html, base_url="https://www.meesho.com/"):
+    data = _dict(embedded_json(html, r'<script id="__NEXT_DATA__"[^>]*>'))
+    state = _dict(_dict(_dict(data.get("props")).get("pageProps")).get("initialState"))
+    listing = _dict(_dict(state.get("searchListing")).get("listing"))
+    products = []
+    for item in filter(None, map(_dict, _list(listing.get("products")))):
+        url = f"/{item['slug']}/p/{item['product_id']}" if item.get("slug") and item.get("product_id") else None
+        product = _product(item.get("name"), item.get("min_product_price"), item.get("original_price"), url,
+                           base_url)
+        if product:
+            products.append(product)
+    return products
@@ -0,0 +1,343 @@
+"""
+Routing of Groq calls across a pool of API keys and ranked candidate models.
+A route is one (key, model) pair, optionally on its own base_url. Each route
+keeps a rolling window of latencies and errors; calls go to the healthy route
+for the best-ranked model with the lowest mean latency, fail over down the
+list on errors (bad requests and locally shed calls are raised as they are),
+and a non-streamed call that outlives its route's p95 gets a hedged backup on
+the next route (within a small budget). Calls run on the caller's thread
+unless they may be hedged, which puts both attempts on threads of their own.
+A Router has the same chat_completion/stream_chat_completion methods as a GroqClient.
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+import config
+from groq_client import GroqAPIError, QueueFullError, get_client
+from rate_limit import current_request
+
+# Samples a route needs before its latency is trusted for ranking and hedging
+MIN_SAMPLES = 5
+# Seconds between checks of the queue position of a hedged call running on its own thread
+RELAY_INTERVAL = 0.25
+# Client errors that are down to the route (a revoked key, a retired model, its quota) rather than the
+# request, so another route may still succeed
+ROUTE_STATUS_CODES = {401, 403, 404, 429}
+
+
+def _route_fault(error):
+    """
+    Whether a GroqAPIError counts against the route that raised it and is worth failing over.
+    A bad request fails the same way everywhere, and a call shed from the local queue says
+    nothing about the route, so both are passed straight back to the caller.
+    """
+    if isinstance(error, QueueFullError):
+        return False
+    status = error.status_code
+    return not (isinstance(status, int) and 400 <= status < 500 and status not in ROUTE_STATUS_CODES)
+
+
+class RouteStats:
+    """Rolling latency and error rate of one route"""
+
+    def __init__(self, window):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.last_failure = None
+        self._lock = threading.Lock()
+
+    def record(self, seconds, ok):
+        with self._lock:
+            self.outcomes.append(ok)
+            if ok:
+                self.latencies.append(seconds)
+                self.consecutive_failures = 0
+            else:
+                self.consecutive_failures += 1
+                self.last_failure = time.monotonic()
+
+    def percentile(self, q):
+        """Latency percentile in seconds, or None until MIN_SAMPLES successes are recorded"""
+        with self._lock:
+            values = sorted(self.latencies)
+        if len(values) < MIN_SAMPLES:
+            return None
+        return values[min(len(values) - 1, int(len(values) * q / 100))]
+
+    def mean(self):
+        """Mean latency in seconds (slow tails included), or None until MIN_SAMPLES successes are recorded"""
+        with self._lock:
+            if len(self.latencies) < MIN_SAMPLES:
+                return None
+            return sum(self.latencies) / len(self.latencies)
+
+    @property
+    def error_rate(self):
+        with self._lock:
+            return (self.outcomes.count(False) / len(self.outcomes)) if self.outcomes else 0.0
+
+    def healthy(self, cooldown, max_error_rate):
+        """A route is benched for `cooldown` seconds after repeated failures or a high error rate"""
+        if self.last_failure is None or time.monotonic() - self.last_failure > cooldown:
+            return True
+        return self.consecutive_failures < 3 and self.error_rate <= max_error_rate
+
+
+class Route:
+    def __init__(self, api_key, model, base_url=None, rank=0, window=None):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url
+        self.rank = rank
+        self.stats = RouteStats(window or config.GROQ_ROUTE_WINDOW)
+        self.calls = 0
+
+    @property
+    def client(self):
+        return get_client(self.api_key, self.base_url)
+
+    @property
+    def label(self):
+        return f"…{self.api_key[-4:]}/{self.model.split('/')[-1]}"
+
+
+class Router:
+    """
+    Picks a route per call. keys is a list of (api_key, base_url or None);
+    models maps an endpoint ("vision", "pricing") to its models, best first.
+    """
+
+    def __init__(self, keys, models, hedge=None, hedge_budget=None, cooldown=None, max_error_rate=None,
+                 window=None):
+        self.routes = {
+            endpoint: [Route(api_key, model, base_url, rank, window)
+                       for rank, model in enumerate(candidates) for api_key, base_url in keys]
+            for endpoint, candidates in models.items()
+        }
+        self.hedge = config.GROQ_HEDGE if hedge is None else hedge
+        self.hedge_budget = config.GROQ_HEDGE_BUDGET if hedge_budget is None else hedge_budget
+        self.cooldown = config.GROQ_ROUTE_COOLDOWN if cooldown is None else cooldown
+        self.max_error_rate = config.GROQ_ROUTE_MAX_ERROR_RATE if max_error_rate is None else max_error_rate
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+        self._lock = threading.Lock()
+
+    def clients(self):
+        """Every distinct GroqClient behind the routes"""
+        clients = {}
+        for routes in self.routes.values():
+            for route in routes:
+                clients[(route.api_key, route.base_url)] = route.client
+        return list(clients.values())
+
+    def candidates(self, endpoint):
+        """Routes for an endpoint, best first: healthy, then model rank, then mean latency (untried first)"""
+        def order(route):
+            mean = route.stats.mean()
+            return (not route.stats.healthy(self.cooldown, self.max_error_rate), route.rank,
+                    mean if mean is not None else 0.0)
+        return sorted(self.routes[endpoint], key=order)
+
+    @staticmethod
+    def _submit(fn, *args):
+        """
+        Run a hedged attempt on a thread of its own, so it waits for quota only in the fair
+        scheduler, never behind other calls
+        """
+        future = Future()
+        # A copy of the caller's context keeps telemetry spans and the rate-limit session with the call
+        context = contextvars.copy_context()
+
+        def run():
+            try:
+                future.set_result(context.run(fn, *args))
+            except BaseException as e:
+                future.set_exception(e)
+        threading.Thread(target=run, name="groq-route", daemon=True).start()
+        return future
+
+    @staticmethod
+    def _wait(futures, timeout=None, return_when=FIRST_COMPLETED):
+        """
+        concurrent.futures.wait that passes the queue position of attempts running on their own
+        threads on to the caller's on_wait, which the rate limiter only calls on the caller's thread
+        """
+        request = current_request()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        reported = (None, None)
+        while True:
+            tick = RELAY_INTERVAL if deadline is None else min(RELAY_INTERVAL, max(0.0, deadline - time.monotonic()))
+            done, pending = wait(futures, timeout=tick, return_when=return_when)
+            if request is not None and (request.position, request.wait) != reported:
+                reported = (request.position, request.wait)
+                request.report(*reported)
+            if done or (deadline is not None and time.monotonic() >= deadline):
+                if done and reported != (None, None):
+                    request.report(None, None)
+                return done, pending
+
+    def _call(self, route, payload, endpoint):
+        start = time.monotonic()
+        route.calls += 1
+        try:
+            data = route.client.chat_completion(dict(payload, model=route.model), endpoint=endpoint)
+        except GroqAPIError as e:
+            if _route_fault(e):
+                route.stats.record(time.monotonic() - start, ok=False)
+            raise
+        route.stats.record(time.monotonic() - start, ok=True)
+        return data
+
+    def _hedge_delay(self, route, alternatives):
+        """Seconds to wait before a backup request, or None to not hedge this call"""
+        if not (self.hedge and alternatives):
+            return None
+        with self._lock:
+            if self.hedges + 1 > self.hedge_budget * self.calls:
+                return None
+        return route.stats.percentile(95)
+
+    def _hedged_call(self, route, alternatives, payload, endpoint):
+        delay = self._hedge_delay(route, alternatives)
+        if delay is None:
+            # No backup will be sent, so the call stays on the caller's thread, where the fair
+            # scheduler reports its queue position straight to on_wait
+            return self._call(route, payload, endpoint)
+        primary = self._submit(self._call, route, payload, endpoint)
+        if self._wait([primary], timeout=delay)[0]:
+            return primary.result()
+
+        backup_route = alternatives.pop(0)
+        with self._lock:
+            self.hedges += 1
+        running = {primary: route, self._submit(self._call, backup_route, payload, endpoint): backup_route}
+        error = None
+        while running:
+            done, _ = self._wait(running)
+            for future in done:
+                winner = running.pop(future)
+                try:
+                    data = future.result()
+                except GroqAPIError as e:
+                    if not _route_fault(e):
+                        raise
+                    error = e
+                    continue
+                if winner is backup_route:
+                    with self._lock:
+                        self.hedge_wins += 1
+                # The slower request finishes in the background and still updates its route's stats
+                return data
+        raise error
+
+    def chat_completion(self, payload, endpoint="pricing"):
+        """Like GroqClient.chat_completion, trying routes in order until one succeeds"""
+        with self._lock:
+            self.calls += 1
+        remaining = self.candidates(endpoint)
+        last_error = None
+        while remaining:
+            route = remaining.pop(0)
+            try:
+                return self._hedged_call(route, remaining, payload, endpoint)
+            except GroqAPIError as e:
+                if not _route_fault(e):
+                    raise
+                last_error = e
+                if remaining:
+                    with self._lock:
+                        self.failovers += 1
+        raise last_error
+
+    def stream_chat_completion(self, payload, endpoint="pricing", usage=None):
+        """Like GroqClient.stream_chat_completion; fails over only until the first delta arrives"""
+        with self._lock:
+            self.calls += 1
+        last_error = None
+        for route in self.candidates(endpoint):
+            start = time.monotonic()
+            route.calls += 1
+            started = False
+            try:
+                for delta in route.client.stream_chat_completion(dict(payload, model=route.model), endpoint, usage):
+                    started = True
+                    yield delta
+            except GroqAPIError as e:
+                if not _route_fault(e):
+                    raise
+                route.stats.record(time.monotonic() - start, ok=False)
+                if started:
+                    raise
+                last_error = e
+                with self._lock:
+                    self.failovers += 1
+                continue
+            route.stats.record(time.monotonic() - start, ok=True)
+            return
+        raise last_error
+
+    def stats(self):
+        """Per-route calls, latency and health plus hedging and failover counters"""
+        routes = []
+        for endpoint, candidates in self.routes.items():
+            for route in candidates:
+                p50, p95 = route.stats.percentile(50), route.stats.percentile(95)
+                routes.append({
+                    "endpoint": endpoint, "route": route.label, "calls": route.calls,
+                    "p50_ms": round(p50 * 1000) if p50 is not None else None,
+                    "p95_ms": round(p95 * 1000) if p95 is not None else None,
+                    "error_rate": round(route.stats.error_rate, 3),
+                    "healthy": route.stats.healthy(self.cooldown, self.max_error_rate),
+                })
+        return {"calls": self.calls, "hedges": self.hedges, "hedge_wins": self.hedge_wins,
+                "failovers": self.failovers, "routes": routes}
+
+
+_settings = {}
+_routers = {}
+_routers_lock = threading.Lock()
+
+
+def configure(secrets):
+    """Use GROQ_API_KEYS / GROQ_VISION_MODELS / GROQ_PRICE_MODELS from a secrets mapping (e.g. st.secrets)"""
+    with _routers_lock:
+        _settings.clear()
+        _settings.update({name: secrets[name] for name in ("GROQ_API_KEYS", "GROQ_VISION_MODELS", "GROQ_PRICE_MODELS")
+                          if name in secrets})
+        _routers.clear()
+
+
+def _as_list(value):
+    return [item.strip() for item in value.split(",") if item.strip()] if isinstance(value, str) else list(value)
+
+
+def routing_settings(api_key):
+    """(keys, models) for a Router: the given key first, then the configured pool"""
+    settings = _settings or config.load_secrets()
+    keys = [(api_key, None)]
+    for entry in _as_list(settings.get("GROQ_API_KEYS") or config.GROQ_API_KEYS):
+        if isinstance(entry, str):
+            entry = {"key": entry}
+        key = (entry["key"], entry.get("base_url"))
+        if key[0] and key not in keys:
+            keys.append(key)
+    models = {
+        "vision": _as_list(settings.get("GROQ_VISION_MODELS") or config.GROQ_VISION_MODELS),
+        "pricing": _as_list(settings.get("GROQ_PRICE_MODELS") or config.GROQ_PRICE_MODELS),
+    }
+    return keys, models
+
+
+def get_router(api_key):
+    """Process-wide Router whose first key is api_key"""
+    with _routers_lock:
+        router = _routers.get(api_key)
+        if router is None:
+            router = _routers[api_key] = Router(*routing_settings(api_key))
+        return router
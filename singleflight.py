@@ -0,0 +1,68 @@
+"""
+Request coalescing ("single flight") for concurrent identical calls.
+While one caller is computing the value for a key, later callers with the same
+key wait for that call and receive its result (or its exception) instead of
+starting their own.
+"""
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Thread-safe coalescing of in-flight calls keyed by a string"""
+
+    def __init__(self, name):
+        self.name = name
+        self.executions = 0
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Run fn() for key, or wait for the identical call already running and share its outcome"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        return {
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": self.in_flight(),
+        }
@@ -0,0 +1,215 @@
+"""
+Lightweight timing spans for the identify and price paths.
+Wrap a stage in `with span("image.prepare"):` and it is timed, nested under
+whatever span is open on the same thread, and kept with its trace once the
+root span ends. Finished traces can be exported as OpenTelemetry (OTLP/JSON)
+and per-stage latency histograms as Prometheus text, together with any
+counters registered by other modules (token usage, cache hit rates).
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+import config
+
+SERVICE_NAME = "price-finder"
+# Upper bounds (seconds) of the Prometheus latency histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current = contextvars.ContextVar("price_finder_span", default=None)
+
+
+class Span:
+    """One timed stage; attributes hold whatever was learned along the way (bytes, tokens, status)"""
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes")
+
+    def __init__(self, name, trace_id, parent_id, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration(self):
+        """Seconds from start to end (or to now while still open)"""
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+
+class _NullSpan:
+    """Returned while telemetry is off so call sites never need to check"""
+    attributes = {}
+
+    def set(self, **attributes):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Collector:
+    """Keeps the most recent traces and per-stage latency histograms"""
+
+    def __init__(self, max_traces=None):
+        max_traces = max_traces or config.TELEMETRY_MAX_TRACES
+        self.traces = deque(maxlen=max_traces)
+        self.histograms = {}
+        # Spans by trace id, bounded; a child that ends after its root still joins the trace
+        self._spans = OrderedDict()
+        self._max_open = max_traces * 4
+        self._metric_sources = []
+        self._lock = threading.Lock()
+
+    def finish(self, finished, root):
+        seconds = finished.duration
+        with self._lock:
+            histogram = self.histograms.setdefault(finished.name, {"buckets": [0] * len(BUCKETS), "sum": 0.0,
+                                                                   "count": 0})
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += seconds
+            histogram["count"] += 1
+
+            spans = self._spans.get(finished.trace_id)
+            if spans is None:
+                spans = self._spans[finished.trace_id] = []
+                if len(self._spans) > self._max_open:
+                    self._spans.popitem(last=False)
+            spans.append(finished)
+            if root:
+                self.traces.append(spans)
+
+    def recent(self):
+        """Finished traces, newest first; each is a list of spans ordered by start time"""
+        with self._lock:
+            return [sorted(spans, key=lambda s: s.start_ns) for spans in reversed(self.traces)]
+
+    def register_metrics(self, source):
+        """
+        Add a callable returning [(name, type, help, [(labels_dict, value), ...]), ...]
+        whose metrics are appended to prometheus_text()
+        """
+        self._metric_sources.append(source)
+
+    def clear(self):
+        with self._lock:
+            self.traces.clear()
+            self.histograms.clear()
+            self._spans.clear()
+
+
+collector = Collector()
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time a stage as a child of the span currently open on this thread (or as a new trace)"""
+    if not config.TELEMETRY:
+        yield _NULL_SPAN
+        return
+    parent = _current.get()
+    current = Span(name, parent.trace_id if parent else os.urandom(16).hex(),
+                   parent.span_id if parent else None, attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current.reset(token)
+        collector.finish(current, root=parent is None)
+
+
+def record(name, start_ns, end_ns=None, **attributes):
+    """
+    Record an already-measured stage as a child of the current span.
+    For work that cannot sit inside a with-block, such as a generator consumed by the caller.
+    """
+    if not config.TELEMETRY:
+        return
+    parent = _current.get()
+    finished = Span(name, parent.trace_id if parent else os.urandom(16).hex(),
+                    parent.span_id if parent else None, attributes)
+    finished.start_ns = start_ns
+    finished.end_ns = end_ns or time.time_ns()
+    collector.finish(finished, root=parent is None)
+
+
+def current_span():
+    """The innermost open span on this thread, for adding attributes from deep inside a stage"""
+    return _current.get() or _NULL_SPAN
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def export_otlp_json(traces=None):
+    """Traces as an OTLP/JSON ExportTraceServiceRequest, ready to POST to a collector's /v1/traces"""
+    traces = collector.recent() if traces is None else traces
+    spans = []
+    for trace in traces:
+        for s in trace:
+            spans.append({
+                "traceId": s.trace_id,
+                "spanId": s.span_id,
+                **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                "name": s.name,
+                "kind": 1,
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+                "status": {"code": 2 if "error" in s.attributes else 1},
+            })
+    return json.dumps({"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "price_finder.telemetry"}, "spans": spans}],
+    }]})
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in labels.items()) + "}"
+
+
+def prometheus_text():
+    """Stage latency histograms plus registered counters in the Prometheus text exposition format"""
+    lines = [
+        "# HELP price_finder_stage_seconds Time spent in each instrumented stage",
+        "# TYPE price_finder_stage_seconds histogram",
+    ]
+    with collector._lock:
+        histograms = {name: dict(h, buckets=list(h["buckets"])) for name, h in collector.histograms.items()}
+    for name, histogram in sorted(histograms.items()):
+        for bound, count in zip(BUCKETS, histogram["buckets"]):
+            lines.append(f'price_finder_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {count}')
+        lines.append(f'price_finder_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {histogram["count"]}')
+        lines.append(f'price_finder_stage_seconds_sum{{stage="{name}"}} {histogram["sum"]:.6f}')
+        lines.append(f'price_finder_stage_seconds_count{{stage="{name}"}} {histogram["count"]}')
+
+    for source in collector._metric_sources:
+        for name, kind, help_text, samples in source():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
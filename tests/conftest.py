@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# The app modules live at the top of the repository; keep their data out of the working tree
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("PRICE_FINDER_DATA_DIR", tempfile.mkdtemp(prefix="price-finder-tests-"))
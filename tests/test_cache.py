@@ -0,0 +1,77 @@
+import io
+import threading
+
+import pytest
+from PIL import Image, ImageDraw
+
+from cache import (PersistentCache, StaleWhileRevalidateCache, fingerprint_distance, image_fingerprint,
+                   normalize_query, similar_fingerprint)
+from rate_limit import BATCH, current_request
+
+
+def drawing(fill="red", label=None, size=(400, 300)):
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((100, 80, 300, 220), fill=fill)
+    if label:
+        draw.text((150, 240), label, fill="black")
+    return image
+
+
+def test_same_photo_same_fingerprint():
+    image = drawing()
+    png = io.BytesIO()
+    image.save(png, format="PNG")
+    assert image_fingerprint(image) == image_fingerprint(Image.open(io.BytesIO(png.getvalue())))
+    assert image_fingerprint(image) == image_fingerprint(image.convert("RGBA"))
+
+
+@pytest.mark.parametrize("first, second", [
+    (drawing("red"), drawing("blue")),
+    (drawing("black"), drawing("navy")),
+    (Image.new("RGB", (64, 64), "black"), Image.new("RGB", (64, 64), "white")),
+    (Image.new("RGB", (64, 64), "gray"), Image.new("RGB", (128, 64), "gray")),
+])
+def test_different_photos_different_fingerprints(first, second):
+    assert image_fingerprint(first) != image_fingerprint(second)
+    assert fingerprint_distance(image_fingerprint(first), image_fingerprint(second)) is None
+
+
+def reencoded(image, quality=70, scale=1.0):
+    image = image.resize((round(image.width * scale), round(image.height * scale)), Image.BOX)
+    jpeg = io.BytesIO()
+    image.save(jpeg, format="JPEG", quality=quality)
+    return Image.open(io.BytesIO(jpeg.getvalue()))
+
+
+@pytest.mark.parametrize("quality, scale", [(90, 1.0), (50, 1.0), (75, 0.5), (60, 0.33)])
+def test_reencoded_photo_hits_the_cache(tmp_path, quality, scale):
+    cache = PersistentCache(str(tmp_path / "cache.sqlite3"), "identifications", 3600, 10)
+    image = drawing(label="iPhone 15")
+    cache.set("multi:model:" + image_fingerprint(image), {"name": "iPhone 15"})
+    cache.set("multi:model:" + image_fingerprint(drawing("blue")), {"name": "blue case"})
+    copy = image_fingerprint(reencoded(image, quality, scale))
+    assert cache.get_nearest("multi:model:" + copy, similar_fingerprint(12)) == {"name": "iPhone 15"}
+    assert cache.get_nearest("multi:opencv:" + copy, similar_fingerprint(12)) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_normalize_query():
+    assert normalize_query("Apple iPhone 15, 128GB") == normalize_query("iphone 15 128gb APPLE")
+
+
+def test_stale_entries_are_refreshed_at_batch_priority(tmp_path):
+    cache = StaleWhileRevalidateCache(PersistentCache(str(tmp_path / "cache.sqlite3"), "prices", 3600, 10), -1)
+    cache.set("sony", {"price": 1})
+    refreshed = threading.Event()
+    seen = []
+
+    def refresh():
+        request = current_request()
+        seen.append((request.session, request.priority))
+        refreshed.set()
+        return {"price": 2}
+
+    assert cache.get("sony", refresh=refresh) == {"price": 1}
+    assert refreshed.wait(5)
+    assert seen == [("refresh", BATCH)]
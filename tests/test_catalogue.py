@@ -0,0 +1,78 @@
+import pytest
+
+from catalogue import Catalogue, typo_of
+
+
+@pytest.fixture
+def catalogue(tmp_path):
+    catalogue = Catalogue(str(tmp_path / "catalogue.sqlite3"))
+    for name, brand in (("Samsung Galaxy S23 Ultra 256GB", "Samsung"), ("Apple iPhone 15 Pro", "Apple"),
+                        ("Sony WH-1000XM5 Headphones", "Sony"), ("Prestige Pressure Cooker 5L", "Prestige")):
+        catalogue.add({"product_name": name, "brand": brand, "search_query": name})
+    return catalogue
+
+
+@pytest.mark.parametrize("query", [
+    "Samsung Galaxy S23 Ultra case",
+    "samsung galaxy s23 ultra back cover",
+    "iPhone 15 Pro Max",
+    "Apple iPhone 15 Pro charger",
+    "Apple iPhone 14 Pro",
+])
+def test_accessories_and_other_models_do_not_match(catalogue, query):
+    assert catalogue.match(query, threshold=0.3) is None
+
+
+@pytest.mark.parametrize("query, name", [
+    ("samsung galaxy s23 ultra 256gb", "Samsung Galaxy S23 Ultra 256GB"),
+    ("Samsng Galaxy S23 Ultra 256GB", "Samsung Galaxy S23 Ultra 256GB"),
+    ("iphone 15 pro apple", "Apple iPhone 15 Pro"),
+    ("Apple iPhnoe 15 Pro", "Apple iPhone 15 Pro"),
+    ("sony wh-1000xm5 headphnes", "Sony WH-1000XM5 Headphones"),
+    ("the prestige pressure cooker 5l", "Prestige Pressure Cooker 5L"),
+])
+def test_typos_and_word_order_match(catalogue, query, name):
+    found = catalogue.match(query)
+    assert found is not None
+    assert found[0]["name"] == name
+
+
+def test_typo_of():
+    assert typo_of("samsung", "samsng")
+    assert typo_of("iphnoe", "iphone")
+    assert typo_of("headphnes", "headphones")
+    assert not typo_of("case", "cast")  # short words must be spelt right
+    assert not typo_of("s23", "s24")
+    assert not typo_of("charger", "cover")
+
+
+@pytest.fixture
+def models(tmp_path):
+    catalogue = Catalogue(str(tmp_path / "models.sqlite3"))
+    for name, brand in (("Apple iPhone 15 Pro Max 256GB", "Apple"), ("Samsung Galaxy S23 Ultra", "Samsung"),
+                        ("Sony WH-1000XM5 Headphones", "Sony")):
+        catalogue.add({"product_name": name, "brand": brand, "search_query": name})
+    return catalogue
+
+
+@pytest.mark.parametrize("query", [
+    "iPhone 15 Pro",
+    "Apple iPhone 15 Pro Max",
+    "iphone 15 256gb",
+    "samsung galaxy",
+    "galaxy s23",
+    "Samsung Galaxy S23",
+    "Sony headphones",
+])
+def test_less_specific_queries_do_not_match(models, query):
+    assert models.match(query, threshold=0.3) is None
+
+
+@pytest.mark.parametrize("query, name", [
+    ("iphone 15 pro max 256gb", "Apple iPhone 15 Pro Max 256GB"),
+    ("Galaxy S23 Ulrta", "Samsung Galaxy S23 Ultra"),
+    ("WH-1000XM5", "Sony WH-1000XM5 Headphones"),
+])
+def test_queries_naming_the_model_match(models, query, name):
+    found = models.match(query, threshold=0.3)
+    assert found is not None and found[0]["name"] == name
@@ -0,0 +1,24 @@
+import pytest
+
+from config import _env_bool, _env_float, _env_int
+
+
+@pytest.mark.parametrize("value", ["0", "false", "False", "FALSE", "no", "No", "off", "OFF", "", "  off "])
+def test_env_bool_off(monkeypatch, value):
+    monkeypatch.setenv("PRICE_FINDER_TEST_FLAG", value)
+    assert _env_bool("PRICE_FINDER_TEST_FLAG", True) is False
+
+
+@pytest.mark.parametrize("value", ["1", "true", "TRUE", "yes", "on", "On"])
+def test_env_bool_on(monkeypatch, value):
+    monkeypatch.setenv("PRICE_FINDER_TEST_FLAG", value)
+    assert _env_bool("PRICE_FINDER_TEST_FLAG", False) is True
+
+
+def test_env_defaults(monkeypatch):
+    monkeypatch.delenv("PRICE_FINDER_TEST_FLAG", raising=False)
+    assert _env_bool("PRICE_FINDER_TEST_FLAG", True) is True
+    assert _env_bool("PRICE_FINDER_TEST_FLAG", False) is False
+    monkeypatch.setenv("PRICE_FINDER_TEST_FLAG", "many")
+    assert _env_int("PRICE_FINDER_TEST_FLAG", 3) == 3
+    assert _env_float("PRICE_FINDER_TEST_FLAG", 0.5) == 0.5
@@ -0,0 +1,62 @@
+import time
+
+import pytest
+
+from benchmarks.groq_stub import GroqStub
+from groq_client import CircuitBreaker, CircuitOpenError, GroqAPIError, GroqClient
+
+PAYLOAD = {"model": "test-model", "messages": [{"role": "user", "content": "Price of Sony WH-1000XM5"}]}
+
+
+def opened(reset_timeout=0.05):
+    breaker = CircuitBreaker(threshold=1, reset_timeout=reset_timeout)
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    time.sleep(reset_timeout)
+    return breaker
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    breaker = opened()
+    assert breaker.before_call() is True
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.05)
+    assert breaker.before_call() is True
+    breaker.record_success()
+    assert breaker.before_call() is False
+    assert breaker.before_call() is False
+
+
+def test_probe_without_a_verdict_hands_over():
+    with GroqStub(fail_statuses=[429]) as stub:
+        client = GroqClient("test-key", base_url=stub.base_url, max_retries=0, breaker=opened(),
+                            requests_per_minute=0, tokens_per_minute=0)
+        with pytest.raises(GroqAPIError) as error:
+            client.chat_completion(PAYLOAD)
+        assert error.value.status_code == 429
+        assert client.chat_completion(PAYLOAD)["choices"]
+        assert client.breaker.opened_at is None
+
+
+def test_malformed_stream_chunk_is_a_stream_error(monkeypatch):
+    class Response:
+        def iter_lines(self, decode_unicode=False):
+            yield 'data: {"choices": [{"delta": {"content": "{\\"search_query\\""}}]}'
+            yield 'data: {"choices": [{"delta"'
+
+        def close(self):
+            pass
+
+    client = GroqClient("test-key", requests_per_minute=0, tokens_per_minute=0)
+    monkeypatch.setattr(client, "post", lambda *args, **kwargs: Response())
+    stream = client.stream_chat_completion(PAYLOAD)
+    assert next(stream) == '{"search_query"'
+    with pytest.raises(GroqAPIError) as error:
+        next(stream)
+    assert error.value.status_code == "stream error"
@@ -0,0 +1,22 @@
+import io
+
+from PIL import Image
+
+from image_prep import open_image
+
+
+def jpeg(size):
+    data = io.BytesIO()
+    Image.new("RGB", size, "gray").save(data, format="JPEG")
+    data.seek(0)
+    return data
+
+
+def test_large_jpegs_are_decoded_at_a_reduced_scale():
+    image = open_image(jpeg((4000, 3000)), max_pixels=1024 * 1024)
+    assert 1024 * 1024 <= image.width * image.height < 4000 * 3000
+    assert abs(image.width / image.height - 4 / 3) < 0.01
+
+
+def test_small_jpegs_are_decoded_in_full():
+    assert open_image(jpeg((1280, 960)), max_pixels=1024 * 1024).size == (1280, 960)
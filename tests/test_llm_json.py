@@ -0,0 +1,131 @@
+import pytest
+
+from llm_json import (JsonFieldWatcher, LLMJSONError, coerce_price, find_json, parse_product_list,
+                      parse_retailers, validate_product_info, validate_product_list, validate_retailers)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"a": 1}', {"a": 1}),
+    ('```json\n{"a": 1}\n```', {"a": 1}),
+    ('Sure! Here it is: {"a": "b"} Hope that helps.', {"a": "b"}),
+    ("{'a': 'it\\'s', 'b': True, 'c': None}", {"a": "it's", "b": True, "c": None}),
+    ('{"a": [1, 2,], "b": 3,}', {"a": [1, 2], "b": 3}),
+    ('{"a": "x {not json} y", "b": "[", "c": 2}', {"a": "x {not json} y", "b": "[", "c": 2}),
+])
+def test_find_json(text, expected):
+    assert find_json(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Cut off inside a string, after a key, after a comma and mid-array
+    ('{"product_name": "Sony WH-1000XM5", "brand": "So', {"product_name": "Sony WH-1000XM5", "brand": "So"}),
+    ('{"product_name": "Sony", "brand":', {"product_name": "Sony", "brand": None}),
+    ('{"product_name": "Sony",', {"product_name": "Sony"}),
+    ('[{"retailer": "Amazon", "price": 100}, {"retailer": "Flip', [{"retailer": "Amazon", "price": 100},
+                                                                    {"retailer": "Flip"}]),
+    ('{"a": {"b": [1, 2', {"a": {"b": [1, 2]}}),
+])
+def test_find_json_repairs_truncated_replies(text, expected):
+    assert find_json(text) == expected
+
+
+def test_find_json_kind_and_errors():
+    assert find_json('[1] then {"a": 1}', dict) == {"a": 1}
+    assert find_json('{"a": [1]}', list) == [1]
+    with pytest.raises(LLMJSONError) as error:
+        find_json("I could not identify a product in this image.")
+    assert error.value.reason == "not_found"
+    with pytest.raises(LLMJSONError) as error:
+        find_json('{"product_name": "Sony", "brand": Sony}')
+    assert error.value.reason == "invalid"
+    with pytest.raises(LLMJSONError):
+        find_json('{"product_name": "Sony', repair=False)
+
+
+@pytest.mark.parametrize("value, expected", [
+    (89999, 89999), (1299.5, 1299.5), ("₹89,999", 89999), ("Rs. 1,299.00", 1299), ("1.2 lakh", 120000),
+    ("₹1,000 - ₹1,200", 1000), ("2 crore", 20000000), ("15k", 15000), ("INR 499", 499),
+    (0, None), (-5, None), ("₹0", None), ("free", None), ("", None), (None, None), (True, None), ([100], None),
+])
+def test_coerce_price(value, expected):
+    assert coerce_price(value) == expected
+
+
+def test_validate_product_info():
+    assert validate_product_info({"product_name": "  Sony WH-1000XM5 ", "brand": "Sony", "category": "",
+                                  "description": None, "extra": "x"}) == {"product_name": "Sony WH-1000XM5",
+                                                                          "brand": "Sony"}
+    # Compact keys are expanded; non-string values are kept as JSON text
+    assert validate_product_info({"q": "sony xm5", "b": ["Sony"]}) == {"search_query": "sony xm5", "brand": '["Sony"]'}
+    for value in ([], {"brand": "Sony"}, {"product_name": "   "}):
+        with pytest.raises(LLMJSONError):
+            validate_product_info(value)
+
+
+def test_validate_retailers():
+    rows = validate_retailers({"retailers": [
+        {"retailer": " Amazon India ", "price": "₹26,990", "url": "https://amazon.in", "condition": "new"},
+        {"retailer": "Flipkart", "price": "unavailable"},
+        {"retailer": "", "price": 100},
+        "Myntra: 28990",
+        {"r": "Ajio", "p": 29990, "c": "n", "s": "low"},
+    ]})
+    assert rows == [
+        {"retailer": "Amazon India", "url": "https://amazon.in", "condition": "new", "price": 26990},
+        {"retailer": "Ajio", "condition": "new", "url": "https://ajio.com", "availability": "limited stock",
+         "price": 29990},
+    ]
+    assert validate_retailers([]) == []
+    for value in ({"note": "none"}, "Amazon: 100", None):
+        with pytest.raises(LLMJSONError):
+            validate_retailers(value)
+
+
+def test_validate_product_list():
+    items = validate_product_list({"items": [
+        {"product_name": "Sony WH-1000XM5", "box": [100, 200, 500, 900], "region": "2"},
+        {"product_name": "Apple iPhone 15", "box": [0.5, 0.5, 0.4, 0.9]},
+        {"brand": "No name"},
+        {"n": "Nike Air Max 270", "bb": [10, 10, 50, 50], "r": 1},
+    ]}, max_items=5)
+    assert [(i["product_name"], i["box"], i["region"]) for i in items] == [
+        ("Sony WH-1000XM5", [0.1, 0.2, 0.5, 0.9], 2),
+        ("Apple iPhone 15", None, None),
+        ("Nike Air Max 270", [0.1, 0.1, 0.5, 0.5], 1),
+    ]
+    assert len(validate_product_list([{"product_name": str(i)} for i in range(6)], max_items=3)) == 3
+    with pytest.raises(LLMJSONError):
+        validate_product_list({"items": "none"})
+
+
+def test_parse_helpers_accept_either_wrapping():
+    assert parse_retailers('{"retailers": [{"retailer": "Amazon", "price": 5}]}') == [{"retailer": "Amazon",
+                                                                                        "price": 5}]
+    assert parse_product_list('[{"product_name": "Sony"}]')[0]["product_name"] == "Sony"
+
+
+def feed_in(chunks):
+    watcher = JsonFieldWatcher()
+    completed = []
+    for chunk in chunks:
+        completed.append(watcher.feed(chunk))
+    return watcher, completed
+
+
+def test_field_watcher_reports_fields_as_they_close():
+    reply = '```json\n{"product_name": "Sony WH-1000XM5", "tags": ["a", "b"], "box": {"x": "1"}, "brand": "So\\"ny"}'
+    watcher, completed = feed_in(reply[i:i + 3] for i in range(0, len(reply), 3))
+    assert [pair for pairs in completed for pair in pairs] == [("product_name", "Sony WH-1000XM5"),
+                                                               ("brand", 'So"ny')]
+    assert watcher.fields == {"product_name": "Sony WH-1000XM5", "brand": 'So"ny'}
+
+
+def test_field_watcher_with_chunks_split_inside_strings_and_escapes():
+    watcher, completed = feed_in(['{"sear', 'ch_query": "sony', ' xm5\\', 'u00e9", "pri', 'ce": 10', ', "n": "x"}'])
+    assert completed == [[], [], [], [("search_query", "sony xm5é")], [], [("n", "x")]]
+
+
+def test_field_watcher_ignores_incomplete_and_non_string_fields():
+    watcher, completed = feed_in(['{"product_name": "Sony", "price": 26990, "brand": "So'])
+    assert completed == [[("product_name", "Sony")]]
+    assert watcher.fields == {"product_name": "Sony"}
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+import config
+from benchmarks.retailer_stub import RetailerStub
+from price_sources import (AmazonIndiaSource, FlipkartSource, MyntraSource, PriceSource, PriceSourceError,
+                           collect_prices)
+
+QUERY = "Sony WH-1000XM5 headphones"
+
+
+class FailingSource(PriceSource):
+    name = "failing"
+    live = True
+
+    def fetch(self, query, api_key):
+        raise PriceSourceError("no prices today")
+
+
+@pytest.fixture
+def retailers(monkeypatch):
+    monkeypatch.setattr(config, "PRICE_SOURCE_TIMEOUT", 2)
+    with RetailerStub(latency={"flipkart": 6.0}, fail={"myntra": 503}) as stub:
+        monkeypatch.setattr(config, "RETAILER_BASE_URL", stub.base_url)
+        yield stub
+
+
+def test_live_rows_from_the_stub(retailers):
+    collection = collect_prices(QUERY, "test", sources=[AmazonIndiaSource()])
+    assert collection.ok and collection.done and not collection.errors
+    row, = collection.results["retailers"]
+    assert (row["retailer"], row["price"], row["source"]) == ("Amazon India", 26990, "amazon")
+    assert row["url"].startswith(retailers.base_url + "/Sony-WH-1000XM5-")
+    assert row["discount"] == "23% off MRP ₹34,990"
+
+
+def test_timeouts_and_failures_do_not_hold_up_other_sources(retailers):
+    updates = []
+    start = time.perf_counter()
+    collection = collect_prices(QUERY, "test", sources=[AmazonIndiaSource(), FlipkartSource(), MyntraSource(),
+                                                        FailingSource()],
+                                on_update=lambda c: updates.append((time.perf_counter() - start, list(c.pending))))
+    assert collection.done
+    assert [row["retailer"] for row in collection.results["retailers"]] == ["Amazon India"]
+    assert collection.errors == {"flipkart": "timed out after 2s", "myntra": "Myntra: HTTP 503",
+                                 "failing": "no prices today"}
+    # One update per source; the live Amazon row is out before Flipkart times out
+    assert len(updates) == 4 and updates[-1][1] == []
+    assert min(seconds for seconds, pending in updates if "flipkart" in pending) < 2.0
+    assert time.perf_counter() - start < 5.0
+
+
+def test_nothing_found(retailers):
+    collection = collect_prices("Prestige pressure cooker 5L", "test", sources=[AmazonIndiaSource()])
+    assert collection.done and not collection.ok and not collection.errors
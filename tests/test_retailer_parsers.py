@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from retailer_parsers import parse_ajio, parse_amazon, parse_flipkart, parse_meesho, parse_myntra
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "data",
+                        "retailers")
+PARSERS = {"amazon": parse_amazon, "flipkart": parse_flipkart, "myntra": parse_myntra, "ajio": parse_ajio,
+           "meesho": parse_meesho}
+# (title, price, mrp, url) of the first two listings of each saved search page for Sony WH-1000XM5
+EXPECTED = {
+    "amazon": [
+        ("Sony WH-1000XM5 Wireless Industry Leading Active Noise Cancelling Headphones, 30Hr Battery, Black",
+         26990, 34990, "https://www.amazon.in/Sony-WH-1000XM5-Cancelling-Headphones-Hands-Free/dp/B09XS7JWHH/"
+                       "ref=sr_1_1?keywords=sony+wh-1000xm5"),
+        ("Sony WH-1000XM4 Wireless Noise Cancelling Headphones, Black", 19990, 29990,
+         "https://www.amazon.in/Sony-WH-1000XM4-Wireless-Cancelling-Headphones/dp/B0863TXGM3"),
+    ],
+    "flipkart": [
+        ("SONY WH-1000XM5 Bluetooth Headset", 27490, 34990,
+         "https://www.flipkart.com/sony-wh-1000xm5-bluetooth-headset/p/itmf3f3f9d8f7a4c"
+         "?pid=ACCGFGMZ2GZHJAYF&lid=LSTACC&marketplace=FLIPKART"),
+        ("SONY WH-1000XM4 Bluetooth Headset", 19990, 29990,
+         "https://www.flipkart.com/sony-wh-1000xm4-bluetooth-headset/p/itm1c2b3d4e5f6a7?pid=ACCFSDGXX3S6DVBG"),
+    ],
+    "myntra": [
+        ("Sony WH-1000XM5 Wireless Noise Cancelling Headphones", 28990, 34990,
+         "https://www.myntra.com/headphones/sony/sony-wh-1000xm5-wireless-noise-cancelling-headphones/24587932/buy"),
+        ("Sony WH-CH720N Wireless Headphones", 8990, 14990,
+         "https://www.myntra.com/headphones/sony/sony-wh-ch720n/11894558/buy"),
+    ],
+    "ajio": [
+        ("SONY WH-1000XM5 Wireless Noise-Cancelling Headphones", 29990, 34990,
+         "https://www.ajio.com/sony-wh-1000xm5-wireless-noise-cancelling-headphones/p/469577093_black"),
+        ("SONY WH-1000XM5 Headphones with Mic", 30490, None,
+         "https://www.ajio.com/sony-wh-1000xm5-headphones-with-mic/p/469123456_silver"),
+    ],
+    "meesho": [
+        ("Over-Ear Bluetooth Headphones with Noise Cancellation WH1000XM5 Style", 1249, 2999,
+         "https://www.meesho.com/over-ear-bluetooth-headphones-noise-cancellation/p/4dq5xk"),
+        ("Sony WH-1000XM5 Wireless Headphones Black", 24999, 34990,
+         "https://www.meesho.com/sony-wh-1000xm5-wireless-headphones-black/p/5p9k2a"),
+    ],
+}
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, f"{name}.html"), encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("name", sorted(PARSERS))
+def test_fixture_listings(name):
+    products = PARSERS[name](fixture(name))
+    assert [(p["title"], p["price"], p["mrp"], p["url"]) for p in products] == EXPECTED[name]
+
+
+@pytest.mark.parametrize("name", sorted(PARSERS))
+def test_relative_urls_resolve_against_base_url(name):
+    products = PARSERS[name](fixture(name), base_url="http://127.0.0.1:8788/" + name + "/")
+    assert products and all(p["url"].startswith("http://127.0.0.1:8788/") for p in products)
+
+
+@pytest.mark.parametrize("name", sorted(PARSERS))
+def test_pages_without_results(name):
+    assert PARSERS[name]("<html><body><p>No results</p></body></html>") == []
+
+
+@pytest.mark.parametrize("html", [
+    '<script>window.__myx = {"searchData": []}</script>',
+    '<script>window.__myx = {"searchData": {"results": "none"}}</script>',
+    '<script>window.__myx = {"searchData": {"results": {"products": {"0": {}}}}}</script>',
+    '<script>window.__myx = {"searchData": {"results": {"products": [null, "x", 3]}}}</script>',
+    '<script>window.__myx = [1, 2]</script>',
+])
+def test_myntra_state_of_another_shape(html):
+    assert parse_myntra(html) == []
+
+
+def test_ajio_and_meesho_state_of_another_shape():
+    assert parse_ajio('<script>window.__PRELOADED_STATE__ = {"grid": {"entities": {"1": null, '
+                      '"2": {"name": "X", "price": 5}}}}</script>') == []
+    assert parse_meesho('<script id="__NEXT_DATA__" type="application/json">{"props": {"pageProps": '
+                        '{"initialState": {"searchListing": []}}}}</script>') == []
@@ -0,0 +1,106 @@
+import threading
+import uuid
+
+import pytest
+
+import config
+from benchmarks.groq_stub import GroqStub
+from groq_client import GroqAPIError, QueueFullError
+from rate_limit import request_context
+from router import Route, Router
+
+PAYLOAD = {"messages": [{"role": "user", "content": "Price of Apple iPhone 15 in India"}], "max_tokens": 64}
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    # 60 requests a minute with a burst of 6: the rest of a round of calls queues in the FairScheduler
+    monkeypatch.setattr(config, "GROQ_REQUESTS_PER_MINUTE", 60)
+    monkeypatch.setattr(config, "GROQ_TOKENS_PER_MINUTE", 0)
+    stub = GroqStub(latency=0.01).start()
+    yield stub
+    stub.stop()
+
+
+def router_for(stub, **options):
+    # A key of its own, so the GroqClient (and its scheduler) is new for each test
+    keys = [(f"test-{uuid.uuid4().hex}", stub.base_url), (f"test-{uuid.uuid4().hex}", stub.base_url)]
+    return Router(keys, {"pricing": ["test-model"]}, **options)
+
+
+def call_in_sessions(router, sessions):
+    """Queue reports each session's on_wait received on its own thread"""
+    reports = {}
+
+    def run(session):
+        owner = threading.get_ident()
+        reports[session] = []
+
+        def on_wait(position, wait):
+            assert threading.get_ident() == owner
+            reports[session].append(position)
+
+        with request_context(session, on_wait=on_wait):
+            router.chat_completion(PAYLOAD)
+
+    threads = [threading.Thread(target=run, args=(f"session-{i}",)) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+    return reports
+
+
+def test_queued_calls_report_their_position(stub):
+    router = router_for(stub, hedge=False)
+    reports = call_in_sessions(router, 9)
+    queued = [positions for positions in reports.values() if positions]
+    assert len(queued) >= 2
+    # Every wait ends with (None, None) once the call is admitted
+    assert all(positions[0] is not None and positions[-1] is None for positions in queued)
+    assert router.stats()["calls"] == 9
+
+
+def test_hedged_calls_relay_their_position(stub):
+    router = router_for(stub, hedge=True, hedge_budget=1.0)
+    for routes in router.routes.values():
+        for route in routes:
+            for _ in range(10):
+                route.stats.record(5.0, ok=True)
+    reports = call_in_sessions(router, 9)
+    assert router.hedges == 0  # the calls finish well within the 5s p95, so none needed a backup
+    queued = [positions for positions in reports.values() if positions]
+    assert len(queued) >= 2
+    assert all(positions[-1] is None for positions in queued)
+
+
+def test_bad_requests_are_raised_without_failover(stub):
+    router = router_for(stub, hedge=False)
+    stub.fail_statuses = [400]
+    with pytest.raises(GroqAPIError) as error:
+        router.chat_completion(PAYLOAD)
+    assert error.value.status_code == 400
+    assert stub.requests == 1 and router.failovers == 0
+    assert all(not route.stats.outcomes for route in router.routes["pricing"])
+
+
+def test_revoked_keys_fail_over(stub):
+    router = router_for(stub, hedge=False)
+    stub.fail_statuses = [401]
+    assert router.chat_completion(PAYLOAD)["choices"]
+    assert router.failovers == 1
+    assert sorted(route.stats.error_rate for route in router.routes["pricing"]) == [0.0, 1.0]
+
+
+def test_shed_calls_are_raised_without_failover(stub, monkeypatch):
+    router = router_for(stub, hedge=False)
+
+    class Shedding:
+        def chat_completion(self, payload, endpoint):
+            raise QueueFullError("queue full")
+    monkeypatch.setattr(Route, "client", property(lambda route: Shedding()))
+    with pytest.raises(QueueFullError):
+        router.chat_completion(PAYLOAD)
+    assert router.failovers == 0
+    assert all(route.stats.healthy(router.cooldown, router.max_error_rate) and not route.stats.outcomes
+               for route in router.routes["pricing"])
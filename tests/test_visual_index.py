@@ -0,0 +1,26 @@
+import numpy as np
+from visual_index import DIM, VisualIndex
+
+
+def unit(seed):
+    vector = np.random.default_rng(seed).normal(size=DIM).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_match_returns_the_stored_product(tmp_path):
+    index = VisualIndex(str(tmp_path))
+    index.add_many(np.stack([unit(0), unit(1)]), [{"product_name": "A"}, {"product_name": "B"}])
+    assert index.match(unit(1), threshold=0.99)[0] == {"product_name": "B"}
+    assert index.match(unit(2), threshold=0.99) is None
+    assert index.stats() == {"entries": 2, "hits": 1, "misses": 1}
+
+
+def test_processes_sharing_the_files_keep_ids_aligned(tmp_path):
+    # Two instances stand in for two processes appending to the same index
+    first, second = VisualIndex(str(tmp_path)), VisualIndex(str(tmp_path))
+    for i in range(6):
+        (first if i % 2 else second).add(unit(i), {"product_name": f"product {i}"})
+    for index in (first, second, VisualIndex(str(tmp_path))):
+        for i in range(6):
+            assert index.match(unit(i), threshold=0.99)[0] == {"product_name": f"product {i}"}
+
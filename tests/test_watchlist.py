@@ -0,0 +1,70 @@
+import sqlite3
+import time
+
+import pytest
+
+from watchlist import Watchlist
+
+DAY = 24 * 3600
+
+
+@pytest.fixture
+def watchlist(tmp_path):
+    return Watchlist(str(tmp_path / "watchlist.sqlite3"))
+
+
+def test_watchers_of_a_product_share_its_pricing(watchlist):
+    watchlist.add("alice", "Sony WH-1000XM5", 26000)
+    watchlist.add("bob", "sony wh-1000xm5", 25000)
+    assert len(watchlist.due(3600)) == 1
+    alerts = watchlist.update(watchlist.due(3600)[0][0], {"price": 25500, "retailer": "Amazon", "url": "u"})
+    assert [alert["owner"] for alert in alerts] == ["alice"]
+    assert watchlist.due(3600) == []
+
+
+def test_watches_expire_unless_their_owner_looks_at_them(watchlist):
+    kept = watchlist.add("alice", "Sony WH-1000XM5", 26000)
+    watchlist.add("gone", "Apple iPhone 15", 60000)
+    now = time.time() + 20 * DAY
+    watchlist.for_owner("alice", now=now)
+    assert watchlist.expire(30 * DAY, now=now + 15 * DAY) == 1
+    assert [watch["id"] for watch in watchlist.for_owner("alice")] == [kept]
+    assert watchlist.for_owner("gone") == []
+    assert watchlist.stats() == {"watches": 1, "products": 1}
+
+
+def test_looking_again_within_the_hour_skips_the_write(watchlist):
+    watchlist.add("alice", "Sony WH-1000XM5", 26000)
+    now = time.time() + DAY
+    watchlist.for_owner("alice", now=now)
+    changes = watchlist._conn.total_changes
+    watchlist.for_owner("alice", now=now + 60)
+    assert watchlist._conn.total_changes == changes
+    watchlist.for_owner("alice", now=now + 2 * 3600)
+    assert watchlist._conn.total_changes == changes + 1
+
+
+def test_remove_only_touches_the_owners_watch(watchlist):
+    watch_id = watchlist.add("alice", "Sony WH-1000XM5", 26000)
+    watchlist.remove("bob", watch_id)
+    assert len(watchlist.for_owner("alice")) == 1
+    watchlist.remove("alice", watch_id)
+    assert watchlist.for_owner("alice") == []
+
+
+def test_tables_from_before_seen_are_upgraded(tmp_path):
+    path = str(tmp_path / "watchlist.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE watches (id INTEGER PRIMARY KEY, owner TEXT NOT NULL, product TEXT NOT NULL, "
+        "query TEXT NOT NULL, name TEXT NOT NULL, target REAL NOT NULL, created REAL NOT NULL, "
+        "checked REAL NOT NULL DEFAULT 0, price REAL, retailer TEXT, url TEXT, notified_price REAL)"
+    )
+    conn.execute("INSERT INTO watches (owner, product, query, name, target, created) "
+                 "VALUES ('old', 'sony', 'sony', 'Sony', 100, 1000)")
+    conn.commit()
+    conn.close()
+    watchlist = Watchlist(path)
+    # An old row counts from when it was created
+    assert watchlist.expire(DAY, now=1000 + DAY / 2) == 0
+    assert watchlist.expire(DAY, now=1000 + 2 * DAY) == 1
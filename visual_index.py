@@ -0,0 +1,198 @@
+"""
+Visual similarity index over previously identified product images.
+Each image is reduced to a small CPU embedding (a zero-mean grayscale
+thumbnail, gradient orientation histograms and a coarse chromaticity grid).
+Embeddings are kept in a memory-mapped float32 matrix on disk next to a SQLite
+table of product_info, so startup only maps the file, and a lookup is one
+brute-force dot product.
+A close enough match returns the stored product_info without a vision call.
+"""
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import config
+
+THUMB = 8
+CELLS = 4
+ORIENTATIONS = 8
+EMBED_SIZE = 32
+DIM = THUMB * THUMB + CELLS * CELLS * ORIENTATIONS + CELLS * CELLS * 2
+# Relative weight of the thumbnail, gradient and colour parts
+WEIGHTS = (0.5, 0.6, 0.4)
+LUMA = (0.299, 0.587, 0.114)
+
+
+def _unit(vector):
+    import numpy as np
+
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def image_embedding(image):
+    """L2-normalised float32 vector of length DIM describing an image's layout, edges and colours"""
+    import numpy as np
+    from PIL import Image
+
+    small = image.convert("RGB").resize((EMBED_SIZE, EMBED_SIZE), Image.BILINEAR, reducing_gap=2.0)
+    rgb = np.asarray(small, dtype=np.float32) / 255.0
+    gray = rgb @ np.array(LUMA, dtype=np.float32)
+
+    thumb = gray.reshape(THUMB, EMBED_SIZE // THUMB, THUMB, EMBED_SIZE // THUMB).mean(axis=(1, 3)).ravel()
+    thumb = _unit(thumb - thumb.mean())
+
+    gy, gx = np.gradient(gray)
+    magnitude = np.hypot(gx, gy)
+    orientation = ((np.arctan2(gy, gx) % np.pi) / np.pi * ORIENTATIONS).astype(np.int64) % ORIENTATIONS
+    cell = EMBED_SIZE // CELLS
+    rows, cols = np.indices(gray.shape)
+    bins = ((rows // cell) * CELLS + cols // cell) * ORIENTATIONS + orientation
+    gradients = np.bincount(bins.ravel(), weights=magnitude.ravel(), minlength=CELLS * CELLS * ORIENTATIONS)
+    # Square roots (Hellinger) stop a few strong edges from dominating
+    gradients = _unit(np.sqrt(gradients))
+
+    # Chromaticity (r and g share of each cell's brightness) ignores lighting changes
+    cells = rgb.reshape(CELLS, cell, CELLS, cell, 3).mean(axis=(1, 3))
+    colors = _unit((cells[..., :2] / (cells.sum(axis=-1, keepdims=True) + 1e-6) - 1 / 3).ravel())
+
+    parts = [weight * part for weight, part in zip(WEIGHTS, (thumb, gradients, colors))]
+    return _unit(np.concatenate(parts)).astype(np.float32)
+
+
+class VisualIndex:
+    """
+    Append-only nearest-neighbour index of (embedding, product_info).
+    Vectors live in `vectors.f32` (raw float32 rows) and product_info in
+    `items.sqlite3`; a row counts once both are written. Several processes
+    can share the files: appends hold SQLite's write lock, and a row's id is
+    its position in the vectors file at the time it is written.
+    """
+
+    def __init__(self, directory, dim=DIM, chunk_rows=65536):
+        self.directory = directory
+        self.dim = dim
+        self.chunk_rows = chunk_rows
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._conn = sqlite3.connect(os.path.join(directory, "items.sqlite3"), check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS items (id INTEGER PRIMARY KEY, product_info TEXT NOT NULL)")
+        self._conn.commit()
+
+        with self._write_lock():
+            # Ids are dense row numbers, so MAX(id) avoids counting a large table
+            last_id = self._conn.execute("SELECT MAX(id) FROM items").fetchone()[0]
+            rows = 0 if last_id is None else last_id + 1
+            on_disk = self._rows_on_disk()
+            # A crash between the two writes leaves a vector without metadata (or the reverse); ignore the extra
+            self.count = min(rows, on_disk)
+            if os.path.exists(self._vectors_path) and os.path.getsize(self._vectors_path) > self.count * 4 * dim:
+                with open(self._vectors_path, "r+b") as f:
+                    f.truncate(self.count * 4 * dim)
+        self._matrix = None
+
+    def _rows_on_disk(self):
+        return os.path.getsize(self._vectors_path) // (4 * self.dim) if os.path.exists(self._vectors_path) else 0
+
+    @contextmanager
+    def _write_lock(self):
+        """This process's lock plus SQLite's write lock, which other processes appending to the files wait on"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._conn.rollback()
+                raise
+            self._conn.commit()
+
+    def _mapped(self):
+        """Memory-map the vectors written so far (remapped after appends here or by another process)"""
+        import numpy as np
+
+        self.count = max(self.count, self._rows_on_disk())
+        if self._matrix is None or len(self._matrix) != self.count:
+            self._matrix = (np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self.count, self.dim))
+                            if self.count else np.empty((0, self.dim), dtype=np.float32))
+        return self._matrix
+
+    def search(self, embedding, k=1):
+        """Return up to k (similarity, row_id) pairs, most similar first"""
+        import numpy as np
+
+        with self._lock:
+            matrix = self._mapped()
+        if not len(matrix):
+            return []
+        best_scores = np.empty(0, dtype=np.float32)
+        best_ids = np.empty(0, dtype=np.int64)
+        # Chunked so a large index never needs more than chunk_rows of it in memory at once
+        for start in range(0, len(matrix), self.chunk_rows):
+            scores = matrix[start:start + self.chunk_rows] @ embedding
+            top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+            best_scores = np.concatenate([best_scores, scores[top]])
+            best_ids = np.concatenate([best_ids, top + start])
+        order = np.argsort(-best_scores)[:k]
+        return [(float(best_scores[i]), int(best_ids[i])) for i in order]
+
+    def product_info(self, row_id):
+        with self._lock:
+            row = self._conn.execute("SELECT product_info FROM items WHERE id = ?", (row_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def match(self, embedding, threshold=None):
+        """(product_info, similarity) of the closest entry at or above threshold, else None"""
+        threshold = config.VISUAL_MATCH_THRESHOLD if threshold is None else threshold
+        found = self.search(embedding, k=1)
+        if found and found[0][0] >= threshold:
+            product_info = self.product_info(found[0][1])
+            if product_info is not None:
+                self.hits += 1
+                return product_info, found[0][0]
+        self.misses += 1
+        return None
+
+    def add(self, embedding, product_info):
+        """Append one embedding with its product_info"""
+        import numpy as np
+
+        self.add_many(np.asarray(embedding, dtype=np.float32)[None, :], [product_info])
+
+    def add_many(self, embeddings, product_infos):
+        """Append a batch of embeddings (an n x dim array) with their product_info dicts"""
+        import numpy as np
+
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        with self._write_lock():
+            # Rows may have been appended by another process since this one last looked
+            start = self._rows_on_disk()
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(start * 4 * self.dim)
+                f.write(embeddings.tobytes())
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO items (id, product_info) VALUES (?, ?)",
+                [(start + i, json.dumps(info)) for i, info in enumerate(product_infos)]
+            )
+            self.count = start + len(embeddings)
+
+    def stats(self):
+        return {"entries": self.count, "hits": self.hits, "misses": self.misses}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_visual_index():
+    """Process-wide visual index in DATA_DIR/visual_index"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = VisualIndex(os.path.join(config.DATA_DIR, "visual_index"))
+        return _index
@@ -0,0 +1,319 @@
+"""
+Price watches with target prices.
+A watch is a product (from an identification or a manual query) and the price
+someone is waiting for. Watches are kept in SQLite keyed by the product's
+normalised query, so everyone watching the same product shares one re-pricing.
+A background scheduler re-prices due products at batch priority, paced by a
+token bucket so polling stays within its own slice of the Groq budget, and
+sends an alert through a notification sink (a JSONL file or a webhook) when
+the best price reaches a target. Watches their owner has not looked at for
+WATCH_TTL seconds expire, so abandoned ones are not re-priced forever.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import config
+from cache import get_price_cache, normalize_query
+from core import refresh_prices, resolve_query
+from price_sources import collect_prices
+from rate_limit import BATCH, RateLimiter, request_context
+from telemetry import span
+
+logger = logging.getLogger(__name__)
+
+# Seconds a watch's last-seen time may lag; expiry counts in days, so reruns within this skip the write
+SEEN_RESOLUTION = 3600
+
+
+class Watchlist:
+    """Watches per owner (a watcher id kept in the page URL), grouped by product for re-pricing"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS watches ("
+            "id INTEGER PRIMARY KEY, owner TEXT NOT NULL, product TEXT NOT NULL, query TEXT NOT NULL, "
+            "name TEXT NOT NULL, target REAL NOT NULL, created REAL NOT NULL, checked REAL NOT NULL DEFAULT 0, "
+            "price REAL, retailer TEXT, url TEXT, notified_price REAL, seen REAL)"
+        )
+        # seen (when the owner last looked at the watch) came later; older rows count from created
+        if "seen" not in [column[1] for column in self._conn.execute("PRAGMA table_info(watches)")]:
+            self._conn.execute("ALTER TABLE watches ADD COLUMN seen REAL")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS watches_product ON watches (product)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS watches_owner ON watches (owner)")
+        self._conn.commit()
+
+    def add(self, owner, query, target, name=None):
+        """
+        Watch a product for an owner; the query is canonicalised through the catalogue first.
+        Watching the same product again updates the target. Returns the watch id
+        """
+        query, product = resolve_query(query)
+        key = normalize_query(query)
+        if not key:
+            return None
+        name = name or (product["name"] if product else query)
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM watches WHERE owner = ? AND product = ?", (owner, key)).fetchone()
+            if row:
+                self._conn.execute("UPDATE watches SET target = ?, notified_price = NULL, seen = ? WHERE id = ?",
+                                   (float(target), time.time(), row[0]))
+            else:
+                row = (self._conn.execute(
+                    "INSERT INTO watches (owner, product, query, name, target, created, seen) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (owner, key, query, name, float(target), time.time(), time.time())
+                ).lastrowid,)
+            # A new watcher of a product that was priced recently gets its latest price straight away
+            self._conn.execute(
+                "UPDATE watches SET (checked, price, retailer, url) = (SELECT checked, price, retailer, url "
+                "FROM watches WHERE product = ? ORDER BY checked DESC LIMIT 1) WHERE id = ? AND checked = 0",
+                (key, row[0])
+            )
+            self._conn.commit()
+        return row[0]
+
+    def remove(self, owner, watch_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM watches WHERE id = ? AND owner = ?", (watch_id, owner))
+            self._conn.commit()
+
+    def for_owner(self, owner, now=None):
+        """An owner's watches as dicts, most recently added first; looking at them keeps them from expiring"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if self._conn.execute("UPDATE watches SET seen = ? WHERE owner = ? AND COALESCE(seen, 0) < ?",
+                                  (now, owner, now - SEEN_RESOLUTION)).rowcount:
+                self._conn.commit()
+            cursor = self._conn.execute(
+                "SELECT id, query, name, target, checked, price, retailer, url, notified_price FROM watches "
+                "WHERE owner = ? ORDER BY created DESC", (owner,)
+            )
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def expire(self, ttl, now=None):
+        """Delete watches their owner has not looked at for `ttl` seconds; returns how many"""
+        now = time.time() if now is None else now
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM watches WHERE COALESCE(seen, created) < ?",
+                                         (now - ttl,)).rowcount
+            self._conn.commit()
+        return deleted
+
+    def due(self, interval, limit=None, now=None):
+        """(product, query) of products not re-priced for `interval` seconds, longest waiting first"""
+        now = time.time() if now is None else now
+        sql = ("SELECT product, MIN(query) FROM watches GROUP BY product HAVING MIN(checked) <= ? "
+               "ORDER BY MIN(checked)")
+        params = [now - interval]
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def update(self, product, best, now=None):
+        """
+        Record a product's best price (a price_table row dict, or None when it could not be priced)
+        and return an alert dict for every watch whose target it reaches.
+        A watch is alerted again only when the price drops further, or after going back above target
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if best is None:
+                self._conn.execute("UPDATE watches SET checked = ? WHERE product = ?", (now, product))
+                self._conn.commit()
+                return []
+            price = float(best["price"])
+            self._conn.execute(
+                "UPDATE watches SET checked = ?, price = ?, retailer = ?, url = ?, "
+                "notified_price = CASE WHEN ? > target THEN NULL ELSE notified_price END WHERE product = ?",
+                (now, price, best["retailer"], best["url"], price, product)
+            )
+            cursor = self._conn.execute(
+                "SELECT id, owner, query, name, target FROM watches WHERE product = ? AND target >= ? "
+                "AND (notified_price IS NULL OR ? < notified_price)", (product, price, price)
+            )
+            alerts = [{"watch_id": watch_id, "owner": owner, "query": query, "name": name, "target": target,
+                       "price": price, "retailer": best["retailer"], "url": best["url"],
+                       "checked_at": datetime.fromtimestamp(now).isoformat(timespec="seconds")}
+                      for watch_id, owner, query, name, target in cursor.fetchall()]
+            self._conn.executemany("UPDATE watches SET notified_price = ? WHERE id = ?",
+                                   [(price, alert["watch_id"]) for alert in alerts])
+            self._conn.commit()
+        return alerts
+
+    def stats(self):
+        with self._lock:
+            watches, products = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT product) FROM watches"
+            ).fetchone()
+        return {"watches": watches, "products": products}
+
+
+class FileSink:
+    """Appends each alert as a JSON line"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def send(self, alert):
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(alert, ensure_ascii=False) + "\n")
+
+
+class WebhookSink:
+    """POSTs each alert as JSON to a URL"""
+
+    def __init__(self, url, timeout=None):
+        import requests
+
+        self.url = url
+        self.timeout = timeout or config.WATCH_WEBHOOK_TIMEOUT
+        self._session = requests.Session()
+
+    def send(self, alert):
+        response = self._session.post(self.url, json=alert, timeout=self.timeout)
+        response.raise_for_status()
+
+
+def make_sink(spec=None):
+    """A sink for WATCH_NOTIFY: an http(s) URL is a webhook, anything else a file path"""
+    spec = spec if spec is not None else config.WATCH_NOTIFY
+    if spec.startswith(("http://", "https://")):
+        return WebhookSink(spec)
+    return FileSink(spec or os.path.join(config.DATA_DIR, "watch_alerts.jsonl"))
+
+
+class WatchScheduler:
+    """
+    Re-prices due products on a background thread.
+    Each product is priced once however many watch it, and a price that is already cached
+    from an interactive search newer than the interval is used without a call.
+    """
+
+    def __init__(self, watchlist, api_key, sink, interval=None, requests_per_minute=None, tick=None, ttl=None):
+        self.watchlist = watchlist
+        self.api_key = api_key
+        self.sink = sink
+        self.interval = interval or config.WATCH_INTERVAL
+        self.ttl = config.WATCH_TTL if ttl is None else ttl
+        self.requests_per_minute = requests_per_minute or config.WATCH_REQUESTS_PER_MINUTE
+        self.tick = tick or config.WATCH_TICK
+        # No burst: calls are spaced evenly through the minute
+        self.limiter = RateLimiter(self.requests_per_minute, burst=1)
+        self.counts = {"checks": 0, "calls": 0, "shared": 0, "errors": 0, "alerts": 0, "undelivered": 0,
+                       "expired": 0}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="price-watch", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Price watch pass failed")
+            self._stop.wait(self.tick)
+
+    def run_once(self):
+        """Drop expired watches, then re-price due products, as many as the rate allows before the next tick"""
+        if self.ttl:
+            self.counts["expired"] += self.watchlist.expire(self.ttl)
+        limit = max(1, self.requests_per_minute * self.tick // 60)
+        due = self.watchlist.due(self.interval, limit)
+        with span("watch.pass", products=len(due)):
+            for product, query in due:
+                if self._stop.is_set():
+                    break
+                self.check(product, query)
+        return len(due)
+
+    def check(self, product, query):
+        # pandas is only needed once there are prices to rank
+        from price_table import analyse
+
+        self.counts["checks"] += 1
+        results = self._price(product, query)
+        table = analyse(results["retailers"]) if results and results.get("retailers") else None
+        best = table.best if table is not None else None
+        for alert in self.watchlist.update(product, best):
+            self.counts["alerts"] += 1
+            try:
+                self.sink.send(alert)
+            except Exception:
+                self.counts["undelivered"] += 1
+                logger.exception("Could not deliver the price alert for watch %s", alert["watch_id"])
+
+    def _price(self, product, query):
+        price_cache = get_price_cache()
+        age = price_cache.store.age(product)
+        if age is not None and age < self.interval:
+            self.counts["shared"] += 1
+            return price_cache.store.peek(product)
+
+        self.limiter.acquire()
+        self.counts["calls"] += 1
+        # Watches yield to interactive sessions and are shed first under load
+        with request_context("watch", priority=BATCH):
+            if config.PRICE_SOURCES == ["groq"]:
+                lookup = refresh_prices(query, self.api_key)
+                if lookup.ok:
+                    return lookup.results
+                self.counts["errors"] += 1
+                logger.warning("Price watch for %r failed: %s", query, lookup.error)
+                return None
+            collection = collect_prices(query, self.api_key)
+            if not collection.ok:
+                self.counts["errors"] += 1
+            return collection.results
+
+    def stats(self):
+        return dict(self.counts, **self.watchlist.stats())
+
+
+_watchlist = None
+_scheduler = None
+_watch_lock = threading.Lock()
+
+
+def get_watchlist():
+    """Process-wide watchlist in DATA_DIR/watchlist.sqlite3"""
+    global _watchlist
+    with _watch_lock:
+        if _watchlist is None:
+            _watchlist = Watchlist(os.path.join(config.DATA_DIR, "watchlist.sqlite3"))
+        return _watchlist
+
+
+def start_scheduler(api_key, sink=None):
+    """Start the process-wide watch scheduler once; later calls return the running one"""
+    global _scheduler
+    watchlist = get_watchlist()
+    with _watch_lock:
+        if _scheduler is None:
+            _scheduler = WatchScheduler(watchlist, api_key, sink or make_sink()).start()
+        return _scheduler